@@ -0,0 +1,141 @@
+# app/arranque.py
+"""
+Latencia de arranque y de reruns de la app.
+
+Cada ejecución del script queda como tramo de `src.utils.instrumentacion` (y, con
+`INLINE_TRAZAS`, en el JSONL del despliegue):
+
+- `app.arranque`: primera ejecución del proceso, con los imports en frío de la página.
+  `desde_proceso` son los segundos desde que arrancó el proceso de Streamlit hasta el final
+  de esa ejecución (lo que espera el primer usuario de un contenedor recién levantado).
+- `app.rerun`: cada ejecución posterior (un widget que cambia, otra página...).
+
+También se puede medir sin navegador, cada página en un proceso nuevo:
+
+    python -m app.arranque --reruns 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Para importar desde raíz del proyecto al correr como script
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils.instrumentacion import medir
+
+# Módulos que la app no debería cargar en páginas que no los usan (plotly.graph_objects no
+# cuenta: Streamlit lo importa al arrancar para su tema de gráficos)
+MODULOS_PESADOS = ["xgboost", "sklearn", "plotly.express"]
+
+# Páginas de `streamlit_app.py` (ruta relativa a app/)
+PAGINAS = ["paginas/carga_datos.py", "paginas/forecast.py", "paginas/fte.py"]
+
+_ESTADO = {"arranque": None, "desde_proceso": None, "reruns": deque(maxlen=200)}
+
+
+def segundos_desde_inicio_proceso():
+    """Segundos desde que arrancó este proceso (Linux, vía /proc); None si no se puede saber"""
+    try:
+        with open("/proc/self/stat", encoding="utf-8") as f:
+            # El campo 22 (starttime, en ticks desde el boot) va después del nombre entre paréntesis
+            inicio_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", encoding="utf-8") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - inicio_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+@contextmanager
+def medir_ejecucion(pagina):
+    """Mide una ejecución del script como `app.arranque` (la primera del proceso) o `app.rerun`"""
+    primera = _ESTADO["arranque"] is None
+    with medir("app.arranque" if primera else "app.rerun", pagina=pagina) as tramo:
+        inicio = time.perf_counter()
+        try:
+            yield tramo
+        finally:
+            # También si la página corta con st.stop() o pide un rerun
+            segundos = time.perf_counter() - inicio
+            if primera:
+                tramo["desde_proceso"] = segundos_desde_inicio_proceso()
+                _ESTADO["arranque"], _ESTADO["desde_proceso"] = segundos, tramo["desde_proceso"]
+            else:
+                _ESTADO["reruns"].append(segundos)
+            tramo["modulos_pesados"] = [m for m in MODULOS_PESADOS if m in sys.modules]
+
+
+def resumen_arranque():
+    """Arranque en frío, segundos desde el inicio del proceso y reruns (último, mediana, cantidad)"""
+    reruns = list(_ESTADO["reruns"])
+    return {
+        "arranque_s": _ESTADO["arranque"],
+        "desde_proceso_s": _ESTADO["desde_proceso"],
+        "ultimo_rerun_s": reruns[-1] if reruns else None,
+        "rerun_mediana_s": statistics.median(reruns) if reruns else None,
+        "reruns": len(reruns),
+    }
+
+
+# --- Medición sin navegador ---
+
+def _medir_pagina(pagina, reruns):
+    """Corre la app en este proceso con AppTest: primera ejecución en frío y `reruns` reruns de `pagina`"""
+    from streamlit.testing.v1 import AppTest
+
+    inicio = time.perf_counter()
+    at = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py"), default_timeout=120)
+    at.switch_page(pagina).run()
+    frio = time.perf_counter() - inicio
+
+    tiempos = []
+    for _ in range(reruns):
+        inicio = time.perf_counter()
+        at.run()
+        tiempos.append(time.perf_counter() - inicio)
+    return {
+        "pagina": pagina,
+        "frio_s": round(frio, 3),
+        "rerun_mediana_s": round(statistics.median(tiempos), 3) if tiempos else None,
+        "excepciones": len(at.exception),
+        "modulos_pesados": [m for m in MODULOS_PESADOS if m in sys.modules],
+    }
+
+
+def medir_paginas(paginas=PAGINAS, reruns=5):
+    """Mide cada página en un proceso de Python nuevo (imports en frío); devuelve una fila por página"""
+    filas = []
+    for pagina in paginas:
+        salida = subprocess.run(
+            [sys.executable, "-m", "app.arranque", "--pagina", pagina, "--reruns", str(reruns), "--json"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True, check=True,
+        )
+        filas.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+    return filas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tiempo de arranque en frío y de rerun de cada página de la app")
+    parser.add_argument("--pagina", choices=PAGINAS, default=None, help="Medir solo esta página (en este proceso)")
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Salida como una línea JSON")
+    args = parser.parse_args(argv)
+
+    filas = [_medir_pagina(args.pagina, args.reruns)] if args.pagina else medir_paginas(reruns=args.reruns)
+    if args.json:
+        print(json.dumps(filas[0] if args.pagina else filas, ensure_ascii=False))
+        return
+    for fila in filas:
+        print(f"⏱️ {fila['pagina']:<24} frío {fila['frio_s']:7.2f} s   rerun {fila['rerun_mediana_s'] or 0:6.3f} s   "
+              f"módulos pesados: {', '.join(fila['modulos_pesados']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
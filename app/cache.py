@@ -0,0 +1,140 @@
+import base64
+import hashlib
+import os
+from functools import lru_cache
+
+import pandas as pd
+import streamlit as st
+
+from src.etl.transform_calls import leer_llamadas_diarias
+from src.utils.almacenamiento import existe_dataset, get_dataset_dir, leer_dataset, listar_particiones
+from src.utils.indice_series import indexar_series
+
+# Columnas del histórico que usa el forecast
+COLUMNAS_FORECAST = ["date", "cliente", "idioma", "y", "aht"]
+
+
+# --- Firma de archivos: ruta + mtime + hash del contenido ---
+
+@lru_cache(maxsize=512)
+def _hash_contenido(path, mtime_ns, tamano):
+    """sha256 del archivo; con lru_cache solo se vuelve a leer si cambian mtime o tamaño"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def firma(path):
+    """Firma de un archivo o de una carpeta (dataset Parquet) para usar como clave de cache"""
+    path = str(path)
+    if os.path.isdir(path):
+        archivos = sorted(os.path.join(raiz, f) for raiz, _, nombres in os.walk(path) for f in nombres)
+    elif os.path.exists(path):
+        archivos = [path]
+    else:
+        return (path, None)
+
+    partes = []
+    for archivo in archivos:
+        stat = os.stat(archivo)
+        partes.append((
+            os.path.relpath(archivo, path), stat.st_mtime_ns, _hash_contenido(archivo, stat.st_mtime_ns, stat.st_size)
+        ))
+    return (path, tuple(partes))
+
+
+def invalidar_cache():
+    """Vacía todos los caches (p. ej. después de subir un archivo nuevo)"""
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    _hash_contenido.cache_clear()
+
+
+# --- Datos ---
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _dataset(nombre, firma_datos, columnas, filtros):
+    return leer_dataset(nombre, columnas=list(columnas) if columnas else None, filtros=dict(filtros) or None)
+
+
+def cargar_dataset(nombre, columnas=None, filtros=None):
+    """`leer_dataset` con cache mientras el dataset no cambie"""
+    filtros = tuple(sorted((col, tuple(valores)) for col, valores in (filtros or {}).items()))
+    return _dataset(nombre, firma(get_dataset_dir(nombre)), tuple(columnas or ()), filtros)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _particiones(nombre, firma_datos):
+    return listar_particiones(nombre)
+
+
+def cargar_particiones(nombre):
+    """`listar_particiones` con cache mientras el dataset no cambie"""
+    return _particiones(nombre, firma(get_dataset_dir(nombre)))
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _csv(path, firma_datos, parse_dates):
+    return pd.read_csv(path, parse_dates=list(parse_dates))
+
+
+def cargar_csv(path, parse_dates=("date",)):
+    """`pd.read_csv` con cache mientras el archivo no cambie"""
+    return _csv(str(path), firma(path), tuple(parse_dates))
+
+
+# --- Features y modelos ---
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _indice_forecast(fuente, firma_datos, clientes, idiomas):
+    filtros = {"cliente": list(clientes), "idioma": list(idiomas)}
+    if existe_dataset(fuente):
+        df = leer_llamadas_diarias(columnas=COLUMNAS_FORECAST, filtros=filtros)
+    else:
+        df = _csv(fuente, firma_datos, ("date",))
+        df = df[df["cliente"].isin(clientes) & df["idioma"].isin(idiomas)]
+    return indexar_series(df[COLUMNAS_FORECAST])
+
+
+def indice_forecast(clientes, idiomas, path_csv):
+    """
+    Series indexadas (`indexar_series`) de los clientes e idiomas elegidos, desde el dataset
+    Parquet o, si no existe, desde el CSV procesado. Se comparte entre reruns y sesiones.
+    """
+    fuente = "llamadas_diarias" if existe_dataset("llamadas_diarias") else str(path_csv)
+    path = get_dataset_dir(fuente) if existe_dataset(fuente) else path_csv
+    return _indice_forecast(fuente, firma(path), tuple(clientes), tuple(idiomas))
+
+
+@st.cache_resource(show_spinner="Entrenando modelos...", max_entries=8)
+def _entrenar(huella, clientes, idiomas, modelo_global, firma_ajustes, _datos):
+    # Import diferido: xgboost y scikit-learn se cargan solo cuando hay que entrenar
+    from src.forecast.forecast_global import forecast_global
+    from src.forecast.forecast_multiidioma import forecast_multiidioma
+
+    if modelo_global:
+        return forecast_global(_datos, list(idiomas), list(clientes))
+    # Un modelo por idioma, entrenados en paralelo (hilos: XGBoost libera el GIL)
+    return forecast_multiidioma(_datos, list(idiomas), list(clientes), n_workers=os.cpu_count() or 1)
+
+
+def entrenar_forecast(datos, clientes, idiomas, modelo_global=False):
+    """Backtest + modelos entrenados; se reutilizan mientras no cambien los datos, la selección ni los ajustes"""
+    from src.forecast.registro_modelos import get_hiperparametros_path
+
+    return _entrenar(datos["huella"], tuple(clientes), tuple(idiomas), modelo_global, firma(get_hiperparametros_path()), datos)
+
+
+# --- Recursos estáticos ---
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _base64(path, firma_archivo):
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode()
+
+
+def imagen_base64(path):
+    """Imagen codificada en base64 para incrustar en HTML, con cache mientras el archivo no cambie"""
+    return _base64(str(path), firma(path))
@@ -0,0 +1,230 @@
+# app/graficos.py
+"""
+Capa de gráficos de la app: cada serie se reduce a los puntos que entran en pantalla antes de
+armar la figura, así el JSON que llega al navegador y el tiempo de dibujo no crecen con la
+historia.
+
+- Forecast: LTTB (Largest-Triangle-Three-Buckets), que conserva la forma de la curva.
+- FTE: mínimo y máximo por cubeta, que conserva los picos de dotación.
+- Desde `UMBRAL_WEBGL` puntos por traza se usa `Scattergl` (WebGL) en lugar de SVG.
+"""
+import numpy as np
+import plotly.graph_objects as go
+from plotly.colors import qualitative
+
+# Puntos por serie: del orden del ancho de un gráfico en píxeles
+PUNTOS_PANTALLA = 1500
+OPCIONES_PUNTOS = [500, 1000, 1500, 3000, 5000]
+UMBRAL_WEBGL = 1000
+
+# Idiomas con gráfico detallado si no se elige otra cosa
+IDIOMAS_DETALLE = 4
+
+# Figuras con muchas series: tope de puntos entre todas las trazas (con un mínimo por traza)
+MAX_PUNTOS_FIGURA = 20_000
+MIN_PUNTOS_TRAZA = 200
+
+COLORES = qualitative.Plotly
+
+
+def _lttb(x, y, n_puntos):
+    """Índices elegidos por LTTB (sin atajos); x e y son arrays de floats más largos que `n_puntos`"""
+    n = len(y)
+    # n - 2 puntos interiores en n_puntos - 2 cubetas; promedios de cada cubeta con sumas acumuladas
+    bordes = np.linspace(1, n - 1, n_puntos - 1).astype(np.int64)
+    suma_x = np.concatenate([[0.0], np.cumsum(x)])
+    suma_y = np.concatenate([[0.0], np.cumsum(y)])
+    largo = np.diff(bordes)
+    promedio_x = np.append((suma_x[bordes[1:]] - suma_x[bordes[:-1]]) / largo, x[-1]).tolist()
+    promedio_y = np.append((suma_y[bordes[1:]] - suma_y[bordes[:-1]]) / largo, y[-1]).tolist()
+
+    # Cubetas chicas: el recorrido en Python puro es más rápido que una operación de numpy por cubeta
+    xs, ys, bordes = x.tolist(), y.tolist(), bordes.tolist()
+    indices = [0]
+    elegido = 0
+    for i in range(n_puntos - 2):
+        xa, ya = xs[elegido], ys[elegido]
+        dx, dy = xa - promedio_x[i + 1], promedio_y[i + 1] - ya
+        area_max = -1.0
+        for j in range(bordes[i], bordes[i + 1]):
+            # El doble del área del triángulo alcanza para comparar
+            area = abs(dx * (ys[j] - ya) - (xa - xs[j]) * dy)
+            if area > area_max:
+                area_max, elegido = area, j
+        indices.append(elegido)
+    indices.append(n - 1)
+    return np.asarray(indices, dtype=np.int64)
+
+
+def lttb(x, y, n_puntos, preseleccion=4):
+    """
+    Índices de los `n_puntos` que elige LTTB: el primero, el último y, en cada cubeta, el que
+    forma el triángulo de mayor área con el punto elegido antes y el promedio de la cubeta
+    siguiente. Si la serie ya tiene `n_puntos` o menos, devuelve todos.
+
+    Con series de más de `preseleccion` x `n_puntos` puntos, LTTB corre sobre los mínimos y
+    máximos por cubeta (vectorizado), así el costo casi no depende del largo de la serie.
+    """
+    n = len(y)
+    if n <= n_puntos or n_puntos < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if n <= preseleccion * n_puntos:
+        return _lttb(x, y, n_puntos)
+    candidatos = minmax(y, preseleccion * n_puntos)
+    if len(candidatos) <= n_puntos:
+        return candidatos
+    return candidatos[_lttb(x[candidatos], y[candidatos], n_puntos)]
+
+
+def minmax(y, n_puntos):
+    """
+    Índices del mínimo y el máximo de cada una de `n_puntos / 2` cubetas (más el primero y el
+    último), en una sola pasada vectorizada. Si la serie ya tiene `n_puntos` o menos, devuelve todos.
+    """
+    n = len(y)
+    if n <= n_puntos or n_puntos < 2:
+        return np.arange(n)
+    tamano = -(-n // max(n_puntos // 2, 1))
+    n_cubetas = -(-n // tamano)
+    cubetas = np.full(n_cubetas * tamano, np.nan)
+    cubetas[:n] = y
+    cubetas = cubetas.reshape(n_cubetas, tamano)
+    desde = np.arange(n_cubetas) * tamano
+    return np.unique(np.concatenate([
+        [0, n - 1], desde + np.nanargmin(cubetas, axis=1), desde + np.nanargmax(cubetas, axis=1)
+    ]))
+
+
+def reducir(df, columnas, n_puntos=PUNTOS_PANTALLA, metodo="lttb", x="date"):
+    """
+    Hasta `n_puntos` filas de `df` (ordenado por `x`) para dibujar `columnas`: la unión de los
+    puntos elegidos para cada una, con el presupuesto repartido entre ellas (los vacíos no
+    cuentan). Las demás columnas (p. ej. las bandas) acompañan a esas filas.
+    """
+    if len(df) <= n_puntos:
+        return df
+    por_columna = max(n_puntos // max(len(columnas), 1), 3)
+    eje = df[x].to_numpy(dtype="datetime64[ns]").view(np.int64) if metodo == "lttb" else None
+    seleccion = [np.array([0, len(df) - 1])]
+    for col in columnas:
+        y = df[col].astype(float).to_numpy()
+        validos = np.flatnonzero(np.isfinite(y))
+        if len(validos):
+            elegidos = lttb(eje[validos], y[validos], por_columna) if metodo == "lttb" else minmax(y[validos], por_columna)
+            seleccion.append(validos[elegidos])
+    return df.iloc[np.unique(np.concatenate(seleccion))]
+
+
+def _puntos_por_traza(n_trazas, n_puntos):
+    return min(n_puntos, max(MAX_PUNTOS_FIGURA // max(n_trazas, 1), MIN_PUNTOS_TRAZA))
+
+
+def _por_idioma(df, idiomas):
+    """(idioma, filas del idioma ordenadas por fecha) con un solo groupby, en el orden de `idiomas`"""
+    grupos = dict(tuple(df.groupby("idioma", observed=True, sort=False)))
+    return [(idioma, grupos[idioma].sort_values("date")) for idioma in idiomas if idioma in grupos]
+
+
+def _traza(n_puntos):
+    """Scatter (SVG) para series cortas y Scattergl (WebGL) para las largas"""
+    return go.Scattergl if n_puntos > UMBRAL_WEBGL else go.Scatter
+
+
+def puntos_figura(fig):
+    """Puntos que la figura envía al navegador (suma de todas las trazas)"""
+    return sum(len(traza.x) for traza in fig.data if traza.x is not None)
+
+
+def figura_forecast(df_idioma, n_puntos=PUNTOS_PANTALLA):
+    """
+    Real, predicción e IC 95% de un idioma. La banda son dos trazas (inferior y superior con
+    relleno hasta la anterior), sin concatenar la serie invertida.
+    """
+    df = reducir(df_idioma.sort_values("date"), ["real", "pred"], n_puntos)
+    Scatter = _traza(len(df))
+    fig = go.Figure()
+
+    # Área del intervalo de confianza
+    fig.add_trace(Scatter(
+        x=df["date"], y=df["ic_95_inf"], mode="lines",
+        line=dict(width=0), showlegend=False, hoverinfo="skip"
+    ))
+    fig.add_trace(Scatter(
+        x=df["date"], y=df["ic_95_sup"], mode="lines", fill="tonexty",
+        fillcolor="rgba(135, 206, 250, 0.2)",  # celeste semitransparente
+        line=dict(width=0), name="IC 95%"
+    ))
+
+    # Línea de predicción y línea real
+    fig.add_trace(Scatter(x=df["date"], y=df["pred"], mode="lines", name="Predicción", line=dict(color="royalblue")))
+    fig.add_trace(Scatter(x=df["date"], y=df["real"], mode="lines", name="Real", line=dict(color="black")))
+
+    fig.update_layout(
+        xaxis_title="Fecha",
+        yaxis_title="Llamadas",
+        hovermode="x unified",
+        margin=dict(l=30, r=30, t=40, b=30),
+        height=400
+    )
+    return fig
+
+
+def figura_resumen(df_combinado, idiomas, n_puntos=PUNTOS_PANTALLA):
+    """
+    Todos los idiomas en una sola figura (una traza por idioma): real en el histórico y
+    predicción en el futuro, reducidos con LTTB.
+    """
+    n_puntos = _puntos_por_traza(len(idiomas), n_puntos)
+    fig = go.Figure()
+    for i, (idioma, df_idioma) in enumerate(_por_idioma(df_combinado, idiomas)):
+        df_idioma = df_idioma.assign(llamadas=df_idioma["real"].fillna(df_idioma["pred"]))
+        df = reducir(df_idioma, ["llamadas"], n_puntos)
+        fig.add_trace(_traza(len(df))(
+            x=df["date"], y=df["llamadas"], mode="lines", name=str(idioma),
+            line=dict(color=COLORES[i % len(COLORES)], width=1.5)
+        ))
+    fig.update_layout(
+        xaxis_title="Fecha",
+        yaxis_title="Llamadas",
+        legend_title="Idioma",
+        hovermode="x unified",
+        margin=dict(l=30, r=30, t=40, b=30),
+        height=450
+    )
+    return fig
+
+
+def figura_fte(df_fte, idiomas, n_puntos=PUNTOS_PANTALLA):
+    """
+    FTE estimado por día de cada idioma en una figura, con mínimo/máximo por cubeta para no
+    perder picos; con la simulación, el P90 del mismo color en línea punteada.
+    """
+    con_p90 = "fte_p90" in df_fte.columns
+    n_puntos = _puntos_por_traza(len(idiomas) * (2 if con_p90 else 1), n_puntos)
+    fig = go.Figure()
+    for i, (idioma, df_idioma) in enumerate(_por_idioma(df_fte, idiomas)):
+        df = reducir(df_idioma, ["fte_estimado"] + (["fte_p90"] if con_p90 else []), n_puntos, metodo="minmax")
+        Scatter = _traza(len(df))
+        color = COLORES[i % len(COLORES)]
+        # Marcadores solo mientras se distinguen los días
+        modo = "lines+markers" if len(df) <= 200 else "lines"
+        fig.add_trace(Scatter(
+            x=df["date"], y=df["fte_estimado"].astype(float), mode=modo, name=str(idioma), line=dict(color=color)
+        ))
+        if con_p90 and df["fte_p90"].notna().any():
+            fig.add_trace(Scatter(
+                x=df["date"], y=df["fte_p90"].astype(float), mode="lines", name=f"{idioma} P90",
+                line=dict(color=color, dash="dot")
+            ))
+
+    fig.update_layout(
+        title="FTEs estimados por día e idioma",
+        xaxis_title="Fecha",
+        yaxis_title="FTE estimado",
+        legend_title="Idioma",
+        hovermode="x unified",
+        height=500
+    )
+    return fig
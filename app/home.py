@@ -1,11 +1,9 @@
 import streamlit as st
 import pandas as pd
 import os
-import base64
+import hashlib
 
-def get_base64_of_image(image_path):
-    with open(image_path, "rb") as f:
-        return base64.b64encode(f.read()).decode()
+from app.cache import imagen_base64, invalidar_cache
 
 def home():
     # ✅ Definir root_path primero
@@ -13,7 +11,7 @@ def home():
 
     # ✅ Ruta y conversión del logo
     logo_path = os.path.join(root_path, "images", "InLine-logoOnly.png")
-    logo_base64 = get_base64_of_image(logo_path)
+    logo_base64 = imagen_base64(logo_path)
 
     # ✅ Mostrar logo + título en fila
     st.markdown(
@@ -30,7 +28,7 @@ def home():
     ruta_imagen = os.path.join(root_path, "images", "proyeccion-de-llamadas-en-call-center.jpg")
 
     if os.path.exists(ruta_imagen):
-        img_base64 = get_base64_of_image(ruta_imagen)
+        img_base64 = imagen_base64(ruta_imagen)
         st.markdown(
             f"""
             <style>
@@ -79,34 +77,61 @@ def home():
 
     st.markdown("### 📁 Subí tu archivo Excel")
     uploaded_file = st.file_uploader("Seleccioná un archivo con datos de llamadas", type=["xlsx"])
+    incremental = st.checkbox(
+        "Carga incremental (solo filas posteriores a la última carga)", value=True,
+        help="Desmarcá para reprocesar todo el histórico, p. ej. si el archivo corrige días ya cargados."
+    )
 
     if uploaded_file:
         try:
-            df = pd.read_excel(uploaded_file)
+            # El archivo queda en el widget en cada rerun: se procesa solo si cambió el contenido o el modo
+            clave_carga = (hashlib.sha256(uploaded_file.getvalue()).hexdigest(), incremental)
+            carga = st.session_state.get("ultima_carga")
 
-            st.success("✅ Archivo cargado correctamente")
-            st.subheader("👀 Vista previa de los datos originales")
-            st.dataframe(df.head())
+            if carga is None or carga["clave"] != clave_carga:
+                df = pd.read_excel(uploaded_file)
+                df_original = df.head()
 
-            # Limpieza de nombres
-            df.columns = [col.strip().lower().replace(" ", "_") for col in df.columns]
+                # Limpieza de nombres
+                df.columns = [col.strip().lower().replace(" ", "_") for col in df.columns]
 
-            # Validación clave
-            if "cliente" not in df.columns:
-                st.error("❌ Falta la columna 'cliente'. Verificá el archivo.")
-                st.stop()
+                # Validación clave
+                if "cliente" not in df.columns:
+                    st.error("❌ Falta la columna 'cliente'. Verificá el archivo.")
+                    st.stop()
 
-            # Guardar archivo en data/interim
-            interim_path = os.path.join(root_path, "data", "interim", "datos_llamadas.csv")
-            os.makedirs(os.path.dirname(interim_path), exist_ok=True)
-            df.to_csv(interim_path, index=False)
-            st.info("📥 Datos guardados en `data/interim/datos_llamadas.csv`")
+                # Guardar archivo en data/interim
+                interim_path = os.path.join(root_path, "data", "interim", "datos_llamadas.csv")
+                os.makedirs(os.path.dirname(interim_path), exist_ok=True)
+                df.to_csv(interim_path, index=False)
+
+                # Ejecutar transformación
+                from src.etl.transform_calls import procesar_llamadas, procesar_llamadas_incremental
+                df_transformado = procesar_llamadas_incremental() if incremental else procesar_llamadas()
+
+                # Datos nuevos: se descartan datasets, features y modelos en cache
+                invalidar_cache()
 
-            # Ejecutar transformación
-            from src.etl.transform_calls import procesar_llamadas
-            df_transformado = procesar_llamadas()
+                carga = {"clave": clave_carga, "original": df_original, "transformado": df_transformado}
+                st.session_state["ultima_carga"] = carga
+
+            df_transformado = carga["transformado"]
+
+            st.success("✅ Archivo cargado correctamente")
+            st.subheader("👀 Vista previa de los datos originales")
+            st.dataframe(carga["original"])
+            st.info("📥 Datos guardados en `data/interim/datos_llamadas.csv`")
 
             st.success("✅ Datos transformados correctamente y listos para el forecast.")
+            tardias = df_transformado.attrs.get("filas_tardias", 0)
+            if tardias:
+                st.warning(
+                    f"⚠️ {tardias} filas son de días ya cargados y se descartaron. Si el archivo corrige "
+                    "o completa días anteriores, desmarcá la carga incremental para reprocesar todo."
+                )
+            for col, n in df_transformado.attrs.get("valores_invalidos", {}).items():
+                if n:
+                    st.warning(f"⚠️ {n} valores de `{col}` no se pudieron convertir a segundos y se ignoraron.")
             st.subheader("🧪 Vista previa de datos transformados")
             st.dataframe(df_transformado.head())
 
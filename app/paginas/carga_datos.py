@@ -0,0 +1,5 @@
+# app/paginas/carga_datos.py
+"""Página de carga: subir el Excel de llamadas y procesarlo (no carga modelos ni gráficos)"""
+from app.home import home
+
+home()
@@ -0,0 +1,186 @@
+# app/paginas/forecast.py
+"""Página de forecast por idioma: entrena (o reutiliza) los modelos y proyecta a futuro"""
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from app.cache import cargar_csv, cargar_particiones, entrenar_forecast, indice_forecast
+from app.graficos import IDIOMAS_DETALLE, OPCIONES_PUNTOS, PUNTOS_PANTALLA, figura_forecast, figura_resumen, puntos_figura
+from src.forecast.forecast_global import forecast_futuro_global
+from src.forecast.forecast_multiidioma import forecast_futuro_multiidioma, simular_futuro_multiidioma
+from src.utils.almacenamiento import existe_dataset, guardar_dataset
+from src.utils.instrumentacion import medir
+from src.utils.paths import get_project_root
+
+root_path = str(get_project_root())
+
+path_datos = os.path.join(root_path, "data", "processed", "llamadas_diarias.csv")
+hay_parquet = existe_dataset("llamadas_diarias")
+
+if not hay_parquet and not os.path.exists(path_datos):
+    st.warning("⚠️ No se encontró el archivo procesado.")
+else:
+    if hay_parquet:
+        # Solo se listan las particiones; los datos se leen al generar el forecast
+        particiones = cargar_particiones("llamadas_diarias")
+        clientes = sorted(particiones["cliente"].unique().tolist())
+        idiomas = sorted(particiones["idioma"].unique().tolist())
+    else:
+        df = cargar_csv(path_datos)
+
+        clientes = df["cliente"].unique().tolist()
+        idiomas = df["idioma"].unique().tolist()
+
+    cliente_sel = st.multiselect("Selecciona cliente(s)", clientes, default=clientes)
+    idioma_sel = st.multiselect("Selecciona idioma(s)", idiomas, default=idiomas)
+
+    st.subheader("⏩ Forecast a futuro")
+    col1, col2 = st.columns(2)
+    with col1:
+        cantidad = st.selectbox("Cantidad", list(range(1, 13)), index=1)
+    with col2:
+        unidad = st.selectbox("Unidad de tiempo", ["semanas", "meses"])
+
+    n_dias = cantidad * (5 if unidad == "semanas" else 20)
+
+    modelo_global = st.checkbox(
+        "🌐 Modelo global (un solo modelo para todas las series cliente + idioma)", value=False,
+        help="Entrena un único modelo con cliente e idioma como features. Conviene con muchas series o idiomas de poco volumen."
+    )
+    simular = st.checkbox(
+        "🎲 Bandas por simulación (Monte Carlo)", value=False, disabled=modelo_global,
+        help="IC y percentiles de 2.000 caminos de demanda por idioma (residuos del backtest realimentados en los lags). "
+             "Habilita los FTE P50/P90 en la sección de FTEs. Solo con un modelo por idioma."
+    )
+
+    st.markdown("""
+        <div style="font-size: 0.85rem; line-height: 1.5;">
+        <b>ℹ️ ¿Qué significan las métricas?</b><br><br>
+        • <b>MAE</b> (Mean Absolute Error): mide el error promedio en unidades absolutas. Cuanto menor, mejor.<br>
+        • <b>RMSE</b> (Root Mean Squared Error): penaliza más los errores grandes. Es útil si te importa evitar desviaciones importantes.<br>
+        • <b>MAPE</b> (Mean Absolute Percentage Error): expresa el error en porcentaje respecto al valor real. Puede ser engañoso si hay días con pocas llamadas.
+        </div>
+        """, unsafe_allow_html=True)
+
+    if st.button("Generar Forecast"):
+        # Series indexadas por cliente + idioma (cada idioma es un corte, no un filtro sobre todo el df)
+        # y modelos entrenados: ambos quedan en cache mientras no cambien los datos ni la selección
+        with medir("app.datos") as tramo:
+            datos = indice_forecast(cliente_sel, idioma_sel, path_datos)
+            tramo["series"] = len(datos["bloques"])
+        with medir("app.entrenamiento", series=len(datos["bloques"])):
+            df_forecast, modelos, metricas = entrenar_forecast(datos, cliente_sel, idioma_sel, modelo_global)
+
+        if df_forecast is not None:
+            # Forecast futuro
+            with medir("app.forecast_futuro", iteraciones=n_dias):
+                if modelo_global:
+                    df_future = forecast_futuro_global(modelos, n_dias=n_dias)
+                elif simular:
+                    df_future, simulaciones = simular_futuro_multiidioma(modelos, df_forecast, n_dias=n_dias)
+                else:
+                    df_future = forecast_futuro_multiidioma(modelos, df_forecast, n_dias=n_dias)
+
+            # Caminos simulados para los FTE P50/P90 (solo los de este forecast)
+            if simular and not modelo_global:
+                st.session_state["simulacion_forecast"] = simulaciones
+            else:
+                st.session_state.pop("simulacion_forecast", None)
+
+            # Agregar columna AHT por idioma desde histórico
+            if "aht" in df_forecast.columns:
+                df_aht = df_forecast.groupby("idioma")["aht"].mean().reset_index()
+                df_future = df_future.merge(df_aht, on="idioma", how="left")
+
+            if "aht_x" in df_future.columns and "aht_y" in df_future.columns:
+                df_future["aht"] = df_future["aht_y"]
+                df_future.drop(columns=["aht_x", "aht_y"], inplace=True)
+
+            # Guardar forecast futuro en /data/processed
+            guardar_dataset(df_future, "forecast_futuro")
+
+            # Forecast combinado
+            df_hist_plot = df_forecast[["date", "real", "pred", "ic_95_inf", "ic_95_sup", "idioma"]].copy()
+            df_hist_plot["tipo"] = "Histórico"
+
+            df_future_plot = df_future.copy()
+            df_future_plot["real"] = np.nan
+            df_future_plot["tipo"] = "Futuro"
+
+            df_combinado = pd.concat([df_hist_plot, df_future_plot], ignore_index=True)
+            df_combinado.sort_values(["idioma", "date"], inplace=True)
+
+            # El resultado queda en la sesión: cambiar las opciones de gráficos no lo borra
+            st.session_state["resultado_forecast"] = {
+                "df_combinado": df_combinado, "df_future": df_future, "metricas": metricas,
+                "idiomas": idioma_sel, "clientes": cliente_sel, "cantidad": cantidad, "unidad": unidad, "n_dias": n_dias,
+            }
+        else:
+            st.session_state.pop("resultado_forecast", None)
+            st.error("❌ No se pudo generar el forecast (datos insuficientes).")
+
+    resultado = st.session_state.get("resultado_forecast")
+    if resultado is not None:
+        df_combinado, df_future, idiomas_forecast = resultado["df_combinado"], resultado["df_future"], resultado["idiomas"]
+
+        # --- TABS ---
+        tabs = st.tabs(["📊 Forecast & Métricas", "📈 Tabla Forecast"])
+
+        with tabs[0]:
+            st.subheader("📊 Métricas de evaluación por idioma")
+
+            # Transformar el dict a DataFrame y formatear
+            df_metricas = pd.DataFrame(resultado["metricas"]).T.reset_index()
+            df_metricas.rename(columns={"index": "Idioma"}, inplace=True)
+            df_metricas = df_metricas[["Idioma", "MAE", "RMSE", "MAPE"]].round(1)
+            df_metricas = df_metricas.round(2).sort_values("MAPE")
+
+            st.dataframe(df_metricas, use_container_width=True)
+
+
+            st.subheader("📈 Forecast combinado (Histórico + Futuro)")
+
+            # Puntos por serie según la pantalla (no según la historia) e idiomas con detalle
+            with st.expander("⚙️ Opciones de gráficos"):
+                n_puntos = st.select_slider(
+                    "Puntos por serie", options=OPCIONES_PUNTOS, value=PUNTOS_PANTALLA,
+                    help="Las series más largas se reducen con LTTB conservando su forma."
+                )
+                idiomas_detalle = st.multiselect(
+                    "Idiomas con gráfico detallado (real, predicción e IC 95%)", idiomas_forecast,
+                    default=idiomas_forecast[:IDIOMAS_DETALLE]
+                )
+
+            # Todos los idiomas en una sola figura
+            if len(idiomas_forecast) > 1:
+                with medir("app.grafico_resumen", filas=len(df_combinado), series=len(idiomas_forecast)) as tramo:
+                    fig = figura_resumen(df_combinado, idiomas_forecast, n_puntos)
+                    tramo["puntos"] = puntos_figura(fig)
+                    st.plotly_chart(fig, use_container_width=True)
+
+            for idioma in idiomas_detalle:
+                st.markdown(f"### 📌 Idioma: {idioma}")
+
+                df_idioma = df_combinado[df_combinado["idioma"] == idioma]
+                with medir("app.grafico_forecast", filas=len(df_idioma)) as tramo:
+                    fig = figura_forecast(df_idioma, n_puntos)
+                    tramo["puntos"] = puntos_figura(fig)
+                    st.plotly_chart(fig, use_container_width=True)
+
+
+        with tabs[1]:
+            st.subheader(f"🔮 Forecast futuro ({resultado['cantidad']} {resultado['unidad']} ≈ {resultado['n_dias']} días hábiles)")
+            df_tabla = df_future.copy()
+            columnas_num = [c for c in ["pred", "ic_95_inf", "ic_95_sup", "p10", "p50", "p90"] if c in df_tabla.columns]
+            df_tabla[columnas_num] = df_tabla[columnas_num].round(0).astype(int)
+            st.dataframe(df_tabla)
+
+            csv_fut = df_tabla.to_csv(index=False).encode("utf-8")
+            st.download_button(
+                label="📥 Descargar forecast futuro en CSV",
+                data=csv_fut,
+                file_name=f"forecast_futuro_multi_{'_'.join(resultado['clientes'])}.csv",
+                mime="text/csv"
+            )
@@ -0,0 +1,208 @@
+# app/paginas/fte.py
+"""Página de FTEs con Erlang C sobre el último forecast futuro (no carga los modelos)"""
+import os
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from app.cache import cargar_csv, cargar_dataset
+from app.graficos import figura_fte, puntos_figura
+from src.utils.almacenamiento import existe_dataset, guardar_dataset
+from src.utils.instrumentacion import medir
+from src.utils.paths import get_project_root
+from src.workforce.erlang_calculator import estimar_fte_erlang_c_caminos
+from src.workforce.escenarios_erlang import construir_cubo_escenarios, consultar_cubo
+
+root_path = str(get_project_root())
+
+st.subheader("👥 Estimación de FTEs para todos los idiomas")
+
+path_futuro = os.path.join(root_path, "data", "processed", "forecast_futuro.csv")
+
+if not existe_dataset("forecast_futuro") and not os.path.exists(path_futuro):
+    st.warning("⚠️ Primero generá el forecast futuro desde la pestaña 'Forecast por idioma'.")
+else:
+    if existe_dataset("forecast_futuro"):
+        df_future = cargar_dataset("forecast_futuro").sort_values(["idioma", "date"], ignore_index=True)
+    else:
+        df_future = cargar_csv(path_futuro)
+
+    # Limpieza de columnas duplicadas
+    if "aht_x" in df_future.columns and "aht_y" in df_future.columns:
+        df_future["aht"] = df_future["aht_y"]
+        df_future.drop(columns=["aht_x", "aht_y"], inplace=True)
+
+    if "aht" not in df_future.columns:
+        st.error("⚠️ El archivo no contiene la columna 'aht'.")
+    elif df_future["aht"].dropna().empty:
+        st.warning("⚠️ La columna 'aht' está vacía.")
+    else:
+        idiomas = df_future["idioma"].unique().tolist()
+
+        tabs = st.tabs(["🔧 Parámetros", "📈 Resultados"])
+
+        with tabs[0]:
+            st.markdown("Ajustá los parámetros del modelo Erlang C:")
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                asa = st.number_input("ASA objetivo (segundos)", value=30)
+            with col2:
+                sla = st.slider("SLA objetivo (%)", 30, 100, 70)
+            with col3:
+                shrinkage = st.slider("Shrinkage (%)", 0, 70, 30)
+
+            st.markdown("#### ⚙️ Selección de AHT")
+
+            modo_aht = st.radio(
+                "¿Qué AHT querés usar para calcular FTEs?",
+                ["Usar AHT promedio histórico", "Ingresar AHT manualmente (en segundos)"]
+            )
+
+            aht_personalizado = None
+            if modo_aht == "Ingresar AHT manualmente (en segundos)":
+                aht_personalizado = st.number_input("⏱ AHT personalizado (segundos)", min_value=30, max_value=1800, value=350) # AHT 5 minutos y medio
+
+
+            st.markdown("""
+                ℹ️ **¿Qué significan estos parámetros?**  
+                • **ASA:** Tiempo promedio de espera aceptable  
+                • **SLA:** % de llamadas que deben responderse dentro del ASA  
+                • **Shrinkage:** Tiempo no productivo de los agentes
+            """)
+
+            simulaciones = st.session_state.get("simulacion_forecast")
+            usar_simulacion = simulaciones is not None and st.checkbox(
+                "🎲 Agregar FTE P50/P90 de la simulación", value=True,
+                help="Erlang C sobre cada camino simulado de demanda: P90 = dotación que alcanza en 9 de cada 10 escenarios."
+            )
+
+            if st.button("🔁 Recalcular FTEs para todos los idiomas"):
+                # Filas ordenadas por idioma (en orden de aparición) y fecha dentro de cada idioma
+                df_calc = df_future.iloc[
+                    pd.Categorical(df_future["idioma"], categories=idiomas).argsort(kind="stable")
+                ]
+
+                if "cliente" in df_calc.columns:
+                    cliente_actual = df_calc.groupby("idioma", observed=True)["cliente"].transform("first")
+                else:
+                    cliente_actual = "desconocido"
+
+                llamadas = df_calc["pred"]
+                aht = pd.Series(aht_personalizado, index=df_calc.index) if aht_personalizado else df_calc["aht"]
+                calcular = aht.notna() & (llamadas > 0)
+
+                # Cubo de escenarios precalculado: se rehace solo si el tráfico supera su rango
+                erlangs_max = float((llamadas * aht)[calcular].max() / 32400) if calcular.any() else 0.0
+                cubo = st.session_state.get("cubo_erlang")
+                if cubo is None or cubo["erlangs"][-1] < erlangs_max:
+                    cubo = construir_cubo_escenarios(max(2 * erlangs_max, 50))
+                    st.session_state["cubo_erlang"] = cubo
+
+                fte_result = consultar_cubo(
+                    cubo,
+                    llamadas=llamadas.where(calcular).to_numpy(),
+                    aht_segundos=aht.where(calcular).to_numpy(),
+                    asa_segundos=asa,
+                    sla_pct=sla / 100,
+                    shrinkage_pct=shrinkage / 100
+                )
+
+                df_fte = pd.DataFrame({
+                    "date": df_calc["date"].to_numpy(),
+                    "cliente": cliente_actual if isinstance(cliente_actual, str) else cliente_actual.to_numpy(),
+                    "idioma": df_calc["idioma"].to_numpy(),
+                    "llamadas_estimadas": llamadas.round().to_numpy(),
+                    "aht (seg)": aht.round(2).to_numpy(),
+                    "fte_estimado": pd.array(fte_result["fte_ajustado"], dtype="Int64"),
+                    "fte_neto": pd.array(fte_result["fte_neto"], dtype="Int64"),
+                    "sla_estimado": fte_result["sla_estimado"],
+                    "erlangs": fte_result["erlangs"]
+                })
+
+                # Distribución de FTE por día: todos los caminos simulados en una evaluación con el cubo
+                idiomas_sim = [i for i in idiomas if usar_simulacion and i in simulaciones]
+                if idiomas_sim:
+                    aht_idioma = aht.groupby(df_calc["idioma"].to_numpy()).mean()
+                    riesgo = estimar_fte_erlang_c_caminos(
+                        np.stack([simulaciones[i]["caminos"] for i in idiomas_sim]),
+                        aht_segundos=aht_idioma.reindex(idiomas_sim).to_numpy(),
+                        asa_segundos=asa,
+                        sla_pct=sla / 100,
+                        shrinkage_pct=shrinkage / 100,
+                        evaluar=partial(consultar_cubo, cubo)
+                    )
+                    df_riesgo = pd.DataFrame({
+                        "date": np.concatenate([simulaciones[i]["fechas"] for i in idiomas_sim]),
+                        "idioma": np.repeat(idiomas_sim, [len(simulaciones[i]["fechas"]) for i in idiomas_sim]),
+                        "fte_p50": pd.array(riesgo["fte_p50"].ravel(), dtype="Int64"),
+                        "fte_p90": pd.array(riesgo["fte_p90"].ravel(), dtype="Int64"),
+                    })
+                    df_fte = df_fte.merge(df_riesgo, on=["date", "idioma"], how="left")
+                st.session_state["df_fte_resultado"] = df_fte
+                guardar_dataset(df_fte, "fte_resultados")
+
+        with tabs[1]:
+            df_fte = st.session_state.get("df_fte_resultado", None)
+
+            if df_fte is not None and not df_fte["fte_estimado"].dropna().empty:
+                st.markdown("### 🧾 Estimación de FTEs por idioma")
+
+                # 📊 KPIs por idioma en formato tabla
+                df_resumen = (
+                    df_fte.groupby("idioma")["fte_estimado"]
+                    .agg(Mínimo="min", Máximo="max", Promedio="mean")
+                    .reset_index()
+                    .round(2)
+                    .sort_values("Promedio", ascending=False)
+                )
+
+                # 🔢 Indicadores globales
+                fte_total = df_resumen["Promedio"].sum()
+                sla_promedio = df_fte["sla_estimado"].mean()
+
+                st.markdown("#### 📈 Indicadores globales")
+                col1, col2, col3 = st.columns(3)
+                col1.metric("👥 Suma de FTE Promedios", f"{fte_total:.2f}")
+                col2.metric("📶 SLA Promedio Estimado", f"{sla_promedio:.1%}")
+                if "fte_p90" in df_fte.columns:
+                    fte_p90_total = df_fte.groupby("idioma")["fte_p90"].mean().sum()
+                    col3.metric("🎲 Suma de FTE P90 Promedios", f"{fte_p90_total:.2f}",
+                                help="Dotación que cubre la demanda en 9 de cada 10 caminos simulados")
+
+                # 🧾 Tabla resumen por idioma
+                st.markdown("#### 📊 Resumen de FTEs estimados por idioma")
+                st.dataframe(df_resumen, use_container_width=True)
+
+                # 📋 Detalle por fecha
+                st.markdown("#### 📋 Detalle FTEs estimados por idioma y fecha")
+                st.dataframe(df_fte, use_container_width=True)
+
+
+
+                # Verificamos si hay datos
+                if not df_fte.empty:
+                    st.markdown("#### 📈 Evolución diaria de FTEs por idioma")
+
+                    idiomas_fte = df_fte["idioma"].unique().tolist()
+                    idiomas_grafico = st.multiselect("Idiomas en el gráfico", idiomas_fte, default=idiomas_fte)
+
+                    with medir("app.grafico_fte", filas=len(df_fte), series=len(idiomas_grafico)) as tramo:
+                        # Una figura para todos los idiomas, con mínimo/máximo por cubeta si hay muchos días
+                        fig = figura_fte(df_fte, idiomas_grafico)
+                        tramo["puntos"] = puntos_figura(fig)
+                        st.plotly_chart(fig, use_container_width=True)
+
+
+                # 📥 Botón de descarga
+                csv_fte = df_fte.to_csv(index=False).encode("utf-8")
+                st.download_button(
+                    label="📥 Descargar todos los FTEs en CSV",
+                    data=csv_fte,
+                    file_name="fte_forecast_todos_idiomas.csv",
+                    mime="text/csv"
+                )
+            else:
+                st.info("🔄 Generá los FTEs desde la pestaña anterior para ver resultados.")
@@ -0,0 +1,109 @@
+# src/benchmark/datos_sinteticos.py
+"""
+Generador de llamadas sintéticas por intervalo con el formato de `data/interim/datos_llamadas.csv`
+(Date Time, Cliente, Idioma, Offered, AHT, Talk (avg)), para medir el pipeline a distintas escalas.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+IDIOMAS = ["EN", "ES", "FR", "DE", "IT", "PT", "NL", "JA", "ZH", "AR"]
+
+# Escalas predefinidas: clientes x idiomas x días x intervalos por día
+ESCALAS = {
+    "mini": {"clientes": 2, "idiomas": 2, "dias": 120, "intervalos": 9},
+    "chica": {"clientes": 5, "idiomas": 3, "dias": 365, "intervalos": 9},
+    "mediana": {"clientes": 20, "idiomas": 5, "dias": 730, "intervalos": 9},
+    "grande": {"clientes": 50, "idiomas": 8, "dias": 730, "intervalos": 48},
+    # ~47 millones de filas (3,4x `grande`): 3 años en intervalos de 5 minutos
+    "enorme": {"clientes": 50, "idiomas": 8, "dias": 1095, "intervalos": 108},
+}
+
+# Filas por bloque al escribir el CSV: la memoria no depende de la escala
+FILAS_POR_BLOQUE = 2_000_000
+
+FECHA_FIN = pd.Timestamp("2025-06-30")
+
+
+def filas_escala(escala):
+    return escala["clientes"] * escala["idiomas"] * escala["dias"] * escala["intervalos"]
+
+
+def _duraciones(segundos, maximo=3600):
+    """Segundos enteros a texto HH:MM:SS como categórica (una categoría por segundo, sin formatear fila por fila)"""
+    tabla = [f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in range(maximo + 1)]
+    return pd.Categorical.from_codes(np.clip(segundos, 0, maximo), categories=tabla)
+
+
+def _nombres(clientes, idiomas):
+    nombres_clientes = [f"CLIENTE_{i:03d}" for i in range(clientes)]
+    nombres_idiomas = [
+        IDIOMAS[i % len(IDIOMAS)] + (str(i // len(IDIOMAS)) if i >= len(IDIOMAS) else "") for i in range(idiomas)
+    ]
+    return nombres_clientes, nombres_idiomas
+
+
+def generar_llamadas(clientes=2, idiomas=2, dias=120, intervalos=9, semilla=42, fecha_fin=FECHA_FIN, series=None):
+    """
+    DataFrame crudo de `clientes` x `idiomas` series con `dias` días corridos (incluye fines de semana)
+    y `intervalos` por día desde las 9:00 (de hora en hora si son 9, si no repartidos en la jornada).
+
+    Cada serie tiene su nivel, tendencia y estacionalidad semanal; el perfil intradía es una
+    campana y las llamadas siguen una Poisson. Cada serie sale de su propia semilla, así que
+    `series` (números de serie, por defecto todas) permite generar por partes los mismos datos.
+    """
+    series = np.arange(clientes * idiomas) if series is None else np.asarray(series)
+    nombres_clientes, nombres_idiomas = _nombres(clientes, idiomas)
+
+    fechas = pd.date_range(end=fecha_fin, periods=dias, freq="D")
+    paso = 3600 if intervalos == 9 else 32400 // intervalos
+    desplazamientos = np.timedelta64(9 * 3600, "s") + np.arange(intervalos) * np.timedelta64(paso, "s")
+    date_time = (fechas.to_numpy()[:, None] + desplazamientos[None, :]).ravel()
+
+    semanal = np.array([1.25, 1.0, 1.0, 1.0, 0.95, 0.6, 0.5])[fechas.dayofweek.to_numpy()]
+    posicion = (np.arange(intervalos) + 0.5) / intervalos
+    intradia = np.exp(-((posicion - 0.45) ** 2) / 0.08)
+    intradia /= intradia.sum()
+
+    # Llamadas y AHT por serie x día x intervalo
+    offered = np.empty((len(series), dias * intervalos), dtype=np.int64)
+    aht = np.empty((len(series), dias * intervalos), dtype=np.int64)
+    for fila, id_serie in enumerate(series):
+        rng = np.random.default_rng([semilla, int(id_serie)])
+        nivel = rng.lognormal(mean=np.log(150), sigma=0.6)
+        tendencia = 1 + rng.normal(0, 0.15) * np.linspace(0, 1, dias)
+        ruido_dia = rng.normal(1, 0.08, size=dias).clip(0.5, None)
+        esperadas = (nivel * tendencia * semanal * ruido_dia)[:, None] * intradia[None, :]
+        offered[fila] = rng.poisson(esperadas.clip(0, None)).ravel()
+        aht[fila] = (rng.normal(330, 40) + rng.normal(0, 60, size=esperadas.size)).clip(30, 3000)
+
+    por_serie = dias * intervalos
+    return pd.DataFrame({
+        "Date Time": np.tile(date_time, len(series)),
+        "Cliente": pd.Categorical.from_codes(np.repeat(series // idiomas, por_serie), categories=nombres_clientes),
+        "Idioma": pd.Categorical.from_codes(np.repeat(series % idiomas, por_serie), categories=nombres_idiomas),
+        "Offered": offered.ravel(),
+        "AHT": _duraciones(aht.ravel()),
+        "Talk (avg)": _duraciones((aht.ravel() * 0.8).astype(np.int64)),
+    })
+
+
+def escribir_csv(path, semilla=42, filas_por_bloque=FILAS_POR_BLOQUE, **escala):
+    """
+    Genera y guarda el CSV crudo por bloques de series de hasta `filas_por_bloque` filas (al
+    menos una serie), así la memoria no depende del tamaño total.
+    Si el archivo ya existe lo reutiliza: el nombre debe identificar escala y semilla.
+    """
+    path = str(path)
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    n_series = escala["clientes"] * escala["idiomas"]
+    series_por_bloque = max(1, filas_por_bloque // (escala["dias"] * escala["intervalos"]))
+    for inicio in range(0, n_series, series_por_bloque):
+        bloque = generar_llamadas(semilla=semilla, series=np.arange(inicio, min(inicio + series_por_bloque, n_series)), **escala)
+        bloque.to_csv(tmp_path, index=False, header=inicio == 0, mode="w" if inicio == 0 else "a", date_format="%Y-%m-%d %H:%M:%S")
+    os.replace(tmp_path, path)
+    return path
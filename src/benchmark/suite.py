@@ -0,0 +1,248 @@
+# src/benchmark/suite.py
+"""
+Benchmark del pipeline con datos sintéticos a varias escalas:
+
+    python -m src.benchmark.suite --escalas mini chica
+    python -m src.benchmark.suite --escalas mini chica mediana --actualizar-base
+
+Mide el ETL (`agregar_llamadas`), el feature store, el entrenamiento de `forecast_idioma`,
+el forecast futuro (`forecast_futuro_lote`), Erlang C (por lote, fila a fila y en serie con
+arranque en caliente, que se verifica contra el arranque en frío) y el modo
+intradía (agregación por intervalo, perfiles, reparto y Erlang C por intervalo).
+Guarda los resultados en JSON y los compara con la línea base para marcar regresiones
+(sale con código 1 si hay alguna).
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import sklearn
+import xgboost
+
+from src.benchmark.datos_sinteticos import ESCALAS, escribir_csv, filas_escala
+from src.etl.transform_calls import FILAS_POR_BLOQUE, agregar_intervalos, agregar_llamadas
+from src.forecast.feature_store import construir_feature_store
+from src.forecast.forecast_futuro import forecast_futuro_lote
+from src.forecast.forecast_module import forecast_idioma
+from src.forecast.intradia import fte_intervalos, perfiles_intradia, repartir_intradia
+from src.utils.indice_series import indexar_series
+from src.utils.paths import get_project_root
+from src.workforce.erlang_calculator import (
+    estimar_fte_erlang_c,
+    estimar_fte_erlang_c_lote,
+    estimar_fte_erlang_c_serie,
+)
+
+COLUMNAS_FORECAST = ["date", "cliente", "idioma", "y", "aht"]
+
+# Diferencia mínima (segundos) para marcar una regresión: por debajo es ruido de medición
+PISO_REGRESION = 0.005
+
+
+def get_benchmark_dir():
+    return get_project_root() / "benchmarks"
+
+
+def _cronometrar(funcion, repeticiones):
+    """Corre `funcion` `repeticiones` veces; devuelve (tiempos en segundos, último resultado)"""
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos, resultado
+
+
+def _registro(tiempos, unidades):
+    mejor = min(tiempos)
+    return {
+        "segundos": round(mejor, 6),
+        "mediana": round(float(np.median(tiempos)), 6),
+        "repeticiones": len(tiempos),
+        "unidades": int(unidades),
+        "por_unidad_ms": round(mejor / max(unidades, 1) * 1000, 6),
+    }
+
+
+def medir_escala(escala, repeticiones=5, max_series=10, n_dias=20, semilla=42, dir_datos=None):
+    """
+    Mide todas las etapas para una escala (dict de `ESCALAS`). Devuelve {etapa: registro}
+    con el mejor tiempo, la mediana y el tiempo por unidad (filas o series según la etapa).
+    """
+    dir_datos = dir_datos or get_benchmark_dir() / "datos"
+    nombre = "x".join(str(escala[k]) for k in ["clientes", "idiomas", "dias", "intervalos"])
+    path = escribir_csv(dir_datos / f"llamadas_{nombre}_s{semilla}.csv", semilla=semilla, **escala)
+    resultados = {}
+
+    # 1. ETL: lectura por bloques + agregación diaria + lags (sin escribir en data/processed)
+    tiempos, (df_diario, *_) = _cronometrar(lambda: agregar_llamadas(path, FILAS_POR_BLOQUE), repeticiones)
+    resultados["etl"] = _registro(tiempos, filas_escala(escala))
+
+    # 2. Feature store de todas las series
+    datos = indexar_series(df_diario[COLUMNAS_FORECAST])
+    tiempos, store = _cronometrar(lambda: construir_feature_store(datos), repeticiones)
+    resultados["feature_store"] = _registro(tiempos, len(datos["bloques"]))
+
+    # 3. Entrenamiento + backtest de hasta `max_series` series (sin registro de modelos: entrena siempre)
+    pares = sorted(datos["bloques"])[:max_series]
+    fecha_inicio = df_diario["date"].min()
+
+    def entrenar():
+        store["cache"].clear()
+        return {
+            par: forecast_idioma(datos, par[1], [par[0]], fecha_inicio=fecha_inicio, usar_registro=False, store=store)
+            for par in pares
+        }
+
+    tiempos, salidas = _cronometrar(entrenar, repeticiones)
+    salidas = {par: salida for par, salida in salidas.items() if salida[0] is not None}
+    resultados["entrenamiento"] = _registro(tiempos, len(salidas))
+
+    # 4. Forecast futuro recursivo de las series entrenadas
+    modelos = {par: salida[1] for par, salida in salidas.items()}
+    historicos = {par: salida[0].set_index("date").rename(columns={"real": "y"}) for par, salida in salidas.items()}
+    tiempos, _ = _cronometrar(lambda: forecast_futuro_lote(modelos, historicos, n_dias=n_dias), repeticiones)
+    resultados["forecast_futuro"] = _registro(tiempos, len(modelos) * n_dias)
+
+    # 5. Erlang C sobre todos los días de todas las series: vectorizado y fila a fila (muestra)
+    llamadas = df_diario["y"].to_numpy(dtype=float)
+    aht = df_diario["aht"].to_numpy(dtype=float)
+    tiempos, _ = _cronometrar(lambda: estimar_fte_erlang_c_lote(llamadas, aht), repeticiones)
+    resultados["erlang_lote"] = _registro(tiempos, len(llamadas))
+
+    muestra = min(len(llamadas), 2000)
+    tiempos, _ = _cronometrar(
+        lambda: [estimar_fte_erlang_c(llamadas[i], aht[i]) for i in range(muestra)], repeticiones
+    )
+    resultados["erlang_escalar"] = _registro(tiempos, muestra)
+
+    # Arranque en caliente (holgura del día anterior): tiene que dar lo mismo que en frío
+    tiempos, serie = _cronometrar(lambda: estimar_fte_erlang_c_serie(llamadas[:muestra], aht[:muestra]), repeticiones)
+    frio = estimar_fte_erlang_c_lote(llamadas[:muestra], aht[:muestra])["fte_neto"]
+    distintos = int(np.sum(np.array([r["fte_neto"] for r in serie]) != frio))
+    if distintos:
+        raise ValueError(f"El arranque en caliente difiere del arranque en frío en {distintos} de {muestra} días")
+    resultados["erlang_serie"] = _registro(tiempos, muestra)
+
+    # 6. Intradía: llamadas por intervalo y, con los últimos `n_dias` reales como forecast,
+    #    perfiles + reparto + Erlang C de todos los intervalos
+    tiempos, df_intervalos = _cronometrar(lambda: agregar_intervalos(path, filas_por_bloque=FILAS_POR_BLOQUE), repeticiones)
+    resultados["etl_intervalos"] = _registro(tiempos, filas_escala(escala))
+
+    df_dias = df_diario.groupby(["cliente", "idioma"]).tail(n_dias).rename(columns={"y": "pred"})
+    tiempos, df_fte = _cronometrar(
+        lambda: fte_intervalos(repartir_intradia(df_dias, perfiles_intradia(df_intervalos))), repeticiones
+    )
+    resultados["intradia"] = _registro(tiempos, len(df_fte))
+    return resultados
+
+
+def correr_suite(escalas=("mini", "chica"), repeticiones=5, max_series=10, n_dias=20, semilla=42):
+    """Mide todas las escalas pedidas; devuelve el dict con metadatos y resultados (lo que se guarda en JSON)"""
+    resultados = {}
+    for nombre in escalas:
+        escala = ESCALAS[nombre]
+        print(f"⏱️ Escala '{nombre}': {filas_escala(escala):,} filas ({escala})")
+        # Las escalas grandes se miden una sola vez
+        reps = repeticiones if filas_escala(escala) <= 1_000_000 else 1
+        resultados[nombre] = medir_escala(escala, reps, max_series, n_dias, semilla)
+
+    return {
+        "meta": {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "maquina": platform.node(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "python": platform.python_version(),
+            "versiones": {
+                "numpy": np.__version__, "pandas": pd.__version__,
+                "xgboost": xgboost.__version__, "sklearn": sklearn.__version__,
+            },
+            "semilla": semilla,
+            "escalas": {nombre: ESCALAS[nombre] for nombre in escalas},
+        },
+        "resultados": resultados,
+    }
+
+
+def comparar(actual, base, tolerancia=0.25):
+    """
+    Compara dos corridas (mismo formato que `correr_suite`) por escala y etapa, con el mejor tiempo.
+    Es regresión si el tiempo crece más que `tolerancia` (proporción) y más que `PISO_REGRESION`.
+    """
+    filas = []
+    for escala, etapas in actual["resultados"].items():
+        for etapa, registro in etapas.items():
+            previo = base.get("resultados", {}).get(escala, {}).get(etapa)
+            if previo is None:
+                filas.append({"escala": escala, "etapa": etapa, "base_s": None, "actual_s": registro["segundos"],
+                              "cambio": None, "estado": "nuevo"})
+                continue
+            cambio = registro["segundos"] / previo["segundos"] - 1 if previo["segundos"] > 0 else 0.0
+            diferencia = registro["segundos"] - previo["segundos"]
+            if cambio > tolerancia and diferencia > PISO_REGRESION:
+                estado = "🔴 regresión"
+            elif cambio < -tolerancia and -diferencia > PISO_REGRESION:
+                estado = "🟢 mejora"
+            else:
+                estado = "igual"
+            filas.append({"escala": escala, "etapa": etapa, "base_s": previo["segundos"],
+                          "actual_s": registro["segundos"], "cambio": round(cambio * 100, 1), "estado": estado})
+    return pd.DataFrame(filas, columns=["escala", "etapa", "base_s", "actual_s", "cambio", "estado"])
+
+
+def _guardar_json(datos, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline con datos sintéticos")
+    parser.add_argument("--escalas", nargs="+", default=["mini", "chica"], choices=list(ESCALAS))
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--max-series", type=int, default=10, help="Series que se entrenan por escala")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", default=str(get_benchmark_dir() / "ultimo.json"))
+    parser.add_argument("--linea-base", default=str(get_benchmark_dir() / "linea_base.json"))
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Aumento relativo que cuenta como regresión")
+    parser.add_argument("--actualizar-base", action="store_true", help="Guardar esta corrida como nueva línea base")
+    args = parser.parse_args(argv)
+
+    actual = correr_suite(args.escalas, args.repeticiones, args.max_series, semilla=args.semilla)
+    _guardar_json(actual, args.salida)
+
+    tabla = pd.DataFrame([
+        {"escala": escala, "etapa": etapa, **registro}
+        for escala, etapas in actual["resultados"].items() for etapa, registro in etapas.items()
+    ])
+    print(tabla.to_string(index=False))
+    print(f"💾 Resultados en {args.salida}")
+
+    hay_regresion = False
+    if os.path.exists(args.linea_base):
+        with open(args.linea_base, encoding="utf-8") as f:
+            base = json.load(f)
+        if base["meta"].get("maquina") != actual["meta"]["maquina"] or base["meta"].get("versiones") != actual["meta"]["versiones"]:
+            print("⚠️ La línea base es de otra máquina o de otras versiones: la comparación es orientativa")
+        comparacion = comparar(actual, base, args.tolerancia)
+        print(f"\n📊 Comparación con {args.linea_base} (tolerancia {args.tolerancia:.0%})")
+        print(comparacion.to_string(index=False))
+        hay_regresion = (comparacion["estado"] == "🔴 regresión").any()
+
+    if args.actualizar_base or not os.path.exists(args.linea_base):
+        _guardar_json(actual, args.linea_base)
+        print(f"📌 Línea base guardada en {args.linea_base}")
+
+    return 1 if hay_regresion else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,63 +1,430 @@
 import pandas as pd
+import numpy as np
 import os
+import json
+from collections import Counter
 from pathlib import Path
 import re
 
-def parse_timedelta_to_seconds(val):
-    try:
-        return pd.to_timedelta(val).total_seconds()
-    except:
-        return None
+from src.utils.almacenamiento import actualizar_dataset, existe_dataset, guardar_dataset, leer_dataset
+from src.utils.instrumentacion import medido, medir
+
+CLAVES = ["cliente", "idioma"]
+LAGS = [1, 2, 3, 4, 5]
+
+# Columnas del export crudo que se leen (nombres normalizados) y filas por bloque de lectura
+COLUMNAS_CRUDAS = {"date_time", "cliente", "idioma", "offered", "aht", "talk_(avg)"}
+FILAS_POR_BLOQUE = 500_000
+
+
+# AHT promedio acumulado vigente por serie (lo escribe cada carga, completa o incremental)
+AHT_SERIES = "aht_series"
+
 
-def procesar_llamadas():
+def get_estado_path():
     root_dir = Path(__file__).resolve().parents[2]
-    input_path = root_dir / "data" / "interim" / "datos_llamadas.csv"
-    output_path = root_dir / "data" / "processed" / "llamadas_diarias.csv"
+    return root_dir / "data" / "processed" / "etl_estado.json"
+
+
+def a_segundos(serie):
+    """
+    Convierte una columna de duraciones ('00:03:10', timedelta, ...) a segundos con una
+    sola conversión vectorizada sobre los valores distintos (en un export se repiten mucho).
+    Devuelve (segundos, cantidad de valores no convertibles).
+    """
+    codigos, unicos = pd.factorize(serie)
+    segundos_unicos = pd.to_timedelta(pd.Series(unicos, dtype=object), errors="coerce").dt.total_seconds()
+    # El código -1 (vacío) cae en el NaN agregado al final
+    segundos = np.append(segundos_unicos.to_numpy(), np.nan)[codigos]
+    return pd.Series(segundos, index=serie.index), int(np.isnan(segundos[codigos >= 0]).sum())
+
 
-    df = pd.read_csv(input_path)
+def _nombre_columna(col):
+    return col.lower().strip().replace(" ", "_")
 
+
+def _leer_crudo(input_path, filas_por_bloque):
+    """Lee solo las columnas que usa la agregación, en bloques de `filas_por_bloque` filas (None: de una vez)"""
+    columnas = pd.read_csv(input_path, nrows=0).columns
+    usar = [c for c in columnas if _nombre_columna(c) in COLUMNAS_CRUDAS]
+    lector = pd.read_csv(input_path, usecols=usar, chunksize=filas_por_bloque)
+    return [lector] if filas_por_bloque is None else lector
+
+
+def _normalizar(df, invalidos):
+    """Nombres de columnas, AHT en segundos y fecha/hora parseada; suma a `invalidos` lo no convertible"""
     # Normalizar nombres de columnas
-    df.columns = [c.lower().strip().replace(" ", "_") for c in df.columns]
+    df.columns = [_nombre_columna(c) for c in df.columns]
 
     # Convertir AHT desde string/timedelta a segundos
     if "aht" in df.columns:
-        df["aht"] = df["aht"].apply(parse_timedelta_to_seconds)
+        df["aht"], invalidos["aht"] = a_segundos(df["aht"])
 
     # Convertir otros campos opcionales si querés conservarlos
     if "talk_(avg)" in df.columns:
-        df["talk_avg"] = df["talk_(avg)"].apply(parse_timedelta_to_seconds)
+        df["talk_avg"], invalidos["talk_(avg)"] = a_segundos(df["talk_(avg)"])
+
+    # Fecha/hora completa (para la marca de agua) y columna 'date' a nivel día
+    df["date_time"] = pd.to_datetime(df["date_time"])
+    df["date"] = df["date_time"].dt.normalize()
+    return df
+
 
-    # Crear columna 'date' y filtrar solo días hábiles
-    df["date"] = pd.to_datetime(df["date_time"]).dt.date
-    df["date"] = pd.to_datetime(df["date"])
+def _agregar_bloque(df, marcas_previas=None):
+    """
+    Agregados parciales de un bloque: marca de agua, suma/cantidad de AHT y llamadas por día,
+    más la cantidad de filas descartadas por tardías.
+    Con `marcas_previas` solo cuentan las filas posteriores a la marca de agua de su serie.
+    """
+    # Filtrar solo días hábiles (la marca de agua sale de las filas que se agregan)
     df = df[df["date"].dt.weekday < 5]
 
-    # Calcular AHT promedio por cliente + idioma
-    df_aht_promedio = df.groupby(["cliente", "idioma"])["aht"].mean().reset_index()
+    tardias = 0
+    if marcas_previas is not None:
+        df = df.merge(marcas_previas, on=CLAVES, how="left")
+        nuevas = df["marca_agua"].isna() | (df["date_time"] > df["marca_agua"])
+        tardias = int((~nuevas).sum())
+        df = df[nuevas]
 
-    # Agrupación diaria de llamadas ofrecidas
-    df_grouped = df.groupby(["date", "cliente", "idioma"]).agg({"offered": "sum"}).reset_index()
-    df_grouped.rename(columns={"offered": "y"}, inplace=True)
+    marcas = df.groupby(CLAVES)["date_time"].max()
+    aht = df.groupby(CLAVES)["aht"].agg(["sum", "count"])
+    diario = df.groupby(["date", "cliente", "idioma"])["offered"].sum()
+    return marcas, aht, diario, tardias
+
+
+def _leer_agregados(input_path, filas_por_bloque, marcas_previas=None):
+    """
+    Recorre el CSV crudo por bloques y combina los agregados parciales al final, así la
+    memoria depende del tamaño del bloque y no del archivo.
+    Devuelve (marcas de agua, suma/cantidad de AHT, llamadas diarias, valores no convertibles,
+    filas hábiles descartadas por no ser posteriores a la marca de agua de su serie).
+    """
+    parciales = []
+    invalidos = Counter()
+    with medir("etl.lectura", filas=0, iteraciones=0) as tramo:
+        for bloque in _leer_crudo(input_path, filas_por_bloque):
+            bloque_invalidos = {}
+            bloque = _normalizar(bloque, bloque_invalidos)
+            invalidos.update(bloque_invalidos)
+            parciales.append(_agregar_bloque(bloque, marcas_previas))
+            tramo["filas"] += len(bloque)
+            tramo["iteraciones"] += 1
+
+    for col, n in invalidos.items():
+        if n:
+            print(f"⚠️ {n} valores de '{col}' no se pudieron convertir a segundos (quedan vacíos)")
+
+    marcas = pd.concat([p[0] for p in parciales]).groupby(level=CLAVES).max()
+    aht_acum = pd.concat([p[1] for p in parciales]).groupby(level=CLAVES).sum()
+    df_diario = (
+        pd.concat([p[2] for p in parciales]).groupby(level=["date"] + CLAVES).sum()
+        .rename("y").reset_index()
+    )
+    tardias = sum(p[3] for p in parciales)
+    if tardias:
+        print(f"⚠️ {tardias} filas no son posteriores a la última carga de su serie y se descartaron "
+              "(para cargar días corregidos usar el procesamiento completo)")
+    return marcas, aht_acum, df_diario, dict(invalidos), tardias
 
-    # Agregar AHT promedio
-    df_grouped = df_grouped.merge(df_aht_promedio, on=["cliente", "idioma"], how="left")
 
-    # Agregar features
+def _agregar_features(df_grouped):
+    """Features de calendario y lags por cliente + idioma; descarta filas sin lags"""
     df_grouped["dayofweek"] = df_grouped["date"].dt.dayofweek
     df_grouped["is_month_end"] = df_grouped["date"].dt.is_month_end.astype(int)
 
     # Crear lags
     df_grouped = df_grouped.sort_values(["cliente", "idioma", "date"])
-    for lag in [1, 2, 3, 4, 5]:
-        df_grouped[f"lag_{lag}"] = df_grouped.groupby(["cliente", "idioma"])["y"].shift(lag)
+    for lag in LAGS:
+        df_grouped[f"lag_{lag}"] = df_grouped.groupby(CLAVES)["y"].shift(lag)
 
     # Filtrar filas sin lags
-    lag_cols = [f"lag_{i}" for i in range(1, 6)]
-    df_grouped.dropna(subset=lag_cols, inplace=True)
+    lag_cols = [f"lag_{i}" for i in LAGS]
+    return df_grouped.dropna(subset=lag_cols)
 
-    # Guardar archivo final
-    os.makedirs(output_path.parent, exist_ok=True)
-    df_grouped.to_csv(output_path, index=False)
-    print(f"✅ Dataset procesado guardado en {output_path}")
+
+def _aht_promedio(aht_acum):
+    return (aht_acum["sum"] / aht_acum["count"].where(aht_acum["count"] > 0)).rename("aht")
+
+
+def agregar_llamadas(input_path, filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Parte en memoria de `procesar_llamadas` sobre cualquier CSV crudo (sin guardar nada).
+    Devuelve (df diario con AHT y lags, marcas de agua, AHT acumulado, llamadas diarias).
+    """
+    # Agrupación diaria de llamadas ofrecidas y AHT acumulado por cliente + idioma (días hábiles)
+    marcas, aht_acum, df_base, invalidos, _ = _leer_agregados(input_path, filas_por_bloque)
+
+    # Agregar AHT promedio
+    df_grouped = df_base.merge(_aht_promedio(aht_acum).reset_index(), on=["cliente", "idioma"], how="left")
+
+    # Agregar features + lags
+    df_grouped = _agregar_features(df_grouped)
+    df_grouped.attrs["valores_invalidos"] = invalidos
+    return df_grouped, marcas, aht_acum, df_base
+
+
+@medido("procesar_llamadas", contar=lambda df, *a, **k: {"filas": len(df), "series": df.groupby(CLAVES, observed=True).ngroups})
+def procesar_llamadas(exportar_csv=True, filas_por_bloque=FILAS_POR_BLOQUE):
+    root_dir = Path(__file__).resolve().parents[2]
+    input_path = root_dir / "data" / "interim" / "datos_llamadas.csv"
+    output_path = root_dir / "data" / "processed" / "llamadas_diarias.csv"
+
+    df_grouped, marcas, aht_acum, df_base = agregar_llamadas(input_path, filas_por_bloque)
+
+    # Guardar dataset final en Parquet particionado por cliente/idioma (lo que lee la app)
+    with medir("etl.escritura", filas=len(df_grouped)):
+        # Un archivo por mes en cada serie: las cargas incrementales reescriben solo el mes actual
+        dataset_path = guardar_dataset(df_grouped, "llamadas_diarias", archivos_por_mes="date")
+        print(f"✅ Dataset procesado guardado en {dataset_path}")
+
+        # Copia en CSV para los notebooks
+        if exportar_csv:
+            os.makedirs(output_path.parent, exist_ok=True)
+            df_grouped.to_csv(output_path, index=False)
+
+    # Marcas de agua para las siguientes cargas incrementales
+    estado = _estado_desde(marcas, aht_acum, df_base)
+    _guardar_estado(estado)
+    _guardar_aht_series(estado)
 
     return df_grouped
+
+
+def leer_llamadas_diarias(columnas=None, filtros=None):
+    """
+    `leer_dataset("llamadas_diarias")` con el AHT promedio acumulado vigente de cada serie.
+    Las cargas incrementales no reescriben los días ya guardados, así que su columna `aht`
+    queda con el promedio de su carga; el vigente está en el dataset chico `aht_series`.
+    """
+    extra = [c for c in CLAVES if columnas is not None and c not in columnas]
+    df = leer_dataset("llamadas_diarias", columnas=None if columnas is None else list(columnas) + extra, filtros=filtros)
+    if "aht" in df.columns and existe_dataset(AHT_SERIES):
+        aht = leer_dataset(AHT_SERIES).astype({"cliente": str, "idioma": str}).set_index(CLAVES)["aht"]
+        vigente = aht.reindex(pd.MultiIndex.from_arrays([df["cliente"].astype(str), df["idioma"].astype(str)])).to_numpy()
+        df["aht"] = np.where(np.isnan(vigente), df["aht"].to_numpy(dtype=float), vigente)
+    return df.drop(columns=extra)
+
+
+# --- Carga incremental ---
+
+def _clave(cliente, idioma):
+    return f"{cliente}|{idioma}"
+
+
+def _estado_desde(marcas, aht_acum, df_diario, estado=None):
+    """
+    Estado por cliente + idioma: marca de agua (última fecha/hora ingerida), suma y cantidad
+    de AHT para el promedio acumulado y los últimos días agregados (para recalcular lags).
+    """
+    estado = dict(estado or {})
+    # Un día más que el lag máximo: el último día puede estar incompleto y recibir más filas
+    df_cola = df_diario.sort_values("date").groupby(CLAVES).tail(max(LAGS) + 1)
+    colas = {
+        _clave(*k): [[str(d.date()), y] for d, y in zip(g["date"], g["y"].tolist())]
+        for k, g in df_cola.groupby(CLAVES)
+    }
+    for (cliente, idioma), marca in marcas.items():
+        clave = _clave(cliente, idioma)
+        previo = estado.get(clave, {})
+        suma, cantidad = aht_acum.loc[(cliente, idioma)] if (cliente, idioma) in aht_acum.index else (0.0, 0)
+        estado[clave] = {
+            "cliente": cliente,
+            "idioma": idioma,
+            "marca_agua": str(max(pd.Timestamp(marca), pd.Timestamp(previo.get("marca_agua", marca)))),
+            "aht_suma": float(suma),
+            "aht_n": int(cantidad),
+            "cola": colas.get(clave, previo.get("cola", [])),
+        }
+    return estado
+
+
+def _cargar_estado():
+    path = get_estado_path()
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _guardar_estado(estado):
+    path = get_estado_path()
+    os.makedirs(path.parent, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(estado, f, ensure_ascii=False, indent=1)
+
+
+def _guardar_aht_series(estado):
+    """AHT promedio acumulado de todas las series del estado (una fila por serie, sin particiones)"""
+    df_aht = pd.DataFrame(
+        [(e["cliente"], e["idioma"], e["aht_suma"] / e["aht_n"] if e["aht_n"] else np.nan) for e in estado.values()],
+        columns=CLAVES + ["aht"]
+    )
+    guardar_dataset(df_aht, AHT_SERIES, particiones=())
+
+
+@medido("procesar_llamadas_incremental", contar=lambda df, *a, **k: {"filas": len(df), "series": df.groupby(CLAVES, observed=True).ngroups})
+def procesar_llamadas_incremental(exportar_csv=False, filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Procesa solo las filas de `datos_llamadas.csv` posteriores a la marca de agua de su
+    cliente + idioma. Calcula los totales diarios, el AHT promedio acumulado y los lags del
+    tramo afectado y reescribe solo los archivos mensuales que ese tramo toca, así el costo
+    depende de los datos nuevos y no de la historia guardada. El AHT vigente de cada serie
+    queda en `aht_series` (ver `leer_llamadas_diarias`). Devuelve el tramo escrito.
+    Filas hasta la marca de agua se descartan (se cuentan en `attrs["filas_tardias"]`;
+    para cargar historia corregida usar `procesar_llamadas`). Sin estado previo hace el
+    procesamiento completo.
+    """
+    estado = _cargar_estado()
+    if not estado or not existe_dataset("llamadas_diarias"):
+        return procesar_llamadas(exportar_csv=exportar_csv)
+
+    root_dir = Path(__file__).resolve().parents[2]
+    input_path = root_dir / "data" / "interim" / "datos_llamadas.csv"
+    # 1. Solo filas posteriores a la marca de agua de su serie
+    marcas_previas = pd.DataFrame(
+        [(e["cliente"], e["idioma"], pd.Timestamp(e["marca_agua"])) for e in estado.values()],
+        columns=CLAVES + ["marca_agua"]
+    )
+    marcas, aht_nuevo, df_nuevo, invalidos, tardias = _leer_agregados(input_path, filas_por_bloque, marcas_previas)
+    if marcas.empty:
+        print("✅ Sin datos nuevos desde la última carga")
+        df_actual = leer_llamadas_diarias()
+        df_actual.attrs.update(valores_invalidos=invalidos, filas_tardias=tardias)
+        return df_actual
+
+    # 2. AHT promedio acumulado por serie
+    aht_nuevo = aht_nuevo.reindex(marcas.index, fill_value=0)
+    aht_previo = pd.DataFrame(
+        [(estado.get(_clave(*k), {}).get("aht_suma", 0.0), estado.get(_clave(*k), {}).get("aht_n", 0))
+         for k in marcas.index],
+        index=marcas.index, columns=["sum", "count"]
+    )
+    aht_acum = aht_nuevo + aht_previo
+    aht_promedio = _aht_promedio(aht_acum)
+
+    # 3. Totales diarios nuevos + cola de días previos de cada serie
+    cola = pd.DataFrame(
+        [(pd.Timestamp(d), e["cliente"], e["idioma"], y)
+         for (cliente, idioma) in marcas.index
+         for e in [estado.get(_clave(cliente, idioma), {"cliente": cliente, "idioma": idioma, "cola": []})]
+         for d, y in e["cola"]],
+        columns=["date", "cliente", "idioma", "y"]
+    )
+    df_diario = (
+        pd.concat([df for df in (cola, df_nuevo) if not df.empty], ignore_index=True)
+        .groupby(["date", "cliente", "idioma"], as_index=False)["y"].sum()
+        .astype({"y": df_nuevo["y"].dtype})
+    )
+    desde = df_nuevo.groupby(CLAVES)["date"].min().rename("desde")
+
+    # 4. Lags solo del tramo afectado (desde el primer día con datos nuevos)
+    df_tramo = _agregar_features(df_diario.merge(aht_promedio.reset_index(), on=CLAVES, how="left"))
+    df_tramo = df_tramo.merge(desde.reset_index(), on=CLAVES, how="inner")
+    df_tramo = df_tramo[df_tramo["date"] >= df_tramo["desde"]].drop(columns="desde")
+
+    # 5. Solo el tramo: reemplaza sus días en los archivos mensuales que toca (los días
+    #    anteriores no se reescriben; el AHT vigente de cada serie va a `aht_series`)
+    df_tramo = df_tramo.sort_values(["cliente", "idioma", "date"], ignore_index=True)
+    df_tramo.attrs.update(valores_invalidos=invalidos, filas_tardias=tardias)
+    with medir("etl.escritura", filas=len(df_tramo), series=len(marcas)):
+        actualizar_dataset(df_tramo, "llamadas_diarias")
+    print(f"✅ {len(df_tramo)} días nuevos/actualizados en {len(marcas)} series"
+          + (f" ({tardias} filas tardías descartadas)" if tardias else ""))
+
+    estado = _estado_desde(marcas, aht_acum, df_diario, estado=estado)
+    _guardar_estado(estado)
+    _guardar_aht_series(estado)
+
+    # La copia CSV para notebooks sí es completa: solo si se pide
+    if exportar_csv:
+        output_path = root_dir / "data" / "processed" / "llamadas_diarias.csv"
+        leer_llamadas_diarias().to_csv(output_path, index=False)
+    return df_tramo
+
+
+
+# --- Agregación intradía (intervalos de N minutos) ---
+
+MINUTOS_INTERVALO = 15
+
+
+def _resolucion_minutos(date_time, maximo=60):
+    """
+    Resolución del export en minutos: máximo común divisor de los minutos del día de las marcas
+    (un export por hora da 60, uno cada media hora 30), acotado a `maximo`.
+    """
+    minutos = np.unique(date_time.dt.hour.to_numpy() * 60 + date_time.dt.minute.to_numpy())
+    resolucion = int(np.gcd.reduce(minutos)) if len(minutos) else maximo
+    return min(resolucion or maximo, maximo)
+
+
+def _agregar_bloque_intervalos(df, minutos, partes):
+    """
+    Llamadas y AHT ponderado (suma de AHT x llamadas) por día, serie e intervalo de `minutos`
+    (solo días hábiles). Con `partes` > 1 el export es más grueso que el intervalo: cada fila
+    se reparte en partes iguales entre los `partes` intervalos consecutivos que cubre.
+    """
+    df = df[df["date"].dt.weekday < 5]
+    intervalo = ((df["date_time"] - df["date"]) // pd.Timedelta(minutes=minutos)).to_numpy(dtype=np.int64)
+    aht = np.repeat(df["aht"].to_numpy(dtype=float), partes)
+    y = np.repeat(df["offered"].to_numpy(dtype=float) / partes, partes)
+    con_aht = ~np.isnan(aht)  # las filas sin AHT no pesan en el promedio del intervalo
+
+    base = pd.DataFrame({
+        "date": np.repeat(df["date"].to_numpy(), partes),
+        "cliente": np.repeat(df["cliente"].to_numpy(), partes),
+        "idioma": np.repeat(df["idioma"].to_numpy(), partes),
+        "intervalo": np.repeat(intervalo, partes) + np.tile(np.arange(partes), len(df)),
+        "y": y,
+        "aht_x_y": np.where(con_aht, aht * y, 0.0),
+        "y_con_aht": np.where(con_aht, y, 0.0),
+    })
+    return base.groupby(["date", "cliente", "idioma", "intervalo"])[["y", "aht_x_y", "y_con_aht"]].sum()
+
+
+def agregar_intervalos(input_path, minutos=MINUTOS_INTERVALO, minutos_origen=None, filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Llamadas por día hábil, cliente + idioma e intervalo de `minutos` (96 intervalos por día
+    con 15 minutos) sobre cualquier CSV crudo, leyendo por bloques y sin guardar nada.
+
+    `minutos_origen` es la resolución del export (por defecto se deduce de las marcas del primer
+    bloque); si es más gruesa que `minutos`, las llamadas se reparten en partes iguales.
+    Devuelve (date, cliente, idioma, intervalo, y, aht) solo con los intervalos con llamadas;
+    el AHT del intervalo es el promedio ponderado por llamadas.
+    """
+    if 1440 % minutos:
+        raise ValueError(f"{minutos} minutos no divide el día en intervalos enteros")
+
+    parciales = []
+    with medir("etl.intervalos", filas=0, iteraciones=0) as tramo:
+        for bloque in _leer_crudo(input_path, filas_por_bloque):
+            bloque = _normalizar(bloque, {})
+            if minutos_origen is None:
+                minutos_origen = _resolucion_minutos(bloque["date_time"])
+            partes = max(minutos_origen // minutos, 1)
+            parciales.append(_agregar_bloque_intervalos(bloque, minutos, partes))
+            tramo["filas"] += len(bloque)
+            tramo["iteraciones"] += 1
+
+    acumulado = pd.concat(parciales).groupby(level=["date"] + CLAVES + ["intervalo"]).sum()
+    acumulado = acumulado[acumulado["y"] > 0]
+    return pd.DataFrame({
+        "y": acumulado["y"].astype("float32"),
+        "aht": (acumulado["aht_x_y"] / acumulado["y_con_aht"].where(acumulado["y_con_aht"] > 0)).astype("float32"),
+    }).reset_index().astype({"intervalo": "int16"})
+
+
+@medido("procesar_llamadas_intervalo", contar=lambda df, *a, **k: {"filas": len(df), "series": df.groupby(CLAVES, observed=True).ngroups})
+def procesar_llamadas_intervalo(minutos=MINUTOS_INTERVALO, minutos_origen=None, filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Recalcula completo el dataset "llamadas_intervalo" (llamadas y AHT por intervalo de
+    `minutos`) desde `datos_llamadas.csv`. Es la base de los perfiles intradía del forecast.
+    """
+    root_dir = Path(__file__).resolve().parents[2]
+    input_path = root_dir / "data" / "interim" / "datos_llamadas.csv"
+
+    df_intervalos = agregar_intervalos(input_path, minutos, minutos_origen, filas_por_bloque)
+    with medir("etl.escritura", filas=len(df_intervalos)):
+        dataset_path = guardar_dataset(df_intervalos, "llamadas_intervalo")
+    print(f"✅ Llamadas por intervalo de {minutos} min guardadas en {dataset_path}")
+    return df_intervalos
@@ -0,0 +1,291 @@
+# src/forecast/ajuste_hiperparametros.py
+"""
+Ajuste de hiperparámetros por serie (cliente + idioma) con successive halving:
+
+    python -m src.forecast.ajuste_hiperparametros --nucleos 4
+    python -m src.forecast.ajuste_hiperparametros --forzar --candidatos 27
+
+Cada serie prueba `n_candidatos` combinaciones de profundidad, learning rate, bins del
+histograma y peso mínimo por hoja. Todas arrancan con pocas rondas de boosting; después de
+cada escalón sigue la mejor tercera parte (`eta`) y continúa entrenando donde quedó, hasta
+`rondas_max`. El número de árboles sale de la mejor ronda en validación (con corte temprano
+si no mejora en `paciencia` rondas).
+
+La validación son los 30 días hábiles previos al test de `forecast_idioma`, partidos en
+`PLIEGUES` bloques con origen móvil (el MAE por ronda se promedia entre pliegues), así el
+ajuste no ve los días con los que después se reportan las métricas. Los parámetros elegidos
+quedan en `models/hiperparametros.json` y `forecast_idioma` los usa en las corridas siguientes.
+"""
+import argparse
+import itertools
+import math
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from xgboost import XGBRegressor
+
+from src.etl.transform_calls import leer_llamadas_diarias
+from src.forecast.feature_store import features_serie, obtener_feature_store
+from src.forecast.forecast_module import PARAMS_DEFECTO
+from src.forecast.forecast_multiidioma import _mapear, repartir_nucleos
+from src.forecast.registro_modelos import cargar_hiperparametros, guardar_hiperparametros
+from src.utils.indice_series import indexar_series
+from src.utils.instrumentacion import medido, medir
+
+# Espacio de búsqueda (el número de árboles lo decide el halving + corte temprano)
+ESPACIO = {
+    "max_depth": [2, 3, 4, 6, 8],
+    "learning_rate": [0.03, 0.05, 0.1, 0.2, 0.3],
+    "max_bin": [32, 64, 128, 256],
+    "min_child_weight": [1, 3, 5],
+}
+PARAMS_FIJOS = {"tree_method": "hist"}
+
+DIAS_TEST = 30  # los mismos que reserva `forecast_idioma`
+DIAS_VALIDACION = 30
+MIN_ENTRENAMIENTO = 60
+PLIEGUES = 3
+
+COLUMNAS_FORECAST = ["date", "cliente", "idioma", "y", "aht"]
+
+
+def escalones(rondas_min, rondas_max, eta):
+    """Rondas acumuladas al final de cada escalón: rondas_min, rondas_min*eta, ... hasta rondas_max"""
+    rondas = [rondas_min]
+    while rondas[-1] * eta < rondas_max:
+        rondas.append(rondas[-1] * eta)
+    if rondas[-1] < rondas_max:
+        rondas.append(rondas_max)
+    return rondas
+
+
+def presupuesto_rondas(n_candidatos, rondas_min, rondas_max, eta, n_pliegues=PLIEGUES):
+    """
+    Máximo de rondas de boosting por serie (el corte temprano solo lo baja), incluido el
+    modelo por defecto con el que se compara. Sirve para saber de antemano cuánto cuesta.
+    """
+    total, anterior, vivos = PARAMS_DEFECTO["n_estimators"], 0, n_candidatos
+    for rondas in escalones(rondas_min, rondas_max, eta):
+        total += vivos * (rondas - anterior)
+        anterior, vivos = rondas, max(1, math.ceil(vivos / eta))
+    return total * n_pliegues
+
+
+def candidatos(n_candidatos, semilla=42):
+    """Combinaciones del espacio elegidas al azar (sin repetir); la primera es la por defecto de XGBoost"""
+    combinaciones = [dict(zip(ESPACIO, valores)) for valores in itertools.product(*ESPACIO.values())]
+    defecto = {"max_depth": 6, "learning_rate": PARAMS_DEFECTO["learning_rate"], "max_bin": 256, "min_child_weight": 1}
+    resto = [c for c in combinaciones if c != defecto]
+    rng = np.random.default_rng(semilla)
+    elegidas = rng.choice(len(resto), size=min(n_candidatos - 1, len(resto)), replace=False)
+    return [defecto] + [resto[i] for i in sorted(elegidas)]
+
+
+def _pliegues(df_feat, n_pliegues):
+    """
+    Pliegues con origen móvil dentro de los `DIAS_VALIDACION` días hábiles previos al test de
+    `forecast_idioma`: cada uno entrena con todo lo anterior y valida en el bloque siguiente.
+    Lista de (X_train, y_train, X_val, y_val), vacía si la serie es corta.
+    """
+    dias_habiles = df_feat.index[df_feat.index.dayofweek < 5]
+    if len(dias_habiles) < DIAS_TEST + DIAS_VALIDACION + MIN_ENTRENAMIENTO:
+        return []
+
+    validacion = dias_habiles[-(DIAS_TEST + DIAS_VALIDACION):-DIAS_TEST]
+    pliegues = []
+    for bloque in np.array_split(validacion, n_pliegues):
+        train = df_feat[df_feat.index < bloque[0]]
+        val = df_feat.loc[bloque]
+        pliegues.append((train.drop(columns="y"), train["y"], val.drop(columns="y"), val["y"]))
+    return pliegues
+
+
+def _entrenar(params, rondas, X_train, y_train, X_val, y_val, n_jobs, booster=None):
+    """Entrena (o continúa `booster`) `rondas` rondas; devuelve (booster, MAE de validación por ronda)"""
+    params = {**PARAMS_DEFECTO, **PARAMS_FIJOS, **params, "n_estimators": rondas, "eval_metric": "mae"}
+    model = XGBRegressor(**params) if n_jobs is None else XGBRegressor(**params, n_jobs=n_jobs)
+    model.fit(X_train, y_train, eval_set=[(X_val, y_val)], xgb_model=booster, verbose=False)
+    return model.get_booster(), np.asarray(model.evals_result()["validation_0"]["mae"])
+
+
+def _entrenar_pliegues(params, rondas, pliegues, n_jobs, boosters=None):
+    """`_entrenar` en cada pliegue; devuelve (boosters, MAE de validación por ronda promediado entre pliegues)"""
+    boosters = boosters or [None] * len(pliegues)
+    salidas = [_entrenar(params, rondas, *pliegue, n_jobs, booster=b) for pliegue, b in zip(pliegues, boosters)]
+    return [booster for booster, _ in salidas], np.mean([maes for _, maes in salidas], axis=0)
+
+
+def _ajustar_serie(cliente, idioma, df_feat, lista_candidatos, rondas_escalones, eta, paciencia, tolerancia, n_pliegues, n_jobs):
+    """Successive halving de una serie; devuelve la entrada para `hiperparametros.json` (o None)"""
+    pliegues = _pliegues(df_feat, n_pliegues)
+    if not pliegues:
+        return None
+
+    inicio = time.perf_counter()
+    with medir("ajuste.serie", series=1) as tramo:
+        # Referencia: el modelo por defecto con los mismos pliegues
+        _, mae_defecto = _entrenar_pliegues({}, PARAMS_DEFECTO["n_estimators"], pliegues, n_jobs)
+        mae_defecto = float(mae_defecto[-1])
+        rondas_usadas = PARAMS_DEFECTO["n_estimators"] * len(pliegues)
+
+        estados = [
+            {"params": params, "boosters": None, "rondas": 0, "mae": np.inf, "mejor_ronda": 0, "detenido": False}
+            for params in lista_candidatos
+        ]
+        vivos = estados
+        for i, rondas in enumerate(rondas_escalones):
+            for estado in vivos:
+                if estado["detenido"]:
+                    continue
+                # Continúa desde donde quedó el escalón anterior
+                estado["boosters"], maes = _entrenar_pliegues(
+                    estado["params"], rondas - estado["rondas"], pliegues, n_jobs, boosters=estado["boosters"]
+                )
+                rondas_usadas += len(maes) * len(pliegues)
+                mejor = int(np.argmin(maes))
+                if maes[mejor] < estado["mae"]:
+                    estado["mae"], estado["mejor_ronda"] = float(maes[mejor]), estado["rondas"] + mejor + 1
+                estado["rondas"] = rondas
+                # Corte temprano: sin mejora en las últimas `paciencia` rondas no sigue entrenando
+                estado["detenido"] = rondas - estado["mejor_ronda"] >= paciencia
+
+            if i < len(rondas_escalones) - 1:
+                vivos = sorted(vivos, key=lambda e: e["mae"])[:max(1, math.ceil(len(vivos) / eta))]
+        tramo["iteraciones"] = rondas_usadas
+
+    # Entre los que quedan a `tolerancia` del mejor, el más barato de entrenar (árboles x profundidad)
+    mejor_mae = min(e["mae"] for e in estados)
+    elegibles = [e for e in estados if e["mae"] <= mejor_mae * (1 + tolerancia)]
+    elegido = min(elegibles, key=lambda e: (e["mejor_ronda"] * e["params"]["max_depth"], e["mae"]))
+
+    # Si no mejora al modelo por defecto se guarda vacío (= parámetros por defecto) y no se reajusta
+    mejora = elegido["mae"] < mae_defecto
+    params = {**PARAMS_FIJOS, **elegido["params"], "n_estimators": elegido["mejor_ronda"]} if mejora else {}
+    return {
+        "cliente": cliente,
+        "idioma": idioma,
+        "params": params,
+        "mae_validacion": round(elegido["mae"] if mejora else mae_defecto, 4),
+        "mae_defecto": round(mae_defecto, 4),
+        "rondas_usadas": rondas_usadas,
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+@medido("ajustar_hiperparametros", contar=lambda tabla, *a, **k: {"series": len(tabla)})
+def ajustar_hiperparametros(
+    datos,
+    pares=None,
+    fecha_inicio="2025-01-01",
+    n_candidatos=18,
+    rondas_min=20,
+    rondas_max=180,
+    eta=3,
+    paciencia=30,
+    tolerancia=0.05,
+    n_pliegues=PLIEGUES,
+    nucleos=None,
+    n_workers=None,
+    modo="hilos",
+    forzar=False,
+    max_edad_dias=30,
+    semilla=42,
+    guardar=True,
+    store=None,
+):
+    """
+    Ajusta los hiperparámetros de cada serie con successive halving, en paralelo.
+
+    - Presupuesto: `presupuesto_rondas(n_candidatos, rondas_min, rondas_max, eta, n_pliegues)`
+      rondas por serie como máximo, repartidas en `nucleos` (por defecto todos) entre el pool y XGBoost.
+    - Las series con un ajuste de menos de `max_edad_dias` días se saltean (salvo `forzar`).
+    - `tolerancia`: entre candidatos con MAE a menos de esa proporción del mejor se elige el
+      más barato de entrenar.
+
+    Devuelve una tabla con una fila por serie ajustada y, con `guardar=True`, persiste los
+    parámetros para que `forecast_idioma` los use.
+    """
+    if store is None:
+        store = obtener_feature_store(datos)
+    if pares is None:
+        pares = [par for pares_idioma in store["pares"].values() for par in pares_idioma]
+
+    # Series pendientes: sin ajuste, con ajuste viejo o todas si se fuerza
+    guardados = cargar_hiperparametros()
+    limite = pd.Timestamp.now() - pd.Timedelta(days=max_edad_dias)
+    pendientes = [
+        (cliente, idioma) for cliente, idioma in sorted(pares)
+        if forzar or f"{cliente}|{idioma}" not in guardados
+        or pd.Timestamp(guardados[f"{cliente}|{idioma}"]["fecha"]) < limite
+    ]
+    rondas_escalones = escalones(rondas_min, rondas_max, eta)
+    presupuesto = presupuesto_rondas(n_candidatos, rondas_min, rondas_max, eta, n_pliegues)
+    print(f"🎛️ {len(pendientes)} series a ajustar ({len(pares) - len(pendientes)} ya ajustadas), "
+          f"hasta {presupuesto:,} rondas por serie ({len(pendientes) * presupuesto:,} en total)")
+
+    columnas = ["cliente", "idioma", "params", "mae_validacion", "mae_defecto", "rondas_usadas", "segundos", "fecha"]
+    if not pendientes:
+        return pd.DataFrame(columns=columnas)
+
+    n_workers, n_jobs = repartir_nucleos(n_workers, len(pendientes), nucleos)
+    if n_workers == 1 and nucleos is None:
+        n_jobs = None
+    lista_candidatos = candidatos(n_candidatos, semilla)
+    argumentos = [
+        (cliente, idioma, features_serie(store, idioma, [cliente], fecha_inicio)[0],
+         lista_candidatos, rondas_escalones, eta, paciencia, tolerancia, n_pliegues, n_jobs)
+        for cliente, idioma in pendientes
+    ]
+    resultados = [r for r in _mapear(_ajustar_serie, argumentos, n_workers, modo) if r is not None]
+
+    if guardar and resultados:
+        guardar_hiperparametros({f"{r['cliente']}|{r['idioma']}": r for r in resultados})
+    return pd.DataFrame(resultados, columns=columnas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ajuste de hiperparámetros por cliente + idioma (successive halving)")
+    parser.add_argument("--fecha-inicio", default="2025-01-01")
+    parser.add_argument("--candidatos", type=int, default=18, help="Combinaciones que arrancan en el primer escalón")
+    parser.add_argument("--rondas-min", type=int, default=20)
+    parser.add_argument("--rondas-max", type=int, default=180)
+    parser.add_argument("--eta", type=int, default=3, help="En cada escalón sigue 1 de cada `eta` candidatos")
+    parser.add_argument("--pliegues", type=int, default=PLIEGUES, help="Pliegues de validación por serie")
+    parser.add_argument("--nucleos", type=int, default=None, help="Núcleos en total (por defecto, todos)")
+    parser.add_argument("--workers", type=int, default=None, help="Series en paralelo (por defecto, según núcleos)")
+    parser.add_argument("--modo", choices=["hilos", "procesos"], default="hilos")
+    parser.add_argument("--forzar", action="store_true", help="Reajustar también las series ya ajustadas")
+    args = parser.parse_args(argv)
+
+    datos = indexar_series(leer_llamadas_diarias(columnas=COLUMNAS_FORECAST))
+    inicio = time.perf_counter()
+    tabla = ajustar_hiperparametros(
+        datos,
+        fecha_inicio=args.fecha_inicio,
+        n_candidatos=args.candidatos,
+        rondas_min=args.rondas_min,
+        rondas_max=args.rondas_max,
+        eta=args.eta,
+        n_pliegues=args.pliegues,
+        nucleos=args.nucleos,
+        n_workers=args.workers,
+        modo=args.modo,
+        forzar=args.forzar,
+    )
+    if tabla.empty:
+        return
+
+    tabla["mejora_pct"] = ((1 - tabla["mae_validacion"] / tabla["mae_defecto"]) * 100).round(1)
+    tabla["n_estimators"] = tabla["params"].map(lambda p: p.get("n_estimators", PARAMS_DEFECTO["n_estimators"]))
+    tabla["max_depth"] = tabla["params"].map(lambda p: p.get("max_depth", 6))
+    tabla["learning_rate"] = tabla["params"].map(lambda p: p.get("learning_rate", PARAMS_DEFECTO["learning_rate"]))
+    print(tabla.drop(columns=["params", "fecha"]).to_string(index=False))
+    print(f"✅ {len(tabla)} series ajustadas en {time.perf_counter() - inicio:.1f} s, "
+          f"MAE de validación {tabla['mae_validacion'].sum() / tabla['mae_defecto'].sum() - 1:+.1%} vs. por defecto")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+from xgboost import XGBRegressor
+
+from src.forecast.feature_store import features_serie, obtener_feature_store
+from src.forecast.ajuste_hiperparametros import DIAS_TEST
+from src.forecast.forecast_futuro import LAGS, predecir_recursivo
+from src.forecast.forecast_module import PARAMS_DEFECTO
+from src.forecast.forecast_multiidioma import _mapear, repartir_nucleos
+from src.forecast.registro_modelos import cargar_modelo, clave_modelo, guardar_modelo, params_ajustados
+from src.utils.almacenamiento import guardar_dataset
+from src.utils.instrumentacion import medido, medir
+
+CLAVES = ["cliente", "idioma"]
+METRICAS = ["MAE", "RMSE", "MAPE"]
+
+
+def _posiciones_origen(n_habiles, n_origenes, paso, h_max, min_entrenamiento):
+    """
+    Posiciones (en días hábiles) de los orígenes, de la más vieja a la más reciente: el último
+    deja `h_max` días hábiles para evaluar y los anteriores retroceden de a `paso`.
+    """
+    ultima = n_habiles - h_max
+    posiciones = [ultima - k * paso for k in range(n_origenes)]
+    return sorted(p for p in posiciones if p >= max(min_entrenamiento, len(LAGS)))
+
+
+def _metricas(reales, preds, horizontes):
+    """MAE / RMSE / MAPE acumulados hasta cada horizonte; reales y preds son (orígenes, h_max)"""
+    error = preds - reales
+    with np.errstate(divide="ignore", invalid="ignore"):
+        error_pct = np.abs(error / np.where(reales == 0, np.nan, reales))
+    filas = {}
+    for h in horizontes:
+        filas[h] = {
+            "MAE": np.mean(np.abs(error[:, :h]), axis=1),
+            "RMSE": np.sqrt(np.mean(error[:, :h] ** 2, axis=1)),
+            "MAPE": np.nanmean(error_pct[:, :h], axis=1) * 100,
+        }
+    return filas
+
+
+def _evaluar_tramo(cliente, idioma, df_feat, posiciones, horizontes, fecha_inicio, params, usar_registro, n_jobs):
+    """
+    Un modelo entrenado con los datos previos al primer origen del tramo, evaluado desde cada
+    origen del tramo con predicción recursiva (como `forecast_futuro`). Todos los orígenes
+    del tramo comparten modelo y avanzan juntos en `predecir_recursivo`.
+    """
+    habiles = df_feat[df_feat.index.dayofweek < 5]
+    fechas = habiles.index
+    y = habiles["y"].to_numpy(dtype=float)
+    h_max = max(horizontes)
+
+    # Modelo: mismo esquema de clave que `forecast_idioma`, así se comparten en el registro
+    origen = fechas[posiciones[0]]
+    df_train = df_feat[df_feat.index < origen]
+    with medir("backtest.entrenamiento", filas=len(df_train), iteraciones=params["n_estimators"]):
+        entrada = None
+        if usar_registro:
+            clave = clave_modelo([cliente], [idioma], fecha_inicio, params, df_train)
+            entrada = cargar_modelo(clave)
+        if entrada is not None:
+            model = entrada["modelo"]
+            if n_jobs is not None:
+                model.set_params(n_jobs=n_jobs)
+        else:
+            model = XGBRegressor(**params) if n_jobs is None else XGBRegressor(**params, n_jobs=n_jobs)
+            model.fit(df_train.drop(columns="y"), df_train["y"])
+            if usar_registro:
+                guardar_modelo(clave, model, {})
+
+    # Roll-out recursivo desde cada origen: lags hábiles reales previos + calendario real
+    posiciones = np.asarray(posiciones)
+    ventana = posiciones[:, None] + np.arange(h_max)[None, :]
+    lags = y[posiciones[:, None] - np.arange(1, len(LAGS) + 1)[None, :]]
+    dias = fechas[ventana.ravel()]
+    dayofweek = np.asarray(dias.dayofweek).reshape(ventana.shape)
+    is_month_end = np.asarray(dias.day == dias.days_in_month, dtype=int).reshape(ventana.shape)
+    with medir("backtest.prediccion", series=len(posiciones), iteraciones=h_max):
+        preds = predecir_recursivo(model, lags, dayofweek, is_month_end)
+
+    metricas = _metricas(y[ventana], preds, horizontes)
+    return [
+        {"cliente": cliente, "idioma": idioma, "origen": fechas[p], "horizonte": h,
+         **{nombre: valores[i] for nombre, valores in metricas[h].items()}}
+        for i, p in enumerate(posiciones) for h in horizontes
+    ]
+
+
+@medido("backtest_rolling", contar=lambda tabla, *a, **k: {"filas": len(tabla), "series": tabla.groupby(CLAVES, observed=True).ngroups})
+def backtest_rolling(
+    datos,
+    pares=None,
+    n_origenes=6,
+    horizontes=(1, 5, 10, 20),
+    paso=5,
+    fecha_inicio="2025-01-01",
+    reentrenar_cada=1,
+    min_entrenamiento=60,
+    params=None,
+    usar_registro=True,
+    usar_ajustados=False,
+    n_workers=None,
+    modo="hilos",
+    guardar=True,
+    store=None,
+):
+    """
+    Backtest con orígenes móviles: para cada serie (cliente, idioma) se evalúan `n_origenes`
+    cortes separados por `paso` días hábiles, con predicción recursiva hasta cada horizonte.
+
+    - Las features salen del feature store (una vez por serie para todos los orígenes).
+    - `reentrenar_cada`: cada cuántos orígenes se reentrena; los orígenes intermedios usan el
+      modelo del origen anterior (que no vio datos posteriores, así que no hay fuga).
+    - Los modelos quedan en el registro con la misma clave que `forecast_idioma`: otra corrida
+      (o el forecast del mismo corte) los reutiliza.
+    - Sin `params` explícitos se evalúan los hiperparámetros por defecto. Con `usar_ajustados=True`
+      cada serie usa los ajustados (si los tiene) solo en los orígenes de los últimos `DIAS_TEST`
+      días hábiles: los anteriores evalúan sobre los días de validación del ajuste, que ya
+      eligieron esos parámetros, y siguen con los de por defecto.
+    - Las series y los tramos de orígenes corren en paralelo (`n_workers`, modo hilos/procesos).
+
+    Devuelve una tabla compacta (cliente, idioma, origen, horizonte, MAE, RMSE, MAPE) y, con
+    `guardar=True`, la escribe en el dataset "backtest_metricas".
+    """
+    if store is None:
+        store = obtener_feature_store(datos)
+    if pares is None:
+        pares = [par for pares_idioma in store["pares"].values() for par in pares_idioma]
+    horizontes = sorted(set(int(h) for h in horizontes))
+
+    # Tareas: una por tramo de `reentrenar_cada` orígenes consecutivos de cada serie
+    tareas = []
+    for cliente, idioma in sorted(pares):
+        df_feat, _ = features_serie(store, idioma, [cliente], fecha_inicio)
+        n_habiles = int((df_feat.index.dayofweek < 5).sum())
+        posiciones = _posiciones_origen(n_habiles, n_origenes, paso, max(horizontes), min_entrenamiento)
+        ajustados = params_ajustados(cliente, idioma) if params is None and usar_ajustados else None
+        grupos = [(posiciones, params)]
+        if ajustados:
+            # Orígenes que evalúan días vistos por el ajuste: parámetros por defecto
+            limite = n_habiles - DIAS_TEST
+            grupos = [([p for p in posiciones if p < limite], None), ([p for p in posiciones if p >= limite], ajustados)]
+        for posiciones_grupo, params_grupo in grupos:
+            params_serie = {**PARAMS_DEFECTO, **(params_grupo or {})}
+            for inicio in range(0, len(posiciones_grupo), reentrenar_cada):
+                tareas.append((cliente, idioma, df_feat, posiciones_grupo[inicio:inicio + reentrenar_cada], params_serie))
+
+    columnas = CLAVES + ["origen", "horizonte"] + METRICAS
+    if not tareas:
+        return pd.DataFrame(columns=columnas)
+
+    n_workers, n_jobs = repartir_nucleos(n_workers, len(tareas))
+    if n_workers == 1:
+        n_jobs = None
+    argumentos = [
+        (cliente, idioma, df_feat, posiciones, horizontes, fecha_inicio, params_serie, usar_registro, n_jobs)
+        for cliente, idioma, df_feat, posiciones, params_serie in tareas
+    ]
+    filas = [fila for resultado in _mapear(_evaluar_tramo, argumentos, n_workers, modo) for fila in resultado]
+
+    # Tabla compacta: claves categóricas, horizonte entero chico y métricas en float32
+    tabla = pd.DataFrame(filas, columns=columnas).astype({
+        "cliente": "category", "idioma": "category", "horizonte": "int16",
+        **{m: "float32" for m in METRICAS},
+    })
+    tabla = tabla.sort_values(CLAVES + ["origen", "horizonte"], ignore_index=True)
+    if guardar:
+        guardar_dataset(tabla, "backtest_metricas")
+    return tabla
+
+
+def resumir_backtest(tabla, por=("cliente", "idioma", "horizonte")):
+    """Promedio y desvío de las métricas entre orígenes (por serie y horizonte, o lo que indique `por`)"""
+    resumen = tabla.groupby(list(por), observed=True)[METRICAS].agg(["mean", "std"])
+    resumen.columns = [f"{metrica}_{estadistico}" for metrica, estadistico in resumen.columns]
+    resumen["n_origenes"] = tabla.groupby(list(por), observed=True)["origen"].nunique()
+    return resumen.round(2).reset_index()
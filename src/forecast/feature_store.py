@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+
+from src.forecast.registro_modelos import hash_datos
+from src.utils.indice_series import es_indice, indexar_series
+from src.utils.instrumentacion import medido
+
+CLAVES = ["cliente", "idioma"]
+LAGS = [1, 2, 3, 4, 5]
+COLUMNAS_FEATURES = ["y", "dayofweek", "is_month_end"] + [f"lag_{lag}" for lag in LAGS]
+
+# Último feature store construido, por huella de los datos
+_STORES = {}
+
+
+def _rellenar_rango(ancho):
+    """Días sin dato dentro del rango de cada serie valen 0 (como `resample("D").sum()`); fuera quedan NaN"""
+    con_dato = ancho.notna()
+    dentro = con_dato.cummax() & con_dato[::-1].cummax()[::-1]
+    return ancho.fillna(0).where(dentro)
+
+
+def _features_ancho(crudo):
+    """
+    Suavizado centrado de 3 días, lags y calendario de todas las columnas (series) de una
+    tabla ancha fechas x series. Devuelve formato largo indexado por (cliente, idioma, date)
+    con las filas de suavizado válido; los lags de las primeras filas de cada serie quedan NaN.
+    """
+    suavizado = crudo.rolling(window=3, center=True).mean()
+
+    columnas = {"y": suavizado}
+    for lag in LAGS:
+        columnas[f"lag_{lag}"] = suavizado.shift(lag)
+    df_feat = pd.concat(columnas, axis=1).stack(CLAVES, future_stack=True)
+    df_feat = df_feat[df_feat["y"].notna()]
+
+    fechas = df_feat.index.get_level_values("date")
+    df_feat["dayofweek"] = fechas.dayofweek
+    df_feat["is_month_end"] = fechas.is_month_end.astype(int)
+    return df_feat.reorder_levels(CLAVES + ["date"]).sort_index()[COLUMNAS_FEATURES]
+
+
+@medido("construir_feature_store", contar=lambda store, *a, **k: {"filas": len(store["features"]), "series": store["crudo"].shape[1]})
+def construir_feature_store(datos):
+    """
+    Calcula de una sola vez, para todas las series cliente + idioma del histórico diario,
+    el suavizado, los lags y el calendario que usa `forecast_idioma`.
+
+    `datos` es el contenedor de `indexar_series` (o un DataFrame, que se indexa antes).
+    Devuelve un dict con la serie diaria cruda (tabla ancha), las features en formato largo,
+    las series disponibles por idioma, el AHT acumulado por serie y un cache de consultas.
+    """
+    indice = datos if es_indice(datos) else indexar_series(datos)
+    columnas = indice["columnas"]
+    pares = list(indice["bloques"])
+    largos = [filas.stop - filas.start for filas in indice["bloques"].values()]
+    id_serie = np.repeat(np.arange(len(pares)), largos)
+
+    # Solo días hábiles
+    fechas = pd.DatetimeIndex(columnas["date"])
+    habil = np.asarray(fechas.dayofweek < 5)
+    fechas, id_habil = fechas[habil], id_serie[habil]
+
+    # Tabla ancha fechas x series sumando duplicados (como pivot_table), NaN donde no hay dato
+    if len(fechas):
+        rango = pd.date_range(fechas.min(), fechas.max(), freq="D", name="date")
+        dia = ((fechas - rango[0]) // pd.Timedelta(days=1)).to_numpy()
+        suma = np.zeros((len(rango), len(pares)))
+        hay = np.zeros((len(rango), len(pares)), dtype=bool)
+        np.add.at(suma, (dia, id_habil), columnas["y"][habil])
+        hay[dia, id_habil] = True
+        con_dato = hay.any(axis=0)
+        crudo = pd.DataFrame(
+            np.where(hay, suma, np.nan)[:, con_dato], index=rango,
+            columns=pd.MultiIndex.from_tuples([p for p, ok in zip(pares, con_dato) if ok], names=CLAVES)
+        )
+        crudo = _rellenar_rango(crudo)
+    else:
+        crudo = pd.DataFrame()
+
+    pares_idioma = {}
+    for cliente, idioma in crudo.columns:
+        pares_idioma.setdefault(idioma, []).append((cliente, idioma))
+
+    # AHT acumulado por serie (suma y cantidad de filas hábiles con dato)
+    aht = pd.DataFrame(columns=["sum", "count"], dtype=float)
+    if "aht" in columnas and pares:
+        valores = columnas["aht"][habil].astype(float)
+        con_aht = ~np.isnan(valores)
+        aht = pd.DataFrame({
+            "sum": np.bincount(id_habil[con_aht], weights=valores[con_aht], minlength=len(pares)),
+            "count": np.bincount(id_habil[con_aht], minlength=len(pares)),
+        }, index=pd.MultiIndex.from_tuples(pares, names=CLAVES))
+
+    return {
+        "crudo": crudo,
+        "features": _features_ancho(crudo) if not crudo.empty else pd.DataFrame(columns=COLUMNAS_FEATURES),
+        "pares": pares_idioma,
+        "aht": aht,
+        "cache": {},
+    }
+
+
+def obtener_feature_store(datos):
+    """Feature store de `datos` (contenedor o DataFrame), reutilizando el último si los datos no cambiaron"""
+    if es_indice(datos):
+        clave = datos["huella"]
+    else:
+        datos = datos[[c for c in ["date", "cliente", "idioma", "y", "aht"] if c in datos.columns]]
+        clave = hash_datos(datos)
+    if clave not in _STORES:
+        _STORES.clear()
+        _STORES[clave] = construir_feature_store(datos)
+    return _STORES[clave]
+
+
+def pares_seleccionados(store, idiomas, clientes):
+    """Series (cliente, idioma) del store para los idiomas y clientes pedidos"""
+    idiomas = [idiomas] if isinstance(idiomas, str) else idiomas
+    clientes = {clientes} if isinstance(clientes, str) else set(clientes)
+    return [par for idioma in idiomas for par in store["pares"].get(idioma, []) if par[0] in clientes]
+
+
+def aht_promedio(store, pares):
+    """AHT promedio de las filas de las series `pares` (igual que el `mean` sobre el histórico filtrado)"""
+    aht = store["aht"].reindex(pares).sum()
+    return aht["sum"] / aht["count"] if aht["count"] > 0 else np.nan
+
+
+def features_serie(store, idioma, cliente, fecha_inicio):
+    """
+    Features de la serie que pide `forecast_idioma` (suma de las series de los idiomas y
+    clientes pedidos), desde `fecha_inicio`. Una serie sola es un corte del store; varias
+    se suman en crudo y se suavizan una vez. El resultado queda en el cache del store.
+    Devuelve (df_feat indexado por fecha, aht promedio).
+    """
+    pares = pares_seleccionados(store, idioma, cliente)
+    clave = (tuple(pares), str(fecha_inicio))
+    if clave in store["cache"]:
+        return store["cache"][clave]
+
+    if not pares:
+        df_feat = pd.DataFrame(columns=COLUMNAS_FEATURES, index=pd.DatetimeIndex([], name="date"))
+    elif len(pares) == 1:
+        df_feat = store["features"].loc[pares[0]]
+    else:
+        ancho = pd.DataFrame({("seleccion", "seleccion"): store["crudo"][pares].sum(axis=1, min_count=1)})
+        ancho.columns.names = CLAVES
+        df_feat = _features_ancho(_rellenar_rango(ancho)).droplevel(CLAVES)
+
+    # Los lags se recalculan desde `fecha_inicio`: las primeras filas del corte quedan afuera
+    df_feat = df_feat[df_feat.index >= fecha_inicio].iloc[len(LAGS):]
+
+    store["cache"][clave] = (df_feat, aht_promedio(store, pares))
+    return store["cache"][clave]
+
+
+def features_pares(store, pares, fecha_inicio):
+    """Features en formato largo (cliente, idioma, date, ...) de varias series por separado, desde `fecha_inicio`"""
+    df_feat = store["features"]
+    df_feat = df_feat[df_feat.index.droplevel("date").isin(pares)]
+    df_feat = df_feat[df_feat.index.get_level_values("date") >= fecha_inicio]
+    df_feat = df_feat[df_feat.groupby(level=CLAVES).cumcount() >= len(LAGS)]
+    return df_feat.reset_index()
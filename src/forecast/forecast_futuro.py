@@ -2,53 +2,193 @@ import pandas as pd
 import numpy as np
 from datetime import timedelta
 
-def forecast_futuro(model, df_hist, n_dias=20):
-    # Asegurarse de que el índice sea datetime
-    df_hist = df_hist.copy()
-    df_hist.index = pd.to_datetime(df_hist.index)
+from src.utils.instrumentacion import medido, medir
+
+LAGS = [1, 2, 3, 4, 5]
 
-    # Usar solo fechas hábiles
-    df_hist = df_hist[df_hist.index.dayofweek < 5]
 
-    # Crear base futura
-    last_date = df_hist.index.max()
+def _calendario_futuro(last_date, n_dias):
+    """Próximos `n_dias` hábiles después de `last_date` con sus features de calendario"""
     future_dates = pd.date_range(start=last_date + timedelta(days=1), periods=n_dias*2, freq='B')
     future_dates = future_dates[:n_dias]  # solo n_dias hábiles
+    # Fin de mes calendario (con freq='B' el índice devolvería el último día hábil del mes)
+    is_month_end = (future_dates.day == future_dates.days_in_month).astype(int)
+    return future_dates, future_dates.dayofweek.to_numpy(), is_month_end
+
+
+def predecir_recursivo(model, lags_iniciales, dayofweek, is_month_end, extra=None, ruido=None):
+    """
+    Predicción recursiva multi-paso de k series a la vez con un mismo modelo.
+
+    lags_iniciales: (k, 5) con lag_1..lag_5; dayofweek / is_month_end: (k, n_dias).
+    extra: (k, m) opcional con features fijas por serie, que van antes del calendario.
+    ruido: (k, n_dias) opcional que se suma a cada predicción (recortada en 0) antes de
+    usarla como lag del paso siguiente: así se simulan caminos en lugar del valor esperado.
+    Los lags viven en un buffer circular preasignado y cada paso hace un único
+    `model.predict` sobre un array (k, features), sin construir DataFrames.
+    Devuelve un array (k, n_dias).
+    """
+    k, n_dias = dayofweek.shape
+    n_lags = lags_iniciales.shape[1]
+    n_extra = 0 if extra is None else extra.shape[1]
+
+    # Buffer circular en orden cronológico: la posición `pos` guarda el valor más viejo
+    buffer = np.array(lags_iniciales[:, ::-1], dtype=float)
+    pos = 0
+    offsets_lags = np.arange(1, n_lags + 1)
+
+    X = np.empty((k, n_extra + 2 + n_lags))
+    if n_extra:
+        X[:, :n_extra] = extra
+    preds = np.empty((k, n_dias))
+
+    with medir("forecast.predecir_recursivo", series=k, iteraciones=n_dias):
+        for paso in range(n_dias):
+            X[:, n_extra] = dayofweek[:, paso]
+            X[:, n_extra + 1] = is_month_end[:, paso]
+            X[:, n_extra + 2:] = buffer[:, (pos - offsets_lags) % n_lags]
+
+            y_pred = model.predict(X)
+            if ruido is not None:
+                y_pred = np.maximum(y_pred + ruido[:, paso], 0)
+            preds[:, paso] = y_pred
+            buffer[:, pos] = y_pred  # actualizar lags para el siguiente paso
+            pos = (pos + 1) % n_lags
+
+    return preds
+
+
+@medido("forecast_futuro_lote", contar=lambda res, modelos, historicos, n_dias=20: {"series": len(res), "iteraciones": n_dias})
+def forecast_futuro_lote(modelos, historicos, n_dias=20):
+    """
+    Forecast futuro de muchas series avanzando en paralelo.
+
+    modelos / historicos: dicts con la misma clave (p. ej. idioma) -> modelo / df_hist.
+    Las series que comparten modelo se apilan en una sola llamada a `predict` por día.
+    Devuelve un dict clave -> df_futuro (mismo formato que `forecast_futuro`).
+    """
+    series = {}
+    for clave, df_hist in historicos.items():
+        # Asegurarse de que el índice sea datetime y usar solo fechas hábiles
+        y = df_hist["y"].copy()
+        y.index = pd.to_datetime(y.index)
+        y = y[y.index.dayofweek < 5]
+        if len(y) < len(LAGS):
+            continue
+        series[clave] = y
+
+    # Agrupar series por modelo
+    grupos = {}
+    for clave in series:
+        grupos.setdefault(id(modelos[clave]), []).append(clave)
+
+    resultados = {}
+    for claves in grupos.values():
+        calendarios = [_calendario_futuro(series[c].index.max(), n_dias) for c in claves]
+        lags_iniciales = np.array([series[c].to_numpy()[::-1][:len(LAGS)] for c in claves])
+        dayofweek = np.array([cal[1] for cal in calendarios])
+        is_month_end = np.array([cal[2] for cal in calendarios])
+
+        preds = predecir_recursivo(modelos[claves[0]], lags_iniciales, dayofweek, is_month_end)
+
+        for clave, (future_dates, _, _), future_preds in zip(claves, calendarios, preds):
+            # Calcular IC 95% usando std de residuos recientes como estimación
+            resid_std = series[clave].std()
+            ic_95_inf = np.clip(future_preds - 1.96 * resid_std, a_min=0, a_max=None)
+            ic_95_sup = future_preds + 1.96 * resid_std
+
+            resultados[clave] = pd.DataFrame({
+                "date": future_dates,
+                "pred": future_preds.astype(np.float32),
+                "ic_95_inf": ic_95_inf,
+                "ic_95_sup": ic_95_sup
+            })
+
+    return resultados
+
+
+def forecast_futuro(model, df_hist, n_dias=20):
+    return forecast_futuro_lote({0: model}, {0: df_hist}, n_dias=n_dias).get(0)
+
+
+# --- Simulación Monte Carlo ---
+
+def residuos_un_paso(model, df_hist):
+    """
+    Residuos de un paso (real - predicho) para el bootstrap, en días hábiles.
+    Si `df_hist` trae "pred" (el backtest de `forecast_idioma`) se usan esos, que son fuera de
+    muestra; si no, los del modelo sobre el histórico con los mismos lags que el forecast recursivo.
+    """
+    if "pred" in df_hist.columns:
+        residuos = (df_hist["y"] - df_hist["pred"]).to_numpy(dtype=float)
+    elif len(df_hist) > len(LAGS):
+        y = df_hist["y"].to_numpy(dtype=float)
+        fechas = pd.DatetimeIndex(df_hist.index)[len(LAGS):]
+        X = np.column_stack([
+            fechas.dayofweek, (fechas.day == fechas.days_in_month).astype(int),
+            *(y[len(LAGS) - lag:len(y) - lag] for lag in LAGS),
+        ])
+        residuos = y[len(LAGS):] - model.predict(X)
+    else:
+        residuos = np.zeros(0)
+    residuos = residuos[np.isfinite(residuos)]
+    return residuos if len(residuos) else np.zeros(1)
+
+
+@medido("simular_futuro_lote", contar=lambda res, *a, **k: {"series": len(res)})
+def simular_futuro_lote(modelos, historicos, n_dias=20, n_caminos=2000, semilla=42):
+    """
+    Caminos futuros de demanda de muchas series: `n_caminos` por serie, todos en un array.
+
+    Cada paso suma un residuo de un paso sorteado con reposición (bootstrap) a la predicción y
+    ese valor alimenta los lags siguientes, así la incertidumbre crece con el horizonte.
+    Las series que comparten modelo avanzan juntas (k x n_caminos filas por `predict`).
+    Devuelve un dict clave -> {"fechas": n_dias fechas hábiles, "caminos": (n_caminos, n_dias)}.
+    """
+    rng = np.random.default_rng(semilla)
+    series, residuos = {}, {}
+    for clave, df_hist in historicos.items():
+        df = df_hist.copy()
+        df.index = pd.to_datetime(df.index)
+        df = df[df.index.dayofweek < 5]
+        if len(df) < len(LAGS):
+            continue
+        series[clave] = df["y"]
+        residuos[clave] = residuos_un_paso(modelos[clave], df)
+
+    grupos = {}
+    for clave in series:
+        grupos.setdefault(id(modelos[clave]), []).append(clave)
+
+    resultados = {}
+    for claves in grupos.values():
+        calendarios = [_calendario_futuro(series[c].index.max(), n_dias) for c in claves]
+        lags_iniciales = np.array([series[c].to_numpy()[::-1][:len(LAGS)] for c in claves])
+        dayofweek = np.array([cal[1] for cal in calendarios])
+        is_month_end = np.array([cal[2] for cal in calendarios])
+        ruido = np.concatenate([
+            residuos[c][rng.integers(0, len(residuos[c]), size=(n_caminos, n_dias))] for c in claves
+        ])
+
+        caminos = predecir_recursivo(
+            modelos[claves[0]],
+            np.repeat(lags_iniciales, n_caminos, axis=0),
+            np.repeat(dayofweek, n_caminos, axis=0),
+            np.repeat(is_month_end, n_caminos, axis=0),
+            ruido=ruido,
+        ).reshape(len(claves), n_caminos, n_dias)
+
+        for clave, (future_dates, _, _), caminos_serie in zip(claves, calendarios, caminos):
+            resultados[clave] = {"fechas": future_dates, "caminos": caminos_serie.astype(np.float32)}
+
+    return resultados
+
 
-    future_df = pd.DataFrame(index=future_dates)
-    future_df["dayofweek"] = future_df.index.dayofweek
-    future_df["is_month_end"] = future_df.index.is_month_end.astype(int)
-
-    # Copia de la serie histórica para construir lags en cascada
-    lag_base = df_hist["y"].copy()
-    future_preds = []
-
-    for fecha in future_df.index:
-        lags = [lag_base[-i] for i in [1, 2, 3, 4, 5]]
-        features = {
-            "dayofweek": fecha.dayofweek,
-            "is_month_end": int(fecha.is_month_end),
-            "lag_1": lags[0],
-            "lag_2": lags[1],
-            "lag_3": lags[2],
-            "lag_4": lags[3],
-            "lag_5": lags[4],
-        }
-        X_new = pd.DataFrame([features])
-        y_pred = model.predict(X_new)[0]
-        lag_base.loc[fecha] = y_pred  # actualizar serie para siguientes lags
-        future_preds.append(y_pred)
-
-    # Calcular IC 95% usando std de residuos recientes como estimación
-    resid_std = df_hist["y"].std()
-    ic_95_inf = np.clip(np.array(future_preds) - 1.96 * resid_std, a_min=0, a_max=None)
-    ic_95_sup = np.array(future_preds) + 1.96 * resid_std
-
-    df_futuro = pd.DataFrame({
-        "date": future_df.index,
-        "pred": future_preds,
-        "ic_95_inf": ic_95_inf,
-        "ic_95_sup": ic_95_sup
-    })
-
-    return df_futuro.reset_index(drop=True)
+def bandas_simuladas(simulacion, percentiles=(10, 50, 90)):
+    """Percentiles diarios de los caminos simulados (más el IC 95%) de una serie, como DataFrame"""
+    caminos = simulacion["caminos"]
+    df = pd.DataFrame({"date": simulacion["fechas"]})
+    for p in percentiles:
+        df[f"p{p}"] = np.percentile(caminos, p, axis=0)
+    df["ic_95_inf"], df["ic_95_sup"] = np.percentile(caminos, [2.5, 97.5], axis=0)
+    return df
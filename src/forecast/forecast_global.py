@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+from xgboost import XGBRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+
+from src.forecast.feature_store import aht_promedio, features_pares, obtener_feature_store, pares_seleccionados
+from src.forecast.forecast_futuro import LAGS, _calendario_futuro, predecir_recursivo
+from src.forecast.forecast_module import PARAMS_DEFECTO
+from src.forecast.registro_modelos import cargar_modelo, clave_modelo, guardar_modelo
+from src.utils.instrumentacion import medido, medir
+
+CLAVES = ["cliente", "idioma"]
+COLUMNAS_LAGS = [f"lag_{lag}" for lag in LAGS]
+# Orden de columnas del modelo: categóricas (cliente, idioma) + calendario + lags
+TIPOS_FEATURES = ["c", "c", "q", "q"] + ["q"] * len(LAGS)
+
+
+def _codigos(df, categorias):
+    """Códigos de cliente e idioma según las categorías con las que se entrenó el modelo"""
+    return np.column_stack([pd.Categorical(df[col], categories=categorias[col]).codes for col in CLAVES])
+
+
+def _matriz(df_feat, categorias):
+    """Matriz de features del modelo global (lags ya escalados)"""
+    return np.column_stack([
+        _codigos(df_feat, categorias), df_feat["dayofweek"], df_feat["is_month_end"], df_feat[COLUMNAS_LAGS]
+    ])
+
+
+@medido("forecast_global", contar=lambda res, *a, **k: {"filas": 0 if res[0] is None else len(res[0])})
+def forecast_global(df, idiomas, clientes, fecha_inicio="2025-01-01", params=None, usar_registro=True, n_jobs=None, store=None):
+    """
+    Alternativa a `forecast_multiidioma` con un único modelo para todas las series
+    cliente + idioma seleccionadas: cliente e idioma entran como features categóricas y
+    cada serie se escala por su media de entrenamiento. El backtest de todas las series
+    es un solo `predict` y el costo crece con las filas, no con la cantidad de series.
+
+    Devuelve (df_forecast_all, modelo_global, metricas) con el mismo formato por idioma
+    que `forecast_multiidioma`; `modelo_global` es lo que recibe `forecast_futuro_global`.
+    """
+    # Features de cada serie cliente + idioma: cortes del feature store
+    if store is None:
+        store = obtener_feature_store(df)
+    pares = pares_seleccionados(store, idiomas, clientes)
+    if not pares:
+        return None, None, None
+    df_feat = features_pares(store, pares, fecha_inicio)
+
+    # Split dinámico por serie: últimos 30 días hábiles como test (series con menos de 31 quedan afuera)
+    habiles = df_feat[df_feat["date"].dt.dayofweek < 5]
+    desde_fin = habiles.groupby(CLAVES).cumcount(ascending=False)
+    fecha_split = habiles[desde_fin == 29].set_index(CLAVES)["date"].rename("fecha_split")
+    df_feat = df_feat.merge(fecha_split.reset_index(), on=CLAVES, how="inner")
+    es_train = df_feat["date"] < df_feat["fecha_split"]
+    es_test = ~es_train & (df_feat["date"].dt.dayofweek < 5)
+    if not es_train.any() or not es_test.any():
+        return None, None, None
+
+    # Escala por serie: media de entrenamiento
+    escalas = df_feat[es_train].groupby(CLAVES)["y"].mean()
+    escalas = escalas.where(escalas > 0, 1.0).rename("escala")
+    df_feat = df_feat.merge(escalas.reset_index(), on=CLAVES, how="inner")
+    df_feat[["y"] + COLUMNAS_LAGS] = df_feat[["y"] + COLUMNAS_LAGS].div(df_feat["escala"], axis=0)
+
+    categorias = {col: sorted(df_feat[col].unique().tolist()) for col in CLAVES}
+    X = _matriz(df_feat, categorias)
+    y = df_feat["y"].to_numpy()
+
+    # Modelo: se reutiliza del registro si ya se entrenó con los mismos datos y parámetros
+    params = {**PARAMS_DEFECTO, **(params or {})}
+    with medir("forecast_global.entrenamiento", filas=int(es_train.sum()), series=len(pares), iteraciones=params["n_estimators"]) as tramo:
+        entrada = None
+        if usar_registro:
+            params_clave = {**params, "modelo": "global"}
+            clave = clave_modelo(clientes, idiomas, fecha_inicio, params_clave, df_feat[es_train].drop(columns="fecha_split"))
+            entrada = cargar_modelo(clave)
+
+        if entrada is not None:
+            model = entrada["modelo"]
+            if n_jobs is not None:
+                model.set_params(n_jobs=n_jobs)
+        else:
+            model = XGBRegressor(
+                **params, enable_categorical=True, tree_method="hist", feature_types=TIPOS_FEATURES,
+                **({} if n_jobs is None else {"n_jobs": n_jobs})
+            )
+            model.fit(X[es_train.to_numpy()], y[es_train.to_numpy()])
+        tramo["desde_registro"] = entrada is not None
+
+    # Backtest de todas las series en un solo predict, sumado por idioma
+    df_test = df_feat.loc[es_test, CLAVES + ["date", "y", "escala"]].copy()
+    with medir("forecast_global.backtest", filas=len(df_test)):
+        df_test["pred"] = model.predict(X[es_test.to_numpy()]) * df_test["escala"]
+    df_test["real"] = df_test["y"] * df_test["escala"]
+    df_test = df_test.groupby(["idioma", "date"], as_index=False)[["real", "pred"]].sum()
+
+    # AHT promedio por idioma desde el histórico
+    aht_prom = {idioma: aht_promedio(store, [par for par in pares if par[1] == idioma]) for idioma in idiomas}
+
+    df_total = []
+    metricas = {}
+    std_idioma = {}
+    grupos = dict(tuple(df_test.groupby("idioma")))
+    for idioma in [i for i in idiomas if i in grupos]:
+        df_i = grupos[idioma].set_index("date")
+        y_test, y_pred = df_i["real"].copy(), df_i["pred"]
+
+        # Outlier puntual
+        outlier_date = pd.Timestamp("2025-04-21")
+        if outlier_date in y_test.index:
+            entorno = y_test.loc["2025-04-16":"2025-04-25"].drop(index=outlier_date)
+            y_test.loc[outlier_date] = entorno.mean()
+
+        std_err = (y_test - y_pred).std()
+        df_total.append(pd.DataFrame({
+            "date": y_test.index,
+            "real": y_test.values,
+            "pred": y_pred.values,
+            "ic_95_inf": np.clip(y_pred.values - 1.96 * std_err, a_min=0, a_max=None),
+            "ic_95_sup": y_pred.values + 1.96 * std_err,
+            "aht": aht_prom.get(idioma, np.nan),
+            "idioma": idioma,
+        }))
+        metricas[idioma] = {
+            "MAE": round(mean_absolute_error(y_test, y_pred), 2),
+            "RMSE": round(np.sqrt(mean_squared_error(y_test, y_pred)), 2),
+            "MAPE": round(np.mean(np.abs((y_test - y_pred) / y_test.replace(0, np.nan))) * 100, 2)
+        }
+        std_idioma[idioma] = y_test.std()
+
+    if usar_registro and entrada is None:
+        guardar_modelo(clave, model, metricas)
+
+    # Estado para el forecast futuro: últimos lags hábiles (escalados) y fecha de cada serie
+    # (toda serie con split tiene al menos 31 días hábiles: `tail` deja exactamente len(LAGS) filas)
+    ultimos = df_feat[df_feat["date"].dt.dayofweek < 5].sort_values(CLAVES + ["date"]).groupby(CLAVES).tail(len(LAGS))
+    series = ultimos.groupby(CLAVES).agg(ultima_fecha=("date", "max"), escala=("escala", "first"))
+    series[COLUMNAS_LAGS] = ultimos["y"].to_numpy().reshape(-1, len(LAGS))[:, ::-1]
+
+    modelo_global = {
+        "modelo": model,
+        "categorias": categorias,
+        "series": series.reset_index(),
+        "std_idioma": std_idioma,
+    }
+
+    df_forecast_all = pd.concat(df_total, ignore_index=True)
+    return df_forecast_all.sort_values("date"), modelo_global, metricas
+
+
+@medido("forecast_futuro_global", contar=lambda res, modelo_global, n_dias=20: {"series": len(modelo_global["series"]), "iteraciones": n_dias})
+def forecast_futuro_global(modelo_global, n_dias=20):
+    """
+    Forecast futuro de todas las series con el modelo global: un `predict` por día para
+    todas las series (`predecir_recursivo`), desescalado y sumado por idioma.
+    Mismo formato que `forecast_futuro_multiidioma`.
+    """
+    series = modelo_global["series"]
+    if series.empty:
+        return None
+
+    # Calendario por fecha de corte (las series que terminan el mismo día lo comparten)
+    calendarios = {fecha: _calendario_futuro(fecha, n_dias) for fecha in series["ultima_fecha"].unique()}
+    cal_series = [calendarios[fecha] for fecha in series["ultima_fecha"]]
+
+    extra = _codigos(series, modelo_global["categorias"])
+    preds = predecir_recursivo(
+        modelo_global["modelo"],
+        series[COLUMNAS_LAGS].to_numpy(dtype=float),
+        np.array([cal[1] for cal in cal_series]),
+        np.array([cal[2] for cal in cal_series]),
+        extra=extra,
+    ) * series["escala"].to_numpy()[:, None]
+
+    df_pred = pd.DataFrame({
+        "idioma": np.repeat(series["idioma"].to_numpy(), n_dias),
+        "cliente": np.repeat(series["cliente"].to_numpy(), n_dias),
+        "date": np.concatenate([cal[0] for cal in cal_series]),
+        "pred": preds.ravel(),
+    })
+
+    df_futuro = df_pred.groupby(["idioma", "date"], as_index=False).agg(
+        pred=("pred", "sum"), cliente=("cliente", lambda c: "+".join(sorted(c.unique())))
+    )
+    # Solo los primeros n_dias hábiles de cada idioma (si las series terminan en fechas distintas)
+    df_futuro = df_futuro.groupby("idioma").head(n_dias)
+
+    # IC 95% con la std del real reciente de cada idioma, como `forecast_futuro`
+    resid_std = df_futuro["idioma"].map(modelo_global["std_idioma"])
+    df_futuro["ic_95_inf"] = np.clip(df_futuro["pred"] - 1.96 * resid_std, a_min=0, a_max=None)
+    df_futuro["ic_95_sup"] = df_futuro["pred"] + 1.96 * resid_std
+    df_futuro["pred"] = df_futuro["pred"].astype(np.float32)
+
+    return df_futuro[["date", "pred", "ic_95_inf", "ic_95_sup", "idioma", "cliente"]].sort_values(["idioma", "date"])
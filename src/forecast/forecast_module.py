@@ -3,32 +3,28 @@ import numpy as np
 from xgboost import XGBRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 
-def forecast_idioma(df, idioma, cliente, fecha_inicio="2025-01-01"):
-    # Validación inicial
-    if df.empty or idioma not in df["idioma"].unique():
-        return None, None, None
-
-    # Filtrado por idioma, cliente y días hábiles
-    idioma = [idioma] if isinstance(idioma, str) else idioma
-    df_idioma = df[df["idioma"].isin(idioma) & df["cliente"].isin(cliente)].copy()
-    df_idioma = df_idioma[df_idioma["date"].dt.dayofweek < 5]
+from src.forecast.feature_store import features_serie, obtener_feature_store
+from src.forecast.registro_modelos import cargar_modelo, clave_modelo, guardar_modelo, params_ajustados
+from src.utils.instrumentacion import medido, medir
 
-    # Suavizado
-    serie = df_idioma.set_index("date")["y"].resample("D").sum().fillna(0)
-    serie_suavizada = serie.rolling(window=3, center=True).mean().dropna()
-    serie_ultimos = serie_suavizada[serie_suavizada.index >= fecha_inicio]
+# Hiperparámetros por defecto del modelo
+PARAMS_DEFECTO = {"n_estimators": 50, "learning_rate": 0.1, "random_state": 42}
 
-    # Features + lags
-    df_feat = serie_ultimos.reset_index()
-    df_feat.columns = ["date", "y"]
-    df_feat["dayofweek"] = df_feat["date"].dt.dayofweek
-    df_feat["is_month_end"] = df_feat["date"].dt.is_month_end.astype(int)
+@medido("forecast_idioma", contar=lambda res, *a, **k: {"filas": 0 if res[0] is None else len(res[0]), "series": 1})
+def forecast_idioma(df, idioma, cliente, fecha_inicio="2025-01-01", params=None, usar_registro=True, n_jobs=None, store=None, usar_ajustados=True):
+    # Features del feature store (se construye una vez por dataset y se reutiliza)
+    if store is None:
+        store = obtener_feature_store(df)
 
-    for lag in [1, 2, 3, 4, 5]:
-        df_feat[f"lag_{lag}"] = df_feat["y"].shift(lag)
+    # Validación inicial
+    idioma = [idioma] if isinstance(idioma, str) else idioma
+    if not any(i in store["pares"] for i in idioma):
+        return None, None, None
 
-    df_feat.dropna(inplace=True)
-    df_feat.set_index("date", inplace=True)
+    # Suavizado + features + lags: serie de idioma(s) y cliente(s) desde fecha_inicio
+    with medir("forecast_idioma.features") as tramo:
+        df_feat, aht_prom = features_serie(store, idioma, cliente, fecha_inicio)
+        tramo["filas"] = len(df_feat)
 
     # Split dinámico: últimos 30 días hábiles como test
     dias_habiles = df_feat.index[df_feat.index.dayofweek < 5]
@@ -57,12 +53,30 @@ def forecast_idioma(df, idioma, cliente, fecha_inicio="2025-01-01"):
         entorno = y_test.loc["2025-04-16":"2025-04-25"].drop(index=outlier_date)
         y_test.loc[outlier_date] = entorno.mean()
 
-    # Modelo
-    model = XGBRegressor(n_estimators=50, learning_rate=0.1, random_state=42)
-    model.fit(X_train, y_train)
+    # Modelo: se reutiliza del registro si ya se entrenó con los mismos datos y parámetros.
+    # Sin `params` explícitos se usan los ajustados de la serie, si hay (ver `ajuste_hiperparametros`)
+    if params is None and usar_ajustados:
+        params = params_ajustados(cliente, idioma)
+    params = {**PARAMS_DEFECTO, **(params or {})}
+    with medir("forecast_idioma.entrenamiento", filas=len(X_train), iteraciones=params["n_estimators"]) as tramo:
+        entrada = None
+        if usar_registro:
+            clave = clave_modelo(cliente, idioma, fecha_inicio, params, df_feat[df_feat.index < fecha_split])
+            entrada = cargar_modelo(clave)
+
+        if entrada is not None:
+            model = entrada["modelo"]
+            if n_jobs is not None:
+                model.set_params(n_jobs=n_jobs)
+        else:
+            # n_jobs no forma parte de la clave: no cambia el modelo, solo los hilos que usa
+            model = XGBRegressor(**params) if n_jobs is None else XGBRegressor(**params, n_jobs=n_jobs)
+            model.fit(X_train, y_train)
+        tramo["desde_registro"] = entrada is not None
 
     # Predicción + IC
-    y_pred = pd.Series(model.predict(X_test), index=X_test.index)
+    with medir("forecast_idioma.backtest", filas=len(X_test)):
+        y_pred = pd.Series(model.predict(X_test), index=X_test.index)
     resid = y_test - y_pred
     std_err = resid.std()
     ci_sup = y_pred + 1.96 * std_err
@@ -92,9 +106,11 @@ def forecast_idioma(df, idioma, cliente, fecha_inicio="2025-01-01"):
         "MAPE": round(np.mean(np.abs((y_test - y_pred) / y_test.replace(0, np.nan))) * 100, 2)
     }
     df_out = df_out[df_out["date"].dt.dayofweek < 5]
+
+    if usar_registro and entrada is None:
+        guardar_modelo(clave, model, metricas)
     
     # Agregamos aht por combinación cliente+idioma si está en df original
-    aht_prom = df_idioma["aht"].mean() if "aht" in df_idioma.columns else np.nan
     df_out["aht"] = aht_prom
 
     return df_out, model, metricas
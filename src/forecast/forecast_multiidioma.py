@@ -0,0 +1,136 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import pandas as pd
+
+from src.forecast.feature_store import obtener_feature_store
+from src.forecast.forecast_module import forecast_idioma
+from src.forecast.forecast_futuro import bandas_simuladas, forecast_futuro_lote, simular_futuro_lote
+from src.utils.instrumentacion import con_etiquetas
+
+
+def repartir_nucleos(n_workers, n_tareas, nucleos=None):
+    """
+    Reparte los núcleos entre el pool y XGBoost: devuelve (workers, n_jobs por modelo)
+    de forma que workers * n_jobs no supere los núcleos disponibles (o `nucleos`, si se limita).
+    """
+    nucleos = max(1, min(nucleos or os.cpu_count() or 1, os.cpu_count() or 1))
+    workers = max(1, min(n_workers or nucleos, n_tareas, nucleos))
+    return workers, max(1, nucleos // workers)
+
+
+def _mapear(funcion, tareas, n_workers, modo):
+    """map ordenado: secuencial con 1 worker, si no con un pool de hilos o procesos"""
+    if n_workers <= 1 or not tareas:
+        return [funcion(*t) for t in tareas]
+
+    if modo == "procesos":
+        pool = ProcessPoolExecutor
+    else:
+        # Los tramos de los hilos del pool llevan la sesión/ejecución de quien los lanzó
+        pool, funcion = ThreadPoolExecutor, con_etiquetas(funcion)
+    with pool(max_workers=n_workers) as executor:
+        return list(executor.map(funcion, *zip(*tareas)))
+
+
+# --- Función para múltiples idiomas ---
+def forecast_multiidioma(df, idiomas, clientes, n_workers=1, modo="hilos"):
+    """
+    Entrena un modelo por idioma. Con `n_workers` > 1 los idiomas se entrenan en paralelo
+    (modo "hilos" o "procesos"), repartiendo los núcleos con el `n_jobs` de XGBoost.
+    El resultado respeta el orden de `idiomas`.
+    """
+    n_workers, n_jobs = repartir_nucleos(n_workers, len(idiomas))
+    if n_workers == 1:
+        n_jobs = None  # secuencial: XGBoost usa su configuración por defecto
+
+    # Features de todas las series en una pasada; cada idioma es un corte del store
+    store = obtener_feature_store(df)
+    entrenar = partial(forecast_idioma, n_jobs=n_jobs, store=store)
+    resultados = _mapear(entrenar, [(df, idioma, clientes) for idioma in idiomas], n_workers, modo)
+
+    df_total = []
+    metricas_total = {}
+    modelos_total = {}
+
+    for idioma, (df_i, modelo_i, metricas_i) in zip(idiomas, resultados):
+        if df_i is not None:
+            df_i["idioma"] = idioma
+            df_total.append(df_i)
+            metricas_total[idioma] = metricas_i
+            modelos_total[idioma] = modelo_i
+
+    if df_total:
+        df_preparados = []
+        for df in df_total:
+            # Si el índice es "date" y además ya hay una columna "date", eliminamos la columna para evitar conflicto
+            if "date" in df.index.names and "date" in df.columns:
+                df = df.drop(columns="date").reset_index()
+            elif "date" in df.index.names:
+                df = df.reset_index()
+            df_preparados.append(df)
+
+        df_forecast_all = pd.concat(df_preparados, ignore_index=True).sort_values("date")
+
+
+        return df_forecast_all, modelos_total, metricas_total
+    else:
+        return None, None, None
+
+
+def _historicos(modelos_dict, df_forecast_all):
+    """Histórico (backtest) de cada idioma con "y" = real, indexado por fecha"""
+    historicos = {}
+    for idioma in modelos_dict:
+        df_hist = df_forecast_all[df_forecast_all["idioma"] == idioma].copy()
+        df_hist.set_index("date", inplace=True)
+        df_hist["y"] = df_hist["real"]
+        historicos[idioma] = df_hist
+    return historicos
+
+
+# --- Forecast futuro por idioma ---
+def forecast_futuro_multiidioma(modelos_dict, df_forecast_all, n_dias):
+    """Forecast futuro de todos los idiomas avanzando en paralelo con `forecast_futuro_lote`"""
+    historicos = _historicos(modelos_dict, df_forecast_all)
+
+    futuros = forecast_futuro_lote(modelos_dict, historicos, n_dias=n_dias)
+
+    df_futuro_total = []
+    for idioma, df_fut in futuros.items():
+        df_fut["idioma"] = idioma
+
+        # Extraer cliente desde df_hist (único por idioma)
+        df_hist = historicos[idioma]
+        cliente = df_hist["cliente"].iloc[0] if "cliente" in df_hist.columns else "desconocido"
+        df_fut["cliente"] = cliente
+
+        df_futuro_total.append(df_fut)
+
+    if df_futuro_total:
+        df_futuro_all = pd.concat(df_futuro_total).sort_values(["idioma", "date"])
+        return df_futuro_all
+    else:
+        return None
+
+
+# --- Simulación Monte Carlo por idioma ---
+def simular_futuro_multiidioma(modelos_dict, df_forecast_all, n_dias, n_caminos=2000, semilla=42):
+    """
+    Como `forecast_futuro_multiidioma`, pero con el IC 95% y los percentiles p10/p50/p90 de
+    `n_caminos` caminos simulados por idioma (residuos del backtest con bootstrap), que se
+    abren con el horizonte. Devuelve (df_futuro, simulaciones idioma -> caminos).
+    """
+    df_futuro = forecast_futuro_multiidioma(modelos_dict, df_forecast_all, n_dias)
+    if df_futuro is None:
+        return None, {}
+
+    simulaciones = simular_futuro_lote(
+        modelos_dict, _historicos(modelos_dict, df_forecast_all), n_dias=n_dias, n_caminos=n_caminos, semilla=semilla
+    )
+    bandas = pd.concat(
+        [bandas_simuladas(sim).assign(idioma=idioma) for idioma, sim in simulaciones.items()], ignore_index=True
+    )
+    df_futuro = df_futuro.drop(columns=["ic_95_inf", "ic_95_sup"]).merge(bandas, on=["idioma", "date"], how="left")
+    return df_futuro, simulaciones
@@ -0,0 +1,202 @@
+"""
+Forecast intradía: reparte el forecast diario en intervalos (96 de 15 minutos por día) con el
+perfil histórico de cada serie y día de la semana, y calcula Erlang C por intervalo en lote.
+
+    perfiles = perfiles_intradia(leer_dataset("llamadas_intervalo"))
+    df_intervalos = fte_intervalos(repartir_intradia(df_futuro, perfiles))
+"""
+import numpy as np
+import pandas as pd
+
+from src.etl.transform_calls import MINUTOS_INTERVALO
+from src.utils.instrumentacion import medido
+from src.workforce.erlang_calculator import estimar_fte_erlang_c_lote
+
+CLAVES = ["cliente", "idioma"]
+
+# Cliente comodín: perfil del idioma con todos los clientes sumados (para forecasts agregados)
+TODOS = "*"
+
+
+def etiquetas_hora(minutos=MINUTOS_INTERVALO):
+    """Inicio de cada intervalo del día como texto HH:MM"""
+    return [f"{m // 60:02d}:{m % 60:02d}" for m in range(0, 1440, minutos)]
+
+
+def _codigos_series(clientes, idiomas):
+    """Código entero por serie (cliente, idioma) sin armar tuplas: factoriza cada columna y combina"""
+    codigos_cliente, nombres_cliente = pd.factorize(clientes)
+    codigos_idioma, nombres_idioma = pd.factorize(idiomas)
+    codigos, combinados = pd.factorize(codigos_cliente.astype(np.int64) * len(nombres_idioma) + codigos_idioma)
+    clientes_serie = np.asarray(nombres_cliente, dtype=str)[combinados // len(nombres_idioma)]
+    idiomas_serie = np.asarray(nombres_idioma, dtype=str)[combinados % len(nombres_idioma)]
+    return codigos, clientes_serie, idiomas_serie
+
+
+def _acumular(codigos, n_celdas, pesos):
+    return np.bincount(codigos, weights=pesos, minlength=n_celdas)
+
+
+@medido("perfiles_intradia", contar=lambda perfiles, *a, **k: {"series": len(perfiles["claves"]), "filas": int(perfiles["perfil"].size)})
+def perfiles_intradia(df_intervalos, minutos=MINUTOS_INTERVALO, semanas=8):
+    """
+    Perfil intradía por serie (cliente, idioma) y día de la semana con las últimas `semanas`
+    semanas de cada serie: proporción de las llamadas del día que cae en cada intervalo y AHT
+    ponderado por llamadas de cada intervalo. Además de las series, cada idioma tiene un perfil
+    con el cliente comodín `TODOS`.
+
+    Todo se acumula con un `bincount` sobre el código (serie, día de la semana, intervalo).
+    Los días de la semana sin historia usan el perfil de toda la semana de la serie y los
+    intervalos sin AHT el AHT de la serie.
+
+    Devuelve un dict con `claves` (MultiIndex cliente, idioma), `perfil` y `aht`
+    (float32, series x 7 x intervalos) y `minutos`.
+    """
+    df = df_intervalos[["date", "cliente", "idioma", "intervalo", "y", "aht"]]
+    codigos_serie, clientes, idiomas_series = _codigos_series(df["cliente"], df["idioma"])
+    fechas = df["date"].to_numpy()
+    ultima = pd.Series(fechas).groupby(codigos_serie).max().to_numpy()
+    recientes = fechas > ultima[codigos_serie] - np.timedelta64(semanas, "W")
+
+    n_intervalos = 1440 // minutos
+    forma = (len(clientes), 7, n_intervalos)
+    codigos = np.ravel_multi_index((
+        codigos_serie[recientes],
+        pd.DatetimeIndex(fechas[recientes]).dayofweek.to_numpy(),
+        df["intervalo"].to_numpy()[recientes],
+    ), forma)
+    y = df["y"].to_numpy(dtype=float)[recientes]
+    aht = df["aht"].to_numpy(dtype=float)[recientes]
+    con_aht = ~np.isnan(aht)
+
+    acumulados = [
+        _acumular(codigos, np.prod(forma), pesos).reshape(forma)
+        for pesos in (y, np.where(con_aht, aht * y, 0.0), np.where(con_aht, y, 0.0))
+    ]
+
+    # Perfil por idioma (cliente comodín): suma de las series del idioma
+    idiomas_serie, idiomas = pd.factorize(idiomas_series)
+    claves = pd.MultiIndex.from_arrays([
+        np.concatenate([clientes, np.full(len(idiomas), TODOS)]),
+        np.concatenate([idiomas_series, idiomas]),
+    ], names=CLAVES)
+    llamadas, aht_x_y, y_con_aht = (
+        np.concatenate([a, np.stack([a[idiomas_serie == i].sum(axis=0) for i in range(len(idiomas))])])
+        for a in acumulados
+    )
+
+    # Proporción por intervalo; días de la semana sin llamadas -> perfil semanal de la serie
+    with np.errstate(divide="ignore", invalid="ignore"):
+        total_dia = llamadas.sum(axis=2, keepdims=True)
+        semanal = llamadas.sum(axis=1, keepdims=True)
+        perfil = np.where(
+            total_dia > 0, llamadas / total_dia, semanal / semanal.sum(axis=2, keepdims=True)
+        )
+
+        # AHT del intervalo -> del intervalo en toda la semana -> de la serie
+        aht_perfil = aht_x_y / y_con_aht
+        aht_semanal = aht_x_y.sum(axis=1, keepdims=True) / y_con_aht.sum(axis=1, keepdims=True)
+        aht_serie = aht_x_y.sum(axis=(1, 2), keepdims=True) / y_con_aht.sum(axis=(1, 2), keepdims=True)
+    aht_perfil = np.where(np.isnan(aht_perfil), aht_semanal, aht_perfil)
+    aht_perfil = np.where(np.isnan(aht_perfil), aht_serie, aht_perfil)
+
+    return {
+        "claves": claves,
+        "perfil": np.nan_to_num(perfil).astype(np.float32),
+        "aht": aht_perfil.astype(np.float32),
+        "minutos": minutos,
+    }
+
+
+def _indices_perfil(perfiles, clientes, idiomas):
+    """Perfil de cada fila: el de su serie o, si no existe (p. ej. clientes agregados), el del idioma"""
+    claves = perfiles["claves"]
+    idiomas = np.asarray(idiomas, dtype=str)
+    indices = claves.get_indexer(pd.MultiIndex.from_arrays([np.asarray(clientes, dtype=str), idiomas]))
+    faltan = indices < 0
+    if faltan.any():
+        indices[faltan] = claves.get_indexer(
+            pd.MultiIndex.from_arrays([np.full(faltan.sum(), TODOS), idiomas[faltan]])
+        )
+    return indices
+
+
+@medido("repartir_intradia", contar=lambda df, *a, **k: {"filas": len(df)})
+def repartir_intradia(df_diario, perfiles, col_llamadas="pred", col_aht="aht"):
+    """
+    Reparte las llamadas diarias de `df_diario` (date, cliente, idioma, `col_llamadas` y,
+    opcional, `col_aht`) en los intervalos del día según `perfiles_intradia`.
+
+    Cada fila toma el perfil de su serie y día de la semana con indexación de arrays (sin
+    recorrer filas) y solo se emiten los intervalos con demanda. El AHT es el del perfil del
+    intervalo, con el AHT diario como respaldo. Las filas de idiomas sin perfil se descartan.
+
+    Devuelve (date, cliente, idioma, intervalo, hora, llamadas, aht).
+    """
+    columnas = ["date", "cliente", "idioma", "intervalo", "hora", "llamadas", "aht"]
+    indices = _indices_perfil(perfiles, df_diario["cliente"], df_diario["idioma"])
+    sin_perfil = indices < 0
+    if sin_perfil.any():
+        faltantes = sorted(set(df_diario["idioma"].astype(str)[sin_perfil]))
+        print(f"⚠️ Sin perfil intradía para {faltantes}: esas filas no se reparten")
+    df_diario = df_diario[~sin_perfil]
+    indices = indices[~sin_perfil]
+    if df_diario.empty:
+        return pd.DataFrame(columns=columnas)
+
+    fechas = pd.DatetimeIndex(df_diario["date"])
+    dayofweek = np.asarray(fechas.dayofweek)
+    proporciones = perfiles["perfil"][indices, dayofweek]  # (filas, intervalos)
+    fila, intervalo = np.nonzero(proporciones > 0)
+
+    llamadas = df_diario[col_llamadas].to_numpy(dtype=float)[fila] * proporciones[fila, intervalo]
+    aht = perfiles["aht"][indices[fila], dayofweek[fila], intervalo].astype(float)
+    if col_aht in df_diario.columns:
+        aht = np.where(np.isnan(aht), df_diario[col_aht].to_numpy(dtype=float)[fila], aht)
+
+    return pd.DataFrame({
+        "date": fechas[fila],
+        "cliente": pd.Categorical(df_diario["cliente"].astype(str).to_numpy()[fila]),
+        "idioma": pd.Categorical(df_diario["idioma"].astype(str).to_numpy()[fila]),
+        "intervalo": intervalo.astype(np.int16),
+        "hora": pd.Categorical.from_codes(intervalo, categories=etiquetas_hora(perfiles["minutos"])),
+        "llamadas": llamadas.astype(np.float32),
+        "aht": aht.astype(np.float32),
+    }, columns=columnas)
+
+
+def fte_intervalos(df_intervalos, asa_segundos=20, sla_pct=0.8, shrinkage_pct=0.3, minutos=MINUTOS_INTERVALO):
+    """
+    Erlang C de todos los intervalos (de todas las series y días) en una sola llamada
+    vectorizada, con el intervalo de `minutos` como período del tráfico.
+    Agrega a `df_intervalos` fte_estimado (con shrinkage), fte_neto, sla_estimado y erlangs.
+    """
+    llamadas = df_intervalos["llamadas"].to_numpy(dtype=float)
+    aht = df_intervalos["aht"].to_numpy(dtype=float)
+    resultado = estimar_fte_erlang_c_lote(
+        np.where(llamadas > 0, llamadas, np.nan), aht,
+        asa_segundos=asa_segundos, sla_pct=sla_pct, shrinkage_pct=shrinkage_pct,
+        intervalo_segundos=minutos * 60,
+    )
+    return df_intervalos.assign(
+        fte_estimado=pd.array(resultado["fte_ajustado"], dtype="Int64"),
+        fte_neto=pd.array(resultado["fte_neto"], dtype="Int64"),
+        sla_estimado=resultado["sla_estimado"].astype(np.float32),
+        erlangs=resultado["erlangs"].astype(np.float32),
+    )
+
+
+def resumir_intervalos(df_fte, minutos=MINUTOS_INTERVALO):
+    """
+    Resumen diario de `fte_intervalos` por serie: llamadas, pico de FTE (con y sin shrinkage),
+    horas de agente netas e intervalos con demanda.
+    """
+    resumen = df_fte.groupby(["date"] + CLAVES, observed=True).agg(
+        llamadas=("llamadas", "sum"),
+        fte_pico=("fte_estimado", "max"),
+        fte_neto_pico=("fte_neto", "max"),
+        horas_agente=("fte_neto", "sum"),
+        intervalos=("intervalo", "size"),
+    )
+    resumen["horas_agente"] = resumen["horas_agente"].astype(float) * minutos / 60
+    return resumen.round({"llamadas": 1, "horas_agente": 2}).reset_index()
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import joblib
+import pandas as pd
+import xgboost
+
+from src.utils.paths import get_model_dir
+
+# Política de limpieza del registro
+MAX_EDAD_DIAS = 30
+MAX_MB = 500
+
+
+def get_registro_dir():
+    return get_model_dir() / "registro"
+
+
+def hash_datos(df):
+    """Huella de un DataFrame/Series (valores + índice)"""
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=True).values.tobytes()).hexdigest()
+
+
+def clave_modelo(cliente, idioma, fecha_inicio, params, df_entrenamiento):
+    """
+    Clave del registro a partir de (cliente, idioma, fecha_inicio, hiperparámetros) y la
+    huella de los datos con los que se entrena el modelo.
+    """
+    as_lista = lambda x: sorted([x] if isinstance(x, str) else list(x))
+    meta = {
+        "cliente": as_lista(cliente),
+        "idioma": as_lista(idioma),
+        "fecha_inicio": str(fecha_inicio),
+        "params": params,
+        "xgboost": xgboost.__version__,
+        "datos": hash_datos(df_entrenamiento),
+    }
+    return hashlib.sha256(json.dumps(meta, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+
+def cargar_modelo(clave):
+    """Devuelve {"modelo", "metricas", "creado"} si la clave está en el registro, si no None"""
+    path = get_registro_dir() / f"{clave}.joblib"
+    if not path.exists():
+        return None
+    try:
+        entrada = joblib.load(path)
+    except Exception:
+        return None  # archivo corrupto o de otra versión: se reentrena
+
+    os.utime(path)  # marca de último uso para la limpieza por antigüedad
+    return entrada
+
+
+def guardar_modelo(clave, modelo, metricas):
+    """Guarda modelo + métricas de forma atómica y aplica la política de limpieza"""
+    registro_dir = get_registro_dir()
+    try:
+        os.makedirs(registro_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=registro_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            joblib.dump({"modelo": modelo, "metricas": metricas, "creado": time.time()}, f)
+        os.replace(tmp_path, registro_dir / f"{clave}.joblib")
+    except OSError:
+        return  # sin permisos de escritura: el forecast sigue funcionando sin registro
+
+    purgar_registro()
+
+
+def purgar_registro(max_edad_dias=MAX_EDAD_DIAS, max_mb=MAX_MB):
+    """Elimina modelos sin uso hace más de `max_edad_dias` y, si el registro supera `max_mb`, los más viejos"""
+    registro_dir = get_registro_dir()
+    if not registro_dir.exists():
+        return
+
+    archivos = []
+    for path in registro_dir.glob("*.joblib"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        archivos.append((stat.st_mtime, stat.st_size, path))
+
+    limite_edad = time.time() - max_edad_dias * 86400
+    total = sum(tamano for _, tamano, _ in archivos)
+
+    # Más viejos primero
+    for mtime, tamano, path in sorted(archivos, key=lambda x: x[0]):
+        if mtime >= limite_edad and total <= max_mb * 1024 * 1024:
+            break
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total -= tamano
+
+
+# --- Hiperparámetros ajustados por serie (ver `ajuste_hiperparametros`) ---
+
+_CACHE_HIPERPARAMETROS = {}
+
+
+def get_hiperparametros_path():
+    return get_model_dir() / "hiperparametros.json"
+
+
+def cargar_hiperparametros():
+    """{"cliente|idioma": entrada} del archivo de ajustes; se relee solo si el archivo cambió"""
+    path = get_hiperparametros_path()
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if _CACHE_HIPERPARAMETROS.get("mtime") != mtime:
+        try:
+            with open(path, encoding="utf-8") as f:
+                ajustes = json.load(f)
+        except (OSError, ValueError):
+            ajustes = {}  # archivo corrupto: se usan los parámetros por defecto
+        _CACHE_HIPERPARAMETROS.update(mtime=mtime, ajustes=ajustes)
+    return _CACHE_HIPERPARAMETROS["ajustes"]
+
+
+def guardar_hiperparametros(nuevos):
+    """Agrega/reemplaza entradas {"cliente|idioma": entrada} de forma atómica"""
+    path = get_hiperparametros_path()
+    ajustes = {**cargar_hiperparametros(), **nuevos}
+    os.makedirs(path.parent, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(ajustes, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    return ajustes
+
+
+def params_ajustados(cliente, idioma):
+    """Hiperparámetros ajustados de una serie (un cliente y un idioma), o None si no hay"""
+    cliente = [cliente] if isinstance(cliente, str) else list(cliente)
+    idioma = [idioma] if isinstance(idioma, str) else list(idioma)
+    if len(cliente) != 1 or len(idioma) != 1:
+        return None
+    entrada = cargar_hiperparametros().get(f"{cliente[0]}|{idioma[0]}")
+    return None if entrada is None else entrada["params"]
+
+
+def huella_hiperparametros():
+    """Huella del archivo de ajustes (para invalidar checkpoints/caches cuando cambia)"""
+    ajustes = cargar_hiperparametros()
+    return hashlib.sha256(json.dumps(ajustes, sort_keys=True).encode()).hexdigest()[:16] if ajustes else None
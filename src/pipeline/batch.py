@@ -0,0 +1,337 @@
+"""
+Pipeline batch sin interfaz: ETL -> forecast por cliente + idioma -> FTEs con Erlang C.
+
+Pensado para correr de noche y dejar los resultados listos para que la app solo los lea:
+
+    python -m src.pipeline.batch --workers 4 --n-dias 20
+    python -m src.pipeline.batch --intradia          # además, FTEs por intervalo de 15 minutos
+
+Cada serie terminada se guarda como checkpoint; si la corrida se corta, al volver a
+lanzarla con los mismos datos y parámetros se retoma desde las series pendientes.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from urllib.parse import quote
+
+import joblib
+import pandas as pd
+
+from src.etl.transform_calls import (
+    MINUTOS_INTERVALO,
+    leer_llamadas_diarias,
+    procesar_llamadas,
+    procesar_llamadas_incremental,
+    procesar_llamadas_intervalo,
+)
+from src.forecast.feature_store import obtener_feature_store
+from src.forecast.forecast_futuro import forecast_futuro
+from src.forecast.forecast_module import forecast_idioma
+from src.forecast.intradia import fte_intervalos, perfiles_intradia, repartir_intradia
+from src.forecast.forecast_multiidioma import repartir_nucleos
+from src.forecast.registro_modelos import huella_hiperparametros
+from src.utils.almacenamiento import existe_dataset, guardar_dataset, leer_dataset
+from src.utils.indice_series import indexar_series
+from src.utils.instrumentacion import configurar, medir
+from src.utils.paths import get_processed_dir
+from src.workforce.erlang_calculator import estimar_fte_erlang_c_lote
+
+COLUMNAS_FORECAST = ["date", "cliente", "idioma", "y", "aht"]
+
+# Datasets que escribe el batch (Parquet particionado por cliente/idioma)
+SALIDAS = {
+    "backtest": "batch_forecast_backtest",
+    "futuro": "batch_forecast_futuro",
+    "metricas": "batch_metricas",
+    "fte": "batch_fte",
+    "intervalos": "batch_fte_intervalo",
+}
+
+# Contexto de cada worker (datos indexados, feature store y parámetros), cargado una vez por worker
+_CONTEXTO = {}
+
+
+def get_checkpoint_dir(clave_corrida):
+    return get_processed_dir() / "batch_checkpoints" / clave_corrida
+
+
+@contextmanager
+def _etapa(tiempos, nombre):
+    """Acumula en `tiempos[nombre]` los segundos del bloque (y lo registra como tramo `batch.<nombre>`)"""
+    inicio = time.perf_counter()
+    try:
+        with medir(f"batch.{nombre}") as tramo:
+            yield tramo
+    finally:
+        tiempos[nombre] = tiempos.get(nombre, 0.0) + time.perf_counter() - inicio
+
+
+def _inicializar_worker(contexto):
+    _CONTEXTO.update(contexto)
+
+
+def _forecast_serie(cliente, idioma):
+    """Backtest + forecast futuro de una serie cliente + idioma (corre en un worker)"""
+    inicio = time.perf_counter()
+    df_out, model, metricas = forecast_idioma(
+        _CONTEXTO["datos"], idioma, [cliente],
+        fecha_inicio=_CONTEXTO["fecha_inicio"], n_jobs=_CONTEXTO["n_jobs"], store=_CONTEXTO["store"]
+    )
+    segundos_forecast = time.perf_counter() - inicio
+    if df_out is None:
+        return {"cliente": cliente, "idioma": idioma, "ok": False, "segundos": {"forecast": segundos_forecast}}
+
+    # Forecast futuro desde el real del backtest (igual que la app)
+    inicio = time.perf_counter()
+    df_hist = df_out.set_index("date")
+    df_hist["y"] = df_hist["real"]
+    df_futuro = forecast_futuro(model, df_hist, n_dias=_CONTEXTO["n_dias"])
+    if df_futuro is None:
+        return {"cliente": cliente, "idioma": idioma, "ok": False, "segundos": {"forecast": segundos_forecast}}
+    df_futuro["aht"] = df_out["aht"].iloc[0]
+
+    return {
+        "cliente": cliente,
+        "idioma": idioma,
+        "ok": True,
+        "backtest": df_out,
+        "futuro": df_futuro,
+        "metricas": metricas,
+        "segundos": {"forecast": segundos_forecast, "futuro": time.perf_counter() - inicio},
+    }
+
+
+def _archivo_checkpoint(checkpoint_dir, cliente, idioma):
+    return checkpoint_dir / f"{quote(str(cliente), safe='')}__{quote(str(idioma), safe='')}.joblib"
+
+
+def _guardar_checkpoint(path, resultado):
+    """Escritura atómica, para que un corte a mitad de escritura no deje un checkpoint roto"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        joblib.dump(resultado, f)
+    os.replace(tmp_path, path)
+
+
+def _cargar_checkpoint(path):
+    try:
+        return joblib.load(path)
+    except Exception:
+        return None  # checkpoint incompleto o ilegible: la serie se vuelve a calcular
+
+
+def _calcular_ftes(df_futuro, asa_segundos, sla_pct, shrinkage_pct):
+    """FTEs de todas las filas del forecast futuro en una sola llamada vectorizada"""
+    llamadas = df_futuro["pred"].astype(float)
+    aht = df_futuro["aht"].astype(float)
+    calcular = aht.notna() & (llamadas > 0)
+
+    resultado = estimar_fte_erlang_c_lote(
+        llamadas.where(calcular).to_numpy(), aht.where(calcular).to_numpy(),
+        asa_segundos=asa_segundos, sla_pct=sla_pct, shrinkage_pct=shrinkage_pct
+    )
+    return pd.DataFrame({
+        "date": df_futuro["date"].to_numpy(),
+        "cliente": df_futuro["cliente"].to_numpy(),
+        "idioma": df_futuro["idioma"].to_numpy(),
+        "llamadas_estimadas": llamadas.round().to_numpy(),
+        "aht (seg)": aht.round(2).to_numpy(),
+        "fte_estimado": pd.array(resultado["fte_ajustado"], dtype="Int64"),
+        "fte_neto": pd.array(resultado["fte_neto"], dtype="Int64"),
+        "sla_estimado": resultado["sla_estimado"],
+        "erlangs": resultado["erlangs"],
+    })
+
+
+def ejecutar_batch(
+    etl="incremental",
+    n_workers=None,
+    modo="hilos",
+    fecha_inicio="2025-01-01",
+    n_dias=20,
+    asa_segundos=20,
+    sla_pct=0.8,
+    shrinkage_pct=0.3,
+    reanudar=True,
+    intradia=False,
+    minutos_intervalo=MINUTOS_INTERVALO,
+):
+    """
+    Corre el pipeline completo para todas las series cliente + idioma.
+
+    etl: "completo", "incremental" o "no" (usar el dataset procesado tal como está).
+    Los forecasts corren en un pool de `n_workers` (hilos o procesos); cada serie terminada
+    queda como checkpoint y con `reanudar=True` no se recalcula. Una serie que falla se informa
+    y queda en `batch_metricas` con su error, sin frenar al resto. Los resultados se escriben
+    juntos al final. Con `intradia=True` el forecast diario también se reparte en intervalos de
+    `minutos_intervalo` con los perfiles históricos y se calculan los FTEs de cada intervalo.
+    Devuelve los tiempos por etapa (segundos).
+    """
+    tiempos = {}
+    inicio_total = time.perf_counter()
+
+    # 1. ETL
+    with _etapa(tiempos, "etl"):
+        if etl == "completo":
+            procesar_llamadas()
+        elif etl == "incremental":
+            procesar_llamadas_incremental()
+        # Llamadas por intervalo (base de los perfiles intradía): siempre completo
+        if intradia and (etl != "no" or not existe_dataset("llamadas_intervalo")):
+            procesar_llamadas_intervalo(minutos=minutos_intervalo)
+
+    # 2. Datos indexados + features de todas las series en una pasada
+    with _etapa(tiempos, "features"):
+        datos = indexar_series(leer_llamadas_diarias(columnas=COLUMNAS_FORECAST))
+        store = obtener_feature_store(datos)
+        pares = sorted(datos["bloques"])
+
+    # 3. Checkpoints: una carpeta por combinación de datos + parámetros (+ hiperparámetros ajustados)
+    parametros = {"fecha_inicio": str(fecha_inicio), "n_dias": n_dias, "hiperparametros": huella_hiperparametros()}
+    clave_corrida = hashlib.sha256(
+        json.dumps({"datos": datos["huella"], **parametros}, sort_keys=True).encode()
+    ).hexdigest()[:16]
+    checkpoint_dir = get_checkpoint_dir(clave_corrida)
+    if not reanudar and checkpoint_dir.exists():
+        shutil.rmtree(checkpoint_dir)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+
+    resultados = {}
+    with _etapa(tiempos, "checkpoints"):
+        for cliente, idioma in pares:
+            path = _archivo_checkpoint(checkpoint_dir, cliente, idioma)
+            if path.exists():
+                resultado = _cargar_checkpoint(path)
+                if resultado is not None:
+                    resultados[(cliente, idioma)] = resultado
+    pendientes = [par for par in pares if par not in resultados]
+    print(f"🔎 {len(pares)} series, {len(resultados)} retomadas de checkpoints, {len(pendientes)} pendientes")
+
+    # 4. Forecast por serie en el pool
+    segundos_series = {}
+    with _etapa(tiempos, "forecast (pool)"):
+        workers, n_jobs = repartir_nucleos(n_workers, len(pendientes))
+        contexto = {
+            "datos": datos, "store": store, "n_jobs": n_jobs if workers > 1 else None,
+            "fecha_inicio": fecha_inicio, "n_dias": n_dias,
+        }
+        pool = ProcessPoolExecutor if modo == "procesos" else ThreadPoolExecutor
+        with pool(max_workers=workers, initializer=_inicializar_worker, initargs=(contexto,)) as executor:
+            futuros = {executor.submit(_forecast_serie, cliente, idioma): (cliente, idioma) for cliente, idioma in pendientes}
+            for i, futuro in enumerate(as_completed(futuros), start=1):
+                par = futuros[futuro]
+                try:
+                    resultado = futuro.result()
+                except Exception as error:
+                    # Una serie que falla no corta el batch: queda en las métricas con su error y,
+                    # sin checkpoint, se vuelve a intentar en la próxima corrida
+                    resultados[par] = {"cliente": par[0], "idioma": par[1], "ok": False, "error": f"{type(error).__name__}: {error}"}
+                    print(f"  [{i}/{len(pendientes)}] {par[0]} / {par[1]} ❌ {resultados[par]['error']}")
+                    continue
+                _guardar_checkpoint(_archivo_checkpoint(checkpoint_dir, *par), resultado)
+                resultados[par] = resultado
+                for etapa, segundos in resultado["segundos"].items():
+                    segundos_series[etapa] = segundos_series.get(etapa, 0.0) + segundos
+                print(f"  [{i}/{len(pendientes)}] {par[0]} / {par[1]} {'✅' if resultado['ok'] else '⚠️ datos insuficientes'}")
+
+    # 5. Resultados en bloque: un concat y una escritura por dataset
+    with _etapa(tiempos, "consolidación"):
+        ok = [resultados[par] for par in pares if resultados[par]["ok"]]
+        fallidas = [resultados[par] for par in pares if "error" in resultados[par]]
+        df_backtest = pd.concat(
+            [r["backtest"].assign(cliente=r["cliente"], idioma=r["idioma"]) for r in ok], ignore_index=True
+        ) if ok else pd.DataFrame()
+        df_futuro = pd.concat(
+            [r["futuro"].assign(cliente=r["cliente"], idioma=r["idioma"]) for r in ok], ignore_index=True
+        ) if ok else pd.DataFrame()
+        # Métricas de las series con forecast y, con la columna `error`, de las que fallaron
+        df_metricas = pd.DataFrame(
+            [{"cliente": r["cliente"], "idioma": r["idioma"], **r["metricas"], "error": None} for r in ok]
+            + [{"cliente": r["cliente"], "idioma": r["idioma"], "error": r["error"]} for r in fallidas]
+        )
+
+    with _etapa(tiempos, "erlang"):
+        df_fte = _calcular_ftes(df_futuro, asa_segundos, sla_pct, shrinkage_pct) if ok else pd.DataFrame()
+
+    # 6. Intradía: perfil por serie y día de la semana y Erlang C de todos los intervalos en lote
+    df_intervalos = pd.DataFrame()
+    if intradia and ok:
+        with _etapa(tiempos, "intradía"):
+            perfiles = perfiles_intradia(leer_dataset("llamadas_intervalo"), minutos=minutos_intervalo)
+            df_intervalos = fte_intervalos(
+                repartir_intradia(df_futuro, perfiles),
+                asa_segundos=asa_segundos, sla_pct=sla_pct, shrinkage_pct=shrinkage_pct, minutos=minutos_intervalo
+            )
+
+    with _etapa(tiempos, "escritura"):
+        for clave, df in [("backtest", df_backtest), ("futuro", df_futuro), ("metricas", df_metricas),
+                          ("fte", df_fte), ("intervalos", df_intervalos)]:
+            if not df.empty:
+                guardar_dataset(df, SALIDAS[clave])
+
+    # Checkpoints ya consolidados: se borran (si alguna serie falló se conservan, así la
+    # próxima corrida solo reintenta las fallidas)
+    if not fallidas:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+
+    tiempos["total"] = time.perf_counter() - inicio_total
+    _imprimir_resumen(tiempos, segundos_series, len(pares), len(ok), len(fallidas))
+    return tiempos
+
+
+def _imprimir_resumen(tiempos, segundos_series, n_series, n_ok, n_fallidas=0):
+    print(f"\n✅ Batch terminado: {n_ok}/{n_series} series con forecast")
+    if n_fallidas:
+        print(f"❌ {n_fallidas} series fallaron (detalle en la columna `error` de {SALIDAS['metricas']})")
+    print("⏱️ Tiempos por etapa")
+    for etapa, segundos in tiempos.items():
+        print(f"  {etapa:<18} {segundos:9.2f} s")
+    if segundos_series:
+        print("  Suma por serie dentro del pool:")
+        for etapa, segundos in segundos_series.items():
+            print(f"    {etapa:<16} {segundos:9.2f} s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline batch: ETL, forecast por cliente + idioma y FTEs con Erlang C")
+    parser.add_argument("--etl", choices=["completo", "incremental", "no"], default="incremental",
+                        help="Procesamiento de data/interim/datos_llamadas.csv antes del forecast")
+    parser.add_argument("--workers", type=int, default=None, help="Workers del pool (por defecto, todos los núcleos)")
+    parser.add_argument("--modo", choices=["hilos", "procesos"], default="hilos")
+    parser.add_argument("--fecha-inicio", default="2025-01-01")
+    parser.add_argument("--n-dias", type=int, default=20, help="Días hábiles de forecast futuro")
+    parser.add_argument("--asa", type=float, default=20, help="ASA objetivo en segundos")
+    parser.add_argument("--sla", type=float, default=0.8, help="SLA objetivo (0-1)")
+    parser.add_argument("--shrinkage", type=float, default=0.3, help="Shrinkage (0-1)")
+    parser.add_argument("--desde-cero", action="store_true", help="Ignorar checkpoints de una corrida anterior")
+    parser.add_argument("--intradia", action="store_true", help="Repartir el forecast en intervalos y calcular sus FTEs")
+    parser.add_argument("--minutos-intervalo", type=int, default=MINUTOS_INTERVALO, help="Duración del intervalo intradía")
+    parser.add_argument("--trazas", default=None, help="Archivo JSONL donde guardar los tramos de tiempo")
+    args = parser.parse_args(argv)
+
+    if args.trazas:
+        configurar(jsonl=args.trazas)
+
+    ejecutar_batch(
+        etl=args.etl,
+        n_workers=args.workers,
+        modo=args.modo,
+        fecha_inicio=args.fecha_inicio,
+        n_dias=args.n_dias,
+        asa_segundos=args.asa,
+        sla_pct=args.sla,
+        shrinkage_pct=args.shrinkage,
+        reanudar=not args.desde_cero,
+        intradia=args.intradia,
+        minutos_intervalo=args.minutos_intervalo,
+    )
+
+
+if __name__ == "__main__":
+    main()
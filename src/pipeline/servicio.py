@@ -0,0 +1,435 @@
+"""
+Servicio HTTP local de forecast y dimensionamiento (sin Streamlit).
+
+    python -m src.pipeline.servicio --puerto 8765 --precalentar
+
+Endpoints (JSON):
+- GET  /salud      estado y modelos cargados
+- GET  /metricas   latencias p50/p99 por endpoint y tamaño de los lotes
+- POST /forecast   {"cliente", "idioma", "n_dias"=20, "fte"=false, "asa_segundos", "sla_pct", "shrinkage_pct"}
+- POST /fte        {"llamadas": número o lista, "aht_segundos", "asa_segundos", "sla_pct", "shrinkage_pct", "intervalo_segundos"}
+
+Los modelos de `forecast_idioma` quedan en memoria (y en el registro en disco) y los pedidos
+concurrentes se juntan en lotes: un `forecast_futuro_lote` y un `estimar_fte_erlang_c_lote`
+por lote. También se puede usar en proceso con `crear_servicio` + `consultar_forecast` / `consultar_fte`.
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from src.etl.transform_calls import leer_llamadas_diarias
+from src.forecast.feature_store import obtener_feature_store
+from src.forecast.forecast_futuro import forecast_futuro_lote
+from src.forecast.forecast_module import forecast_idioma
+from src.forecast.forecast_multiidioma import repartir_nucleos
+from src.utils.indice_series import indexar_series
+from src.workforce.erlang_calculator import estimar_fte_erlang_c_lote
+
+COLUMNAS_FORECAST = ["date", "cliente", "idioma", "y", "aht"]
+PARAMS_FTE = {"aht_segundos": 300, "asa_segundos": 20, "sla_pct": 0.8, "shrinkage_pct": 0.3, "intervalo_segundos": 32400}
+
+# Cantidad de latencias que se guardan por endpoint para los percentiles
+VENTANA_LATENCIAS = 10_000
+
+
+# --- Lotes: junta pedidos concurrentes y los procesa de a muchos ---
+
+def _nuevo_lote(procesar, espera_ms, max_lote):
+    """
+    Cola con un hilo despachador: toma el primer pedido más todos los que ya estén en cola,
+    espera hasta `espera_ms` (o hasta `max_lote` pedidos) a que lleguen más y llama a
+    `procesar(pedidos) -> resultados` una vez. Con `espera_ms=0` los lotes se forman solos
+    con lo que se acumula mientras se procesa el lote anterior.
+
+    Si el lote falla, cada pedido se reintenta solo: el error le llega únicamente al pedido
+    que lo provoca y los demás reciben su resultado.
+    """
+    lote = {
+        "cola": queue.Queue(),
+        "procesar": procesar,
+        "espera": espera_ms / 1000,
+        "max": max_lote,
+        "tamanos": deque(maxlen=VENTANA_LATENCIAS),
+    }
+    lote["hilo"] = threading.Thread(target=_despachar, args=(lote,), daemon=True)
+    lote["hilo"].start()
+    return lote
+
+
+def _despachar(lote):
+    cola = lote["cola"]
+    while True:
+        primero = cola.get()
+        if primero is None:
+            return
+        pendientes = [primero]
+        limite = time.monotonic() + lote["espera"]
+        while len(pendientes) < lote["max"]:
+            restante = limite - time.monotonic()
+            try:
+                siguiente = cola.get(timeout=restante) if restante > 0 else cola.get_nowait()
+            except queue.Empty:
+                break
+            if siguiente is None:
+                cola.put(None)  # cerrar después de este lote
+                break
+            pendientes.append(siguiente)
+
+        lote["tamanos"].append(len(pendientes))
+        try:
+            resultados = lote["procesar"]([pedido for pedido, _ in pendientes])
+        except Exception as error:
+            if len(pendientes) == 1:
+                pendientes[0][1].set_exception(error)
+            else:
+                for pedido, futuro in pendientes:
+                    _procesar_solo(lote, pedido, futuro)
+        else:
+            for (_, futuro), resultado in zip(pendientes, resultados):
+                futuro.set_result(resultado)
+
+
+def _procesar_solo(lote, pedido, futuro):
+    try:
+        futuro.set_result(lote["procesar"]([pedido])[0])
+    except Exception as error:
+        futuro.set_exception(error)
+
+
+def _encolar(lote, pedido):
+    """Agrega el pedido al lote y espera su resultado"""
+    futuro = Future()
+    lote["cola"].put((pedido, futuro))
+    return futuro.result()
+
+
+# --- Modelos en memoria ---
+
+def _modelo(servicio, cliente, idioma):
+    """
+    Modelo y último real de la serie: de memoria, del registro en disco o entrenado.
+    Un candado por serie evita que dos pedidos simultáneos entrenen el mismo modelo.
+    """
+    clave = (cliente, idioma)
+    with servicio["candado"]:
+        if clave in servicio["modelos"]:
+            servicio["modelos"].move_to_end(clave)
+            return servicio["modelos"][clave]
+        candado_serie = servicio["candados_serie"].setdefault(clave, threading.Lock())
+
+    with candado_serie:
+        with servicio["candado"]:
+            if clave in servicio["modelos"]:
+                return servicio["modelos"][clave]
+
+        df_out, model, metricas = forecast_idioma(
+            servicio["datos"], idioma, [cliente], store=servicio["store"], n_jobs=servicio["n_jobs"]
+        )
+        if df_out is None:
+            raise KeyError(f"Sin datos suficientes para {cliente} / {idioma}")
+
+        df_hist = df_out.set_index("date")
+        df_hist["y"] = df_hist["real"]
+        entrada = {
+            "modelo": model,
+            "hist": df_hist,
+            "aht": float(df_out["aht"].iloc[0]),
+            "metricas": metricas,
+            "futuro": None,
+        }
+        with servicio["candado"]:
+            servicio["modelos"][clave] = entrada
+            while len(servicio["modelos"]) > servicio["max_modelos"]:
+                servicio["modelos"].popitem(last=False)
+        return entrada
+
+
+def _procesar_forecasts(servicio, pedidos):
+    """
+    Lote de forecasts: cada serie se proyecta una vez con el mayor `n_dias` pedido
+    (la predicción es recursiva, los primeros días no dependen del horizonte) y todas
+    las series del lote avanzan juntas en `forecast_futuro_lote`.
+    """
+    horizontes = {}
+    for pedido in pedidos:
+        clave = (pedido["cliente"], pedido["idioma"])
+        horizontes[clave] = max(horizontes.get(clave, 0), pedido["n_dias"])
+
+    entradas = {clave: _modelo(servicio, *clave) for clave in horizontes}
+    faltan = {
+        clave for clave, n_dias in horizontes.items()
+        if entradas[clave]["futuro"] is None or len(entradas[clave]["futuro"]) < n_dias
+    }
+    for n_dias in set(horizontes[clave] for clave in faltan):
+        claves = [clave for clave in faltan if horizontes[clave] == n_dias]
+        futuros = forecast_futuro_lote(
+            {clave: entradas[clave]["modelo"] for clave in claves},
+            {clave: entradas[clave]["hist"] for clave in claves},
+            n_dias=n_dias,
+        )
+        for (cliente, idioma), df_futuro in futuros.items():
+            df_futuro[["cliente", "idioma", "aht"]] = cliente, idioma, entradas[(cliente, idioma)]["aht"]
+            entradas[(cliente, idioma)]["futuro"] = df_futuro
+
+    return [entradas[(p["cliente"], p["idioma"])]["futuro"].head(p["n_dias"]) for p in pedidos]
+
+
+def _procesar_ftes(pedidos):
+    """
+    Lote de FTEs: todas las filas de todos los pedidos en un solo `estimar_fte_erlang_c_lote`
+    (cada pedido llega con sus parámetros ya expandidos al largo de `llamadas`, ver `_pedido_fte`)
+    """
+    largos = [len(p["llamadas"]) for p in pedidos]
+    columnas = {param: np.concatenate([p[param] for p in pedidos]) for param in ["llamadas"] + list(PARAMS_FTE)}
+    resultado = estimar_fte_erlang_c_lote(**columnas)
+
+    cortes = np.cumsum(largos)[:-1]
+    partes = {clave: np.split(valores, cortes) for clave, valores in resultado.items()}
+    return [{clave: partes[clave][i] for clave in resultado} for i in range(len(pedidos))]
+
+
+# --- Servicio ---
+
+def crear_servicio(datos=None, n_jobs=None, max_modelos=256, espera_ms=0, max_lote=256):
+    """
+    Estado del servicio: datos indexados + feature store, modelos en memoria, lotes y latencias.
+    `datos` es un DataFrame o un contenedor de `indexar_series`; por defecto el dataset procesado.
+    """
+    if datos is None:
+        datos = leer_llamadas_diarias(columnas=COLUMNAS_FORECAST)
+    if isinstance(datos, pd.DataFrame):
+        datos = indexar_series(datos[COLUMNAS_FORECAST])
+
+    servicio = {
+        "datos": datos,
+        "store": obtener_feature_store(datos),
+        "n_jobs": n_jobs,
+        "modelos": OrderedDict(),
+        "max_modelos": max_modelos,
+        "candado": threading.Lock(),
+        "candados_serie": {},
+        "latencias": {},
+        "inicio": time.time(),
+    }
+    servicio["lote_forecast"] = _nuevo_lote(lambda pedidos: _procesar_forecasts(servicio, pedidos), espera_ms, max_lote)
+    servicio["lote_fte"] = _nuevo_lote(_procesar_ftes, espera_ms, max_lote)
+    return servicio
+
+
+def cerrar_servicio(servicio):
+    for lote in (servicio["lote_forecast"], servicio["lote_fte"]):
+        lote["cola"].put(None)
+        lote["hilo"].join()
+
+
+def precalentar(servicio, n_workers=None):
+    """Carga (o entrena) en paralelo los modelos de todas las series antes de recibir pedidos"""
+    pares = sorted(servicio["datos"]["bloques"])
+    workers, n_jobs = repartir_nucleos(n_workers, len(pares))
+    servicio["n_jobs"] = servicio["n_jobs"] or n_jobs
+
+    def _cargar(par):
+        try:
+            _modelo(servicio, *par)
+        except KeyError:
+            pass  # serie sin datos suficientes: se informa cuando se pida
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(_cargar, pares))
+    return len(servicio["modelos"])
+
+
+def _registrar_latencia(servicio, endpoint, segundos):
+    with servicio["candado"]:
+        servicio["latencias"].setdefault(endpoint, deque(maxlen=VENTANA_LATENCIAS)).append(segundos)
+
+
+def metricas(servicio):
+    """Latencias p50/p99 (ms) por endpoint y tamaño medio de los lotes"""
+    with servicio["candado"]:
+        latencias = {endpoint: np.array(valores) for endpoint, valores in servicio["latencias"].items()}
+    resumen = {
+        endpoint: {
+            "n": int(len(valores)),
+            "p50_ms": round(float(np.percentile(valores, 50)) * 1000, 3),
+            "p99_ms": round(float(np.percentile(valores, 99)) * 1000, 3),
+        }
+        for endpoint, valores in latencias.items() if len(valores)
+    }
+    lotes = {
+        nombre: {"lotes": len(servicio[clave]["tamanos"]), "pedidos_por_lote": round(float(np.mean(servicio[clave]["tamanos"])), 2)}
+        for nombre, clave in [("forecast", "lote_forecast"), ("fte", "lote_fte")] if servicio[clave]["tamanos"]
+    }
+    return {"latencias": resumen, "lotes": lotes, "modelos_en_memoria": len(servicio["modelos"])}
+
+
+def _parametros_fte(pedido):
+    desconocidos = set(pedido) - set(PARAMS_FTE)
+    if desconocidos:
+        raise ValueError(f"Parámetros desconocidos: {sorted(desconocidos)}")
+    params = {param: pedido.get(param, defecto) for param, defecto in PARAMS_FTE.items()}
+    if not 0 < float(params["sla_pct"]) <= 1:
+        raise ValueError(f"sla_pct debe estar entre 0 y 1 (recibido {params['sla_pct']})")
+    return params
+
+
+def _pedido_fte(llamadas, params):
+    """
+    Pedido de FTE listo para el lote: `llamadas` y cada parámetro como arrays de floats del
+    mismo largo. Se valida acá, en el hilo del pedido, para que un pedido mal formado no
+    haga fallar al resto de su lote.
+    """
+    llamadas = np.atleast_1d(np.asarray(llamadas, dtype=float))
+    if llamadas.ndim != 1:
+        raise ValueError(f"llamadas debe ser un número o una lista (recibido {llamadas.ndim} dimensiones)")
+    pedido = {"llamadas": llamadas}
+    for param, valor in _parametros_fte(params).items():
+        valor = np.asarray(valor, dtype=float)
+        if valor.ndim > 1 or valor.size not in (1, len(llamadas)):
+            raise ValueError(f"{param} debe ser un número o una lista de {len(llamadas)} valores (recibido {valor.size})")
+        pedido[param] = np.broadcast_to(valor.ravel(), llamadas.shape)
+    return pedido
+
+
+def consultar_fte(servicio, llamadas, **params):
+    """FTEs con Erlang C de una o varias cantidades de llamadas (mismos parámetros que `estimar_fte_erlang_c`)"""
+    inicio = time.perf_counter()
+    resultado = _encolar(servicio["lote_fte"], _pedido_fte(llamadas, params))
+    _registrar_latencia(servicio, "fte", time.perf_counter() - inicio)
+    return resultado
+
+
+def consultar_forecast(servicio, cliente, idioma, n_dias=20, fte=False, **params_fte):
+    """
+    Forecast futuro de una serie cliente + idioma (DataFrame como `forecast_futuro`).
+    Con `fte=True` agrega los FTEs de cada día usando el AHT histórico de la serie.
+    """
+    inicio = time.perf_counter()
+    n_dias = int(n_dias)
+    if n_dias < 1:
+        raise ValueError("n_dias debe ser mayor que 0")
+    # El modelo se carga (o entrena) acá, fuera del despachador, para no frenar al resto del lote
+    _modelo(servicio, cliente, idioma)
+    df_futuro = _encolar(servicio["lote_forecast"], {"cliente": cliente, "idioma": idioma, "n_dias": n_dias})
+
+    if fte:
+        params = {**params_fte, "aht_segundos": params_fte.get("aht_segundos", df_futuro["aht"].iloc[0])}
+        resultado = _encolar(servicio["lote_fte"], _pedido_fte(df_futuro["pred"].to_numpy(dtype=float), params))
+        df_futuro = pd.concat([df_futuro, pd.DataFrame(resultado, index=df_futuro.index)], axis=1)
+    else:
+        df_futuro = df_futuro.copy()
+
+    _registrar_latencia(servicio, "forecast", time.perf_counter() - inicio)
+    return df_futuro
+
+
+# --- HTTP ---
+
+def _lista(valores):
+    """Columna o array a lista de JSON (NaN como null, fechas ISO)"""
+    valores = np.asarray(valores)
+    if np.issubdtype(valores.dtype, np.datetime64):
+        return np.datetime_as_string(valores, unit="D").tolist()
+    lista = valores.tolist()
+    if np.issubdtype(valores.dtype, np.floating) and np.isnan(valores).any():
+        return [None if v != v else v for v in lista]
+    return lista
+
+
+def _a_json(valor):
+    """DataFrames (filas), dicts y arrays a tipos de JSON, columna por columna"""
+    if isinstance(valor, pd.DataFrame):
+        columnas = {col: _lista(valor[col]) for col in valor.columns}
+        return [dict(zip(columnas, fila)) for fila in zip(*columnas.values())]
+    if isinstance(valor, dict):
+        return {clave: _a_json(v) for clave, v in valor.items()}
+    if isinstance(valor, np.ndarray):
+        return _lista(valor)
+    return valor
+
+
+def _crear_handler(servicio):
+    class Handler(BaseHTTPRequestHandler):
+        def _responder(self, codigo, cuerpo):
+            datos = json.dumps(_a_json(cuerpo)).encode()
+            self.send_response(codigo)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def do_GET(self):
+            if self.path == "/salud":
+                self._responder(200, {"ok": True, "modelos": len(servicio["modelos"]), "uptime_s": round(time.time() - servicio["inicio"], 1)})
+            elif self.path == "/metricas":
+                self._responder(200, metricas(servicio))
+            else:
+                self._responder(404, {"error": f"Ruta desconocida: {self.path}"})
+
+        def do_POST(self):
+            try:
+                largo = int(self.headers.get("Content-Length", 0))
+                pedido = json.loads(self.rfile.read(largo) or b"{}")
+                if self.path == "/forecast":
+                    cuerpo = consultar_forecast(servicio, **pedido)
+                elif self.path == "/fte":
+                    cuerpo = consultar_fte(servicio, **pedido)
+                else:
+                    self._responder(404, {"error": f"Ruta desconocida: {self.path}"})
+                    return
+            except (KeyError, ValueError, TypeError) as error:
+                self._responder(400, {"error": str(error)})
+                return
+            except Exception as error:
+                # Cualquier otro error: 500 con el motivo en lugar de cortar la conexión
+                self._responder(500, {"error": f"{type(error).__name__}: {error}"})
+                return
+            self._responder(200, cuerpo)
+
+        def log_message(self, *args):
+            pass  # sin log por pedido: las latencias quedan en /metricas
+
+    return Handler
+
+
+def iniciar_servidor(servicio, host="127.0.0.1", puerto=8765):
+    """Levanta el servidor HTTP en un hilo; devuelve el servidor (`server_address` tiene el puerto real si `puerto=0`)"""
+    servidor = ThreadingHTTPServer((host, puerto), _crear_handler(servicio), bind_and_activate=False)
+    servidor.daemon_threads = True
+    servidor.request_queue_size = 128  # el valor por defecto (5) corta conexiones con muchos clientes a la vez
+    servidor.server_bind()
+    servidor.server_activate()
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP local de forecast y FTEs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--precalentar", action="store_true", help="Cargar los modelos de todas las series al iniciar")
+    parser.add_argument("--espera-ms", type=float, default=0, help="Espera extra para juntar pedidos en un lote")
+    args = parser.parse_args(argv)
+
+    servicio = crear_servicio(espera_ms=args.espera_ms)
+    if args.precalentar:
+        print(f"🔥 {precalentar(servicio)} modelos en memoria")
+    servidor = iniciar_servidor(servicio, args.host, args.puerto)
+    print(f"🚀 Servicio en http://{args.host}:{servidor.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
+        cerrar_servicio(servicio)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# src/utils/almacenamiento.py
+import shutil
+from urllib.parse import unquote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from src.utils.paths import get_processed_dir
+
+PARTICIONES_DEFECTO = ("cliente", "idioma")
+
+# Archivos mensuales dentro de cada partición (`archivos_por_mes`): mes-AAAA-MM-0.parquet
+PREFIJO_MES = "mes-"
+
+
+def get_dataset_dir(nombre):
+    return get_processed_dir() / nombre
+
+
+def existe_dataset(nombre):
+    return get_dataset_dir(nombre).is_dir()
+
+
+def _tipar(df, particiones):
+    """Columnas de texto como categóricas y enteros en el tipo más chico, para un Parquet compacto"""
+    df = df.copy()
+    for col in df.columns:
+        if col in particiones or df[col].dtype == object or pd.api.types.is_string_dtype(df[col]):
+            df[col] = df[col].astype("category")
+        elif pd.api.types.is_integer_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+
+def _escribir(tabla, path, particiones, comportamiento, plantilla):
+    ds.write_dataset(
+        tabla,
+        path,
+        format="parquet",
+        partitioning=particiones or None,
+        partitioning_flavor="hive" if particiones else None,
+        existing_data_behavior=comportamiento,
+        basename_template=plantilla,
+    )
+
+
+def _escribir_por_mes(df, path, particiones, columna, esquema=None):
+    """
+    Un archivo por partición y mes de `columna`; pisa solo los archivos de esos meses.
+    Con `esquema` (el del dataset existente) las columnas se llevan a sus tipos.
+    """
+    tabla = pa.Table.from_pandas(_tipar(df, particiones), preserve_index=False)
+    if esquema is not None:
+        for i, campo in enumerate(tabla.schema):
+            if campo.name not in particiones and campo.name in esquema.names and esquema.field(campo.name).type != campo.type:
+                tabla = tabla.set_column(i, campo.name, tabla.column(i).cast(esquema.field(campo.name).type))
+    meses = df[columna].dt.strftime("%Y-%m").to_numpy()
+    for mes in pd.unique(meses):
+        _escribir(tabla.filter(pa.array(meses == mes)), path, particiones, "overwrite_or_ignore", f"{PREFIJO_MES}{mes}-{{i}}.parquet")
+
+
+def guardar_dataset(df, nombre, particiones=PARTICIONES_DEFECTO, solo_particiones_nuevas=False, archivos_por_mes=None):
+    """
+    Guarda `df` como dataset Parquet particionado por `particiones` (carpetas cliente=.../idioma=...).
+
+    Por defecto reemplaza el dataset completo; con `solo_particiones_nuevas=True` reemplaza
+    únicamente las particiones presentes en `df` y deja intactas las demás.
+    Con `archivos_por_mes` (columna de fechas) cada partición se guarda en un archivo por mes,
+    así `actualizar_dataset` puede reescribir solo los meses que cambian.
+    """
+    path = get_dataset_dir(nombre)
+    particiones = [p for p in particiones if p in df.columns]
+
+    if path.exists() and not solo_particiones_nuevas:
+        shutil.rmtree(path)
+
+    if archivos_por_mes:
+        if solo_particiones_nuevas:
+            for archivo in _archivos(nombre, df[particiones].drop_duplicates(), particiones):
+                archivo.unlink()
+        _escribir_por_mes(df, path, particiones, archivos_por_mes)
+        return path
+
+    tabla = pa.Table.from_pandas(_tipar(df, particiones), preserve_index=False)
+    _escribir(tabla, path, particiones, "delete_matching", "parte-{i}.parquet")
+    return path
+
+
+def _archivos(nombre, claves, particiones):
+    """Archivos Parquet del dataset de las particiones en `claves` (DataFrame con una fila por partición)"""
+    path = get_dataset_dir(nombre)
+    buscadas = set(claves[particiones].astype(str).itertuples(index=False, name=None))
+    archivos = []
+    for archivo in path.rglob("*.parquet"):
+        valores = dict(unquote(parte).split("=", 1) for parte in archivo.relative_to(path).parts[:-1])
+        if tuple(valores.get(p) for p in particiones) in buscadas:
+            archivos.append(archivo)
+    return archivos
+
+
+def actualizar_dataset(df, nombre, columna="date", particiones=PARTICIONES_DEFECTO):
+    """
+    Agrega o reemplaza (por particiones + `columna`) las filas de `df` en un dataset guardado
+    con `archivos_por_mes=columna`, reescribiendo solo los archivos de los meses que tocan:
+    el costo depende de las filas nuevas y no de la historia guardada. Las particiones con
+    archivos de otro formato (p. ej. de un `guardar_dataset` sin `archivos_por_mes`) se
+    reescriben completas una vez, ya por mes.
+    """
+    path = get_dataset_dir(nombre)
+    particiones = [p for p in particiones if p in df.columns]
+    df = df.copy()
+    for col in particiones:
+        df[col] = df[col].astype(str)
+
+    meses = set(df[columna].dt.strftime("%Y-%m"))
+    claves = df[particiones].drop_duplicates()
+    existentes = _archivos(nombre, claves, particiones) if path.exists() else []
+    # Particiones viejas (un solo archivo con toda la historia): se leen completas
+    viejas = {archivo.parent for archivo in existentes if not archivo.name.startswith(PREFIJO_MES)}
+    leer = [
+        archivo for archivo in existentes
+        if archivo.parent in viejas or archivo.name[len(PREFIJO_MES):len(PREFIJO_MES) + 7] in meses
+    ]
+
+    # Tipos del dataset guardado, para que todos los archivos compartan esquema
+    esquema = ds.dataset(path, format="parquet", partitioning="hive").schema if path.exists() else None
+    if leer:
+        previo = ds.dataset(
+            [str(a) for a in leer], format="parquet", partition_base_dir=str(path),
+            partitioning=ds.HivePartitioning.discover(infer_dictionary=True),
+        ).to_table().to_pandas()
+        for col in particiones:
+            previo[col] = previo[col].astype(str)
+        df = pd.concat([previo[df.columns], df], ignore_index=True).drop_duplicates(
+            subset=particiones + [columna], keep="last"
+        )
+        for archivo in leer:
+            if archivo.parent in viejas:
+                archivo.unlink()
+
+    df = df.sort_values(particiones + [columna], ignore_index=True)
+    _escribir_por_mes(df, path, particiones, columna, esquema)
+    return path
+
+
+def _filtro(filtros):
+    """dict columna -> valor o lista de valores, como expresión de pyarrow"""
+    expresion = None
+    for col, valores in (filtros or {}).items():
+        valores = [valores] if isinstance(valores, str) or not hasattr(valores, "__iter__") else list(valores)
+        condicion = ds.field(col).isin(valores)
+        expresion = condicion if expresion is None else expresion & condicion
+    return expresion
+
+
+def leer_dataset(nombre, columnas=None, filtros=None):
+    """
+    Lee un dataset guardado con `guardar_dataset`.
+
+    `columnas` limita las columnas leídas y `filtros` (p. ej. {"idioma": ["EN", "ES"]})
+    descarta particiones completas sin abrir sus archivos.
+    """
+    dataset = ds.dataset(
+        get_dataset_dir(nombre),
+        format="parquet",
+        partitioning=ds.HivePartitioning.discover(infer_dictionary=True),  # particiones como categóricas
+    )
+    tabla = dataset.to_table(columns=columnas, filter=_filtro(filtros))
+    return tabla.to_pandas()
+
+
+def listar_particiones(nombre):
+    """Combinaciones de particiones existentes (p. ej. cliente/idioma) leyendo solo las carpetas"""
+    path = get_dataset_dir(nombre)
+    filas = []
+    for archivo in path.rglob("*.parquet"):
+        partes = archivo.relative_to(path).parts[:-1]
+        filas.append(dict(unquote(parte).split("=", 1) for parte in partes))
+    return pd.DataFrame(filas).drop_duplicates().reset_index(drop=True)
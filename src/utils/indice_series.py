@@ -0,0 +1,112 @@
+# src/utils/indice_series.py
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+CLAVES = ("cliente", "idioma")
+
+
+def _reducir(valores):
+    """Tipo numérico más chico sin perder información (float32 solo si la conversión es exacta)"""
+    if pd.api.types.is_bool_dtype(valores) or not pd.api.types.is_numeric_dtype(valores):
+        return valores
+    if pd.api.types.is_integer_dtype(valores):
+        return pd.to_numeric(pd.Series(valores), downcast="integer").to_numpy()
+    reducido = valores.astype(np.float32)
+    return reducido if np.array_equal(reducido.astype(valores.dtype), valores, equal_nan=True) else valores
+
+
+def indexar_series(df, claves=CLAVES):
+    """
+    Contenedor del histórico diario indexado por serie (cliente, idioma).
+
+    Las filas quedan ordenadas por serie y fecha en arrays contiguos, las claves como
+    códigos de categóricas y los números en el tipo más chico posible. Devuelve un dict con:
+    - "categorias": categorías de cada clave
+    - "codigos": códigos de cada clave por fila
+    - "columnas": arrays del resto de las columnas
+    - "bloques": (cliente, idioma) -> slice de filas de la serie
+    - "huella": hash de los datos, para los caches que dependen de ellos
+    """
+    claves = list(claves)
+    categoricas = {col: pd.Categorical(df[col].astype(str)) for col in claves}
+    codigos = [categoricas[col].codes for col in claves]
+
+    # Orden por serie y fecha: cada serie queda en un bloque contiguo
+    orden = np.lexsort([df["date"].to_numpy()] + codigos[::-1])
+    codigos = {col: c[orden] for col, c in zip(claves, codigos)}
+    columnas = {
+        col: _reducir(df[col].to_numpy()[orden])
+        for col in df.columns if col not in claves
+    }
+
+    # Límites de bloque: filas donde cambia alguna clave
+    n = len(orden)
+    cambia = np.zeros(max(n - 1, 0), dtype=bool)
+    for c in codigos.values():
+        cambia |= c[1:] != c[:-1]
+    inicios = np.r_[0, np.flatnonzero(cambia) + 1] if n else np.array([], dtype=int)
+    fines = np.r_[inicios[1:], n] if n else np.array([], dtype=int)
+
+    categorias = {col: categoricas[col].categories for col in claves}
+    bloques = {
+        tuple(categorias[col][codigos[col][ini]] for col in claves): slice(ini, fin)
+        for ini, fin in zip(inicios.tolist(), fines.tolist())
+    }
+
+    huella = hashlib.sha256()
+    for col, valores in {**codigos, **columnas}.items():
+        huella.update(col.encode())
+        huella.update(np.ascontiguousarray(valores).view(np.uint8) if valores.dtype != object else str(valores.tolist()).encode())
+    for col in claves:
+        huella.update(str(list(categorias[col])).encode())
+
+    return {
+        "claves": claves,
+        "categorias": categorias,
+        "codigos": codigos,
+        "columnas": columnas,
+        "bloques": bloques,
+        "huella": huella.hexdigest(),
+    }
+
+
+def es_indice(datos):
+    return isinstance(datos, dict) and "bloques" in datos
+
+
+def serie(indice, cliente, idioma, columnas=None):
+    """Arrays de una serie como vistas sobre el contenedor (sin copiar), ordenados por fecha"""
+    filas = indice["bloques"].get((cliente, idioma), slice(0, 0))
+    columnas = columnas or list(indice["columnas"])
+    return {col: indice["columnas"][col][filas] for col in columnas}
+
+
+def series_de(indice, idiomas, clientes):
+    """Series (cliente, idioma) del contenedor para los idiomas y clientes pedidos"""
+    idiomas = {idiomas} if isinstance(idiomas, str) else set(idiomas)
+    clientes = {clientes} if isinstance(clientes, str) else set(clientes)
+    return [par for par in indice["bloques"] if par[0] in clientes and par[1] in idiomas]
+
+
+def a_dataframe(indice, pares=None):
+    """DataFrame (copia) de todas las series o de las de `pares`, con las claves como categóricas"""
+    filas = np.arange(len(next(iter(indice["codigos"].values()))))
+    if pares is not None:
+        filas = np.concatenate([filas[indice["bloques"][par]] for par in pares]) if pares else filas[:0]
+
+    datos = {
+        col: pd.Categorical.from_codes(indice["codigos"][col][filas], categories=indice["categorias"][col])
+        for col in indice["claves"]
+    }
+    datos.update({col: valores[filas] for col, valores in indice["columnas"].items()})
+    return pd.DataFrame(datos)
+
+
+def memoria_mb(datos):
+    """Memoria ocupada por un DataFrame o por un contenedor de `indexar_series`"""
+    if not es_indice(datos):
+        return datos.memory_usage(deep=True).sum() / 1024 ** 2
+    arrays = [*datos["codigos"].values(), *datos["columnas"].values()]
+    return sum(a.nbytes for a in arrays) / 1024 ** 2
@@ -0,0 +1,202 @@
+# src/utils/instrumentacion.py
+"""
+Tramos de tiempo livianos para saber dónde se va el tiempo (ETL, entrenamiento,
+predicción, Erlang, gráficos).
+
+    with medir("forecast.entrenamiento", filas=len(X_train)) as tramo:
+        ...
+        tramo["registro"] = True
+
+    @medido("procesar_llamadas", contar=lambda df, *a, **k: {"filas": len(df)})
+    def procesar_llamadas(...): ...
+
+Cada tramo queda en memoria (últimos `MAX_TRAMOS`) con su duración, el tramo padre y los
+contadores (filas, series, iteraciones...). Con `configurar(jsonl=...)` o la variable de
+entorno `INLINE_TRAZAS` también se escriben como líneas JSON para analizarlos después.
+
+Los tramos son del proceso entero. Para separar los de cada usuario de la app (o de cada
+pedido), `etiquetar(sesion=..., ejecucion=...)` agrega esos datos a los tramos que se abren
+en el hilo y `tramos(ejecucion=...)` filtra por ellos.
+"""
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+MAX_TRAMOS = 20_000
+CONTADORES = ["filas", "series", "iteraciones"]
+
+_TRAMOS = deque(maxlen=MAX_TRAMOS)
+_PENDIENTES_JSONL = []
+_CANDADO = threading.Lock()
+_IDS = itertools.count(1)
+_PILA = threading.local()
+_CONFIG = {"activo": True, "jsonl": os.environ.get("INLINE_TRAZAS") or None}
+
+
+def configurar(activo=None, jsonl=False):
+    """Activa/desactiva la medición y fija (o quita, con `None`) el archivo JSONL de salida"""
+    if activo is not None:
+        _CONFIG["activo"] = activo
+    if jsonl is not False:
+        _CONFIG["jsonl"] = str(jsonl) if jsonl else None
+        if jsonl:
+            os.makedirs(os.path.dirname(os.path.abspath(jsonl)), exist_ok=True)
+    return dict(_CONFIG)
+
+
+def _volcar_jsonl():
+    """Escribe los tramos pendientes (se llama al cerrar un tramo raíz)"""
+    with _CANDADO:
+        pendientes = _PENDIENTES_JSONL[:]
+        _PENDIENTES_JSONL.clear()
+    if pendientes and _CONFIG["jsonl"]:
+        with open(_CONFIG["jsonl"], "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(tramo, default=str) + "\n" for tramo in pendientes)
+
+
+@contextmanager
+def etiquetar(**etiquetas):
+    """Agrega `etiquetas` a todos los tramos que se abran en este hilo dentro del bloque"""
+    previas = getattr(_PILA, "etiquetas", {})
+    _PILA.etiquetas = {**previas, **etiquetas}
+    try:
+        yield
+    finally:
+        _PILA.etiquetas = previas
+
+
+def con_etiquetas(funcion):
+    """`funcion` con las etiquetas de este hilo, para que las conserve al correr en otro (pools)"""
+    etiquetas = dict(getattr(_PILA, "etiquetas", {}))
+    if not etiquetas:
+        return funcion
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        with etiquetar(**etiquetas):
+            return funcion(*args, **kwargs)
+    return envoltura
+
+
+@contextmanager
+def medir(nombre, **datos):
+    """
+    Mide el bloque como un tramo `nombre`. Devuelve un dict donde el bloque puede anotar
+    contadores (`tramo["filas"] = ...`); los tramos anidados en el mismo hilo quedan con su padre.
+    """
+    if not _CONFIG["activo"]:
+        yield dict(datos)
+        return
+
+    pila = getattr(_PILA, "tramos", None)
+    if pila is None:
+        pila = _PILA.tramos = []
+    tramo = {
+        "id": next(_IDS),
+        "padre": pila[-1]["id"] if pila else None,
+        "nombre": nombre,
+        "inicio": time.time(),
+        "hilo": threading.current_thread().name,
+        "pid": os.getpid(),
+        **getattr(_PILA, "etiquetas", {}),
+        **datos,
+    }
+    pila.append(tramo)
+    inicio = time.perf_counter()
+    try:
+        yield tramo
+    except BaseException as error:
+        tramo["error"] = type(error).__name__
+        raise
+    finally:
+        tramo["segundos"] = time.perf_counter() - inicio
+        pila.pop()
+        with _CANDADO:
+            _TRAMOS.append(tramo)
+            if _CONFIG["jsonl"]:
+                _PENDIENTES_JSONL.append(tramo)
+        if not pila and _CONFIG["jsonl"]:
+            _volcar_jsonl()
+
+
+def medido(nombre=None, contar=None):
+    """
+    Decorador: mide cada llamada como un tramo (por defecto con el nombre de la función).
+    `contar(resultado, *args, **kwargs)` puede devolver contadores para el tramo.
+    """
+    def decorador(funcion):
+        nombre_tramo = nombre or funcion.__name__
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with medir(nombre_tramo) as tramo:
+                resultado = funcion(*args, **kwargs)
+                if contar is not None:
+                    tramo.update(contar(resultado, *args, **kwargs) or {})
+                return resultado
+        return envoltura
+    return decorador
+
+
+def marca():
+    """Id a partir del cual empiezan los próximos tramos (para filtrar con `tramos(desde=...)`)"""
+    with _CANDADO:
+        return _TRAMOS[-1]["id"] + 1 if _TRAMOS else 1
+
+
+def tramos(desde=None, **etiquetas):
+    """
+    Tramos terminados (los más recientes en memoria), opcionalmente desde una `marca()` y
+    solo los que tienen las `etiquetas` dadas (p. ej. `tramos(ejecucion=...)`)
+    """
+    with _CANDADO:
+        lista = list(_TRAMOS)
+    if desde is not None:
+        lista = [tramo for tramo in lista if tramo["id"] >= desde]
+    if etiquetas:
+        lista = [tramo for tramo in lista if all(tramo.get(k) == v for k, v in etiquetas.items())]
+    return lista
+
+
+def limpiar():
+    with _CANDADO:
+        _TRAMOS.clear()
+        _PENDIENTES_JSONL.clear()
+
+
+def resumen(lista=None):
+    """
+    Tiempos por nombre de tramo: llamadas, total, media y máximo, y la suma de cada contador.
+    Ordenado por tiempo total descendente.
+    """
+    lista = tramos() if lista is None else lista
+    columnas = ["nombre", "llamadas", "total_s", "media_ms", "max_ms"] + CONTADORES
+    if not lista:
+        return pd.DataFrame(columns=columnas)
+
+    df = pd.DataFrame(lista)
+    for col in CONTADORES:
+        if col not in df.columns:
+            df[col] = pd.NA
+    agrupado = df.groupby("nombre").agg(
+        llamadas=("segundos", "size"),
+        total_s=("segundos", "sum"),
+        media_ms=("segundos", "mean"),
+        max_ms=("segundos", "max"),
+        **{col: (col, lambda s: s.sum(min_count=1)) for col in CONTADORES},
+    )
+    agrupado[["media_ms", "max_ms"]] *= 1000
+    return agrupado.sort_values("total_s", ascending=False).reset_index()[columnas].round(3)
+
+
+def leer_jsonl(path):
+    """Tramos de un archivo JSONL (para análisis offline, p. ej. `resumen(leer_jsonl(path))`)"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
@@ -1,47 +1,222 @@
 import math
+import sys
+
+import numpy as np
+import pandas as pd
+
+from src.utils.instrumentacion import medido, medir
+
+# Tolerancia relativa para cortar la suma de Erlang B (por debajo del epsilon de un float)
+_EPS_SUMA = 1e-17
+
+# Ancho de la ventana de términos de Erlang B en unidades de sqrt(erlangs): exp(-9**2 / 2) < _EPS_SUMA
+_ANCHO_VENTANA = 9
+
+# Máximo de celdas (filas x términos) por bloque al evaluar Erlang B vectorizado
+_MAX_CELDAS_BLOQUE = 4_000_000
+
+
+def log_erlang_b(erlangs, agentes):
+    """
+    Logaritmo de la probabilidad de bloqueo Erlang B, calculado en espacio logarítmico.
+
+    Usa 1/B = sum_j agentes! / ((agentes - j)! * erlangs^j) sumando solo los términos
+    que aportan precisión alrededor del término máximo (~sqrt(erlangs) términos),
+    sin factoriales ni potencias grandes, por lo que no desborda con miles de agentes.
+    """
+    if agentes <= 0:
+        return 0.0  # B(0) = 1
+
+    n = int(agentes)
+    log_a = math.log(erlangs)
+
+    # Término máximo: el cociente t_j / t_{j-1} = (n - j + 1) / erlangs deja de ser >= 1
+    j_max = min(n, max(0, math.floor(n + 1 - erlangs)))
+    log_t_max = math.lgamma(n + 1) - math.lgamma(n - j_max + 1) - j_max * log_a
+
+    # Suma relativa al término máximo, hacia ambos lados hasta que no aporte
+    suma = 1.0
+    t = 1.0
+    for j in range(j_max + 1, n + 1):
+        t *= (n - j + 1) / erlangs
+        suma += t
+        if t < _EPS_SUMA * suma:
+            break
+    t = 1.0
+    for j in range(j_max - 1, -1, -1):
+        t *= erlangs / (n - j)
+        suma += t
+        if t < _EPS_SUMA * suma:
+            break
+
+    return -(log_t_max + math.log(suma))
+
+
+def erlang_b(erlangs, agentes):
+    """Probabilidad de bloqueo Erlang B"""
+    return math.exp(log_erlang_b(erlangs, agentes))
+
+
+def siguiente_erlang_b(erlangs, agentes, prob_bloqueo):
+    """Recurrencia de Erlang B: a partir de B(agentes) devuelve B(agentes + 1) en O(1)"""
+    return erlangs * prob_bloqueo / (agentes + 1 + erlangs * prob_bloqueo)
+
+
+def erlang_c_desde_b(erlangs, agentes, prob_bloqueo):
+    """Convierte la probabilidad Erlang B en probabilidad de espera Erlang C"""
+    if agentes <= erlangs:
+        return 1.0  # Saturado
+    return agentes * prob_bloqueo / (agentes - erlangs * (1 - prob_bloqueo))
+
 
 def erlang_c_formula(erlangs, agentes):
     """Calcula la probabilidad de espera con Erlang C"""
     if agentes <= erlangs:
         return 1.0  # Saturado
 
-    try:
-        numerador = (erlangs ** agentes / math.factorial(agentes)) * (agentes / (agentes - erlangs))
-        suma = sum((erlangs ** k) / math.factorial(k) for k in range(agentes))
-        denominador = suma + numerador
-        return numerador / denominador
-    except (OverflowError, ZeroDivisionError):
-        return 1.0  # si falla, asumir saturación total
+    return erlang_c_desde_b(erlangs, agentes, erlang_b(erlangs, agentes))
+
+
+def sla_erlang_c(erlangs, agentes, prob_espera, asa_segundos, aht_segundos):
+    """% de llamadas atendidas dentro del ASA para una probabilidad de espera dada"""
+    return 1 - (prob_espera * math.exp(-(agentes - erlangs) * (asa_segundos / aht_segundos)))
+
+
+def _sla_con_agentes(erlangs, agentes, asa_segundos, aht_segundos):
+    """SLA alcanzado con una cantidad dada de agentes (Erlang B en espacio logarítmico)"""
+    return sla_erlang_c(erlangs, agentes, erlang_c_formula(erlangs, agentes), asa_segundos, aht_segundos)
+
+
+def anterior_erlang_b(erlangs, agentes, prob_bloqueo):
+    """Recurrencia inversa de Erlang B: a partir de B(agentes) devuelve B(agentes - 1) en O(1)"""
+    return agentes * prob_bloqueo / (erlangs * (1 - prob_bloqueo))
+
+
+def _buscar_agentes_lineal(erlangs, asa_segundos, aht_segundos, sla_pct, agentes_inicio=None):
+    """
+    Recorre agentes de a uno avanzando Erlang B con la recurrencia (O(1) por paso).
+    Arranca en ceil(erlangs) o en `agentes_inicio`; en ese caso, si ya cumple, baja de a uno
+    con la recurrencia inversa hasta el mínimo que cumple.
 
+    Con un `agentes_inicio` muy por encima de la respuesta B da 0 en punto flotante y la
+    recurrencia inversa no sale de 0 (el SLA quedaría en 1.0 hasta el mínimo): mientras pase
+    eso, el inicio se acerca a la mitad del camino hacia ceil(erlangs).
+    """
+    minimo = max(1, math.ceil(erlangs))
+    agentes = max(minimo, int(agentes_inicio)) if agentes_inicio else minimo
+    prob_bloqueo = erlang_b(erlangs, agentes)
+    while prob_bloqueo < sys.float_info.min and agentes > minimo:
+        agentes = (agentes + minimo) // 2
+        prob_bloqueo = erlang_b(erlangs, agentes)
+
+    def sla_actual():
+        prob_espera = erlang_c_desde_b(erlangs, agentes, prob_bloqueo)
+        return sla_erlang_c(erlangs, agentes, prob_espera, asa_segundos, aht_segundos)
+
+    sla_estimado = sla_actual()
+
+    # Bajar mientras el agente anterior también cumpla
+    while sla_estimado >= sla_pct and agentes > minimo:
+        prob_bloqueo = anterior_erlang_b(erlangs, agentes, prob_bloqueo)
+        agentes -= 1
+        sla_previo, sla_estimado = sla_estimado, sla_actual()
+        if sla_estimado < sla_pct:
+            return agentes + 1, sla_previo
+
+    # Subir hasta cumplir
+    while sla_estimado < sla_pct:
+        prob_bloqueo = siguiente_erlang_b(erlangs, agentes, prob_bloqueo)
+        agentes += 1
+        sla_estimado = sla_actual()
+
+    return agentes, sla_estimado
+
+
+def _buscar_agentes_biseccion(erlangs, asa_segundos, aht_segundos, sla_pct, agentes_inicio=None):
+    """
+    Acota el mínimo de agentes con pasos que se duplican y luego biseca sobre la curva de SLA,
+    que es creciente en agentes. `agentes_inicio` (p. ej. la respuesta del día anterior)
+    sirve de punto de partida: si ya cumple se acota hacia abajo, si no hacia arriba.
+    """
+    minimo = max(1, math.ceil(erlangs))
+    inicio = max(minimo, int(agentes_inicio)) if agentes_inicio else minimo
+    slas = {}
+
+    def cumple(agentes):
+        slas[agentes] = _sla_con_agentes(erlangs, agentes, asa_segundos, aht_segundos)
+        return slas[agentes] >= sla_pct
+
+    # 1. Acotar: `bajo` no cumple (o está por debajo del mínimo), `alto` cumple
+    paso = 1
+    if cumple(inicio):
+        alto = inicio
+        while True:
+            candidato = alto - paso
+            if candidato < minimo:
+                bajo = minimo - 1
+                break
+            if not cumple(candidato):
+                bajo = candidato
+                break
+            alto = candidato
+            paso *= 2
+    else:
+        bajo = inicio
+        while True:
+            candidato = bajo + paso
+            if cumple(candidato):
+                alto = candidato
+                break
+            bajo = candidato
+            paso *= 2
+
+    # 2. Bisección
+    while alto - bajo > 1:
+        medio = (bajo + alto) // 2
+        if cumple(medio):
+            alto = medio
+        else:
+            bajo = medio
+
+    return alto, slas[alto]
+
+
+@medido("estimar_fte_erlang_c", contar=lambda res, *a, **k: {"filas": 1, "agentes": res["fte_neto"]})
 def estimar_fte_erlang_c(
     llamadas,
     aht_segundos=300,
     asa_segundos=20,
     sla_pct=0.8,
     shrinkage_pct=0.3,
-    intervalo_segundos=32400  # 🔧 corregido a jornada de 9 horas (1 día)
+    intervalo_segundos=32400,  # 🔧 corregido a jornada de 9 horas (1 día)
+    busqueda="lineal",
+    agentes_inicio=None
 ):
     """
     Estima los FTE necesarios usando Erlang C.
+
+    `busqueda` puede ser "lineal" (de a un agente con la recurrencia de Erlang B, O(1) por paso)
+    o "biseccion" (acotar con pasos que se duplican y bisecar). Ninguna tiene tope de agentes.
+    `agentes_inicio` permite arrancar en caliente, p. ej. desde la respuesta del día anterior.
     """
+    if not 0 < sla_pct <= 1:
+        raise ValueError(f"sla_pct debe estar entre 0 y 1 (recibido {sla_pct})")
+
     # 1. Calcular tráfico en Erlangs
     erlangs = (llamadas * aht_segundos) / intervalo_segundos
     erlangs = max(erlangs, 0.01)  # evitar división por 0
 
     # 2. Buscar mínimo número de agentes que cumplen SLA
-    agentes = max(1, math.ceil(erlangs))
-    sla_estimado = 0.0
-
-    while agentes < 500:
-        prob_espera = erlang_c_formula(erlangs, agentes)
-        try:
-            sla_estimado = 1 - (prob_espera * math.exp(-(agentes - erlangs) * (asa_segundos / aht_segundos)))
-        except OverflowError:
-            sla_estimado = 0.0
-
-        if sla_estimado >= sla_pct:
-            break
-        agentes += 1
+    if busqueda == "biseccion":
+        agentes, sla_estimado = _buscar_agentes_biseccion(
+            erlangs, asa_segundos, aht_segundos, sla_pct, agentes_inicio=agentes_inicio
+        )
+    elif busqueda == "lineal":
+        agentes, sla_estimado = _buscar_agentes_lineal(
+            erlangs, asa_segundos, aht_segundos, sla_pct, agentes_inicio=agentes_inicio
+        )
+    else:
+        raise ValueError(f"Búsqueda desconocida: {busqueda}")
 
     # 3. Aplicar shrinkage
     fte_ajustado = math.ceil(agentes / (1 - shrinkage_pct))
@@ -52,3 +227,263 @@ def estimar_fte_erlang_c(
         "erlangs": round(erlangs, 2),
         "sla_estimado": round(sla_estimado, 4)
     }
+
+
+def estimar_fte_erlang_c_serie(
+    llamadas,
+    aht_segundos=300,
+    asa_segundos=20,
+    sla_pct=0.8,
+    shrinkage_pct=0.3,
+    intervalo_segundos=32400,
+    busqueda="lineal"
+):
+    """
+    Estima los FTE de una serie de fechas consecutivas (lista de llamadas por día).
+
+    Cada día arranca la búsqueda desde la holgura (agentes - erlangs) del día anterior
+    aplicada al tráfico del día, que suele estar a uno o dos agentes de la respuesta.
+    `aht_segundos` puede ser un valor fijo o una lista por día.
+    """
+    ahts = aht_segundos if hasattr(aht_segundos, "__len__") else [aht_segundos] * len(llamadas)
+
+    resultados = []
+    holgura_previa = None
+    for llamadas_dia, aht_dia in zip(llamadas, ahts):
+        erlangs = max((llamadas_dia * aht_dia) / intervalo_segundos, 0.01)
+        agentes_inicio = math.ceil(erlangs + holgura_previa) if holgura_previa is not None else None
+
+        resultado = estimar_fte_erlang_c(
+            llamadas_dia,
+            aht_segundos=aht_dia,
+            asa_segundos=asa_segundos,
+            sla_pct=sla_pct,
+            shrinkage_pct=shrinkage_pct,
+            intervalo_segundos=intervalo_segundos,
+            busqueda=busqueda,
+            agentes_inicio=agentes_inicio
+        )
+        holgura_previa = resultado["fte_neto"] - erlangs
+        resultados.append(resultado)
+
+    return resultados
+
+
+# --- Versión vectorizada (lotes de filas) ---
+
+def _log_erlang_b_lote(erlangs, agentes):
+    """
+    Versión vectorizada de `log_erlang_b` para arrays de erlangs y agentes.
+
+    Los términos de 1/B se acumulan con un cumsum de logaritmos a ambos lados del término
+    máximo, en bloques de filas para acotar la memoria.
+    """
+    erlangs = np.asarray(erlangs, dtype=float)
+    agentes = np.asarray(agentes, dtype=float)
+    log_b = np.zeros(len(erlangs))
+    if len(erlangs) == 0:
+        return log_b
+
+    lgamma = np.frompyfunc(math.lgamma, 1, 1)
+    j_max = np.clip(np.floor(agentes + 1 - erlangs), 0, agentes)
+    log_t_max = (
+        lgamma(agentes + 1).astype(float) - lgamma(agentes - j_max + 1).astype(float)
+        - j_max * np.log(erlangs)
+    )
+
+    ancho = int(max(1, min(agentes.max(), math.ceil(_ANCHO_VENTANA * math.sqrt(erlangs.max())) + 10)))
+    filas_bloque = max(1, _MAX_CELDAS_BLOQUE // (2 * ancho))
+    d = np.arange(ancho)
+
+    for inicio in range(0, len(erlangs), filas_bloque):
+        bloque = slice(inicio, inicio + filas_bloque)
+        a = erlangs[bloque, None]
+        n = agentes[bloque, None]
+        j0 = j_max[bloque, None]
+
+        # Hacia la derecha: t_{j+1} / t_j = (n - j) / a, para j = j0, j0 + 1, ... < n
+        i = j0 + d
+        validos = i < n
+        log_der = np.where(validos, np.log(np.where(validos, n - i, 1) / a), -np.inf)
+
+        # Hacia la izquierda: t_{j-1} / t_j = a / (n - j + 1), para j = j0, j0 - 1, ... > 0
+        i = j0 - 1 - d
+        validos = i >= 0
+        log_izq = np.where(validos, np.log(a / np.where(validos, n - i, 1)), -np.inf)
+
+        suma = 1.0 + np.exp(np.cumsum(log_der, axis=1)).sum(axis=1) + np.exp(np.cumsum(log_izq, axis=1)).sum(axis=1)
+        log_b[bloque] = -(log_t_max[bloque] + np.log(suma))
+
+    return log_b
+
+
+def sla_erlang_c_lote(erlangs, agentes, asa_segundos, aht_segundos):
+    """SLA alcanzado con una cantidad dada de agentes, para muchas filas a la vez"""
+    erlangs, agentes, asa, aht = (
+        np.atleast_1d(x) for x in np.broadcast_arrays(
+            *(np.asarray(x, dtype=float) for x in (erlangs, agentes, asa_segundos, aht_segundos))
+        )
+    )
+    prob_bloqueo = np.exp(_log_erlang_b_lote(erlangs, agentes))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prob_espera = np.where(
+            agentes > erlangs, agentes * prob_bloqueo / (agentes - erlangs * (1 - prob_bloqueo)), 1.0
+        )
+    return 1 - prob_espera * np.exp(-(agentes - erlangs) * (asa / aht))
+
+
+@medido("estimar_fte_erlang_c_lote", contar=lambda res, *a, **k: {"filas": len(res["fte_neto"])})
+def estimar_fte_erlang_c_lote(
+    llamadas,
+    aht_segundos=300,
+    asa_segundos=20,
+    sla_pct=0.8,
+    shrinkage_pct=0.3,
+    intervalo_segundos=32400
+):
+    """
+    Estima los FTE con Erlang C para muchas filas a la vez.
+
+    Todos los parámetros aceptan escalares o arrays (se combinan por broadcasting).
+    Todas las filas avanzan juntas con la recurrencia de Erlang B y cada una se detiene
+    al cumplir su SLA. Las filas con datos faltantes o inválidos devuelven NaN.
+    """
+    llamadas, aht, asa, sla, shrinkage, intervalo = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in
+          (llamadas, aht_segundos, asa_segundos, sla_pct, shrinkage_pct, intervalo_segundos))
+    )
+    llamadas = np.atleast_1d(llamadas)
+    aht, asa, sla, shrinkage, intervalo = (np.atleast_1d(x) for x in (aht, asa, sla, shrinkage, intervalo))
+
+    with np.errstate(invalid="ignore"):
+        validos = (
+            np.isfinite(llamadas) & np.isfinite(aht) & (aht > 0) & np.isfinite(asa)
+            & (sla <= 1) & (shrinkage < 1) & (intervalo > 0)
+        )
+
+    # 1. Tráfico en Erlangs
+    erlangs = np.full(llamadas.shape, np.nan)
+    erlangs[validos] = np.maximum(llamadas[validos] * aht[validos] / intervalo[validos], 0.01)
+
+    # 2. Búsqueda en paralelo del mínimo de agentes que cumple el SLA
+    agentes = np.full(llamadas.shape, np.nan)
+    agentes[validos] = np.maximum(1, np.ceil(erlangs[validos]))
+    prob_bloqueo = np.full(llamadas.shape, np.nan)
+    prob_bloqueo[validos] = np.exp(_log_erlang_b_lote(erlangs[validos], agentes[validos]))
+    sla_estimado = np.full(llamadas.shape, np.nan)
+    ratio = np.where(validos, asa / np.where(validos, aht, 1), np.nan)
+
+    pendientes = np.flatnonzero(validos)
+    with medir("estimar_fte_erlang_c_lote.busqueda", filas=len(pendientes)) as tramo:
+        tramo["iteraciones"] = 0
+        while len(pendientes):
+            tramo["iteraciones"] += 1
+            a = erlangs[pendientes]
+            n = agentes[pendientes]
+            b = prob_bloqueo[pendientes]
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                prob_espera = np.where(n > a, n * b / (n - a * (1 - b)), 1.0)
+            sla_estimado[pendientes] = 1 - prob_espera * np.exp(-(n - a) * ratio[pendientes])
+
+            cumple = sla_estimado[pendientes] >= sla[pendientes]
+            siguen = pendientes[~cumple]
+            prob_bloqueo[siguen] = a[~cumple] * b[~cumple] / (n[~cumple] + 1 + a[~cumple] * b[~cumple])
+            agentes[siguen] += 1
+            pendientes = siguen
+
+    # 3. Aplicar shrinkage
+    fte_ajustado = np.ceil(agentes / (1 - shrinkage))
+
+    return {
+        "fte_neto": agentes,
+        "fte_ajustado": fte_ajustado,
+        "erlangs": np.round(erlangs, 2),
+        "sla_estimado": np.round(sla_estimado, 4)
+    }
+
+
+def estimar_fte_erlang_c_df(
+    df,
+    col_llamadas="llamadas",
+    col_aht="aht",
+    asa_segundos=20,
+    sla_pct=0.8,
+    shrinkage_pct=0.3,
+    intervalo_segundos=32400
+):
+    """
+    Versión DataFrame de `estimar_fte_erlang_c_lote`.
+
+    `col_aht` y los demás parámetros pueden ser un nombre de columna de `df` o un valor fijo.
+    Devuelve un DataFrame con el mismo índice y las columnas fte_neto, fte_ajustado,
+    erlangs y sla_estimado.
+    """
+    def _valor(param):
+        return df[param].to_numpy(dtype=float) if isinstance(param, str) else param
+
+    resultado = estimar_fte_erlang_c_lote(
+        llamadas=df[col_llamadas].to_numpy(dtype=float),
+        aht_segundos=_valor(col_aht),
+        asa_segundos=_valor(asa_segundos),
+        sla_pct=_valor(sla_pct),
+        shrinkage_pct=_valor(shrinkage_pct),
+        intervalo_segundos=_valor(intervalo_segundos)
+    )
+    return pd.DataFrame(resultado, index=df.index)
+
+
+@medido("estimar_fte_erlang_c_caminos", contar=lambda res, caminos, *a, **k: {"filas": int(np.size(caminos))})
+def estimar_fte_erlang_c_caminos(
+    caminos,
+    aht_segundos=300,
+    asa_segundos=20,
+    sla_pct=0.8,
+    shrinkage_pct=0.3,
+    intervalo_segundos=32400,
+    percentiles=(50, 90),
+    evaluar=None
+):
+    """
+    Distribución de FTE por día a partir de caminos simulados de demanda.
+
+    caminos: (n_caminos, n_dias) de una serie o (n_series, n_caminos, n_dias); `aht_segundos`
+    es un valor fijo o uno por serie. Cada camino se evalúa con Erlang C: como las llamadas se
+    redondean a enteros, los caminos repiten valores y se calcula una vez cada par
+    (serie, llamadas) en una sola llamada a `evaluar` (por defecto `estimar_fte_erlang_c_lote`;
+    puede ser `partial(consultar_cubo, cubo)`).
+
+    Devuelve un dict con arrays (n_dias,) o (n_series, n_dias): llamadas_pXX, fte_pXX
+    (con shrinkage) y fte_neto_pXX para cada percentil.
+    """
+    evaluar = evaluar or estimar_fte_erlang_c_lote
+    caminos = np.asarray(caminos, dtype=float)
+    una_serie = caminos.ndim == 2
+    caminos = caminos[None] if una_serie else caminos
+    n_series = caminos.shape[0]
+
+    # Pares únicos (serie, llamadas enteras): un código por par
+    llamadas = np.rint(np.maximum(caminos, 0)).astype(np.int64)
+    base = int(llamadas.max()) + 1 if llamadas.size else 1
+    codigos = np.arange(n_series)[:, None, None] * base + llamadas
+    unicos, inverso = np.unique(codigos, return_inverse=True)
+
+    aht = np.broadcast_to(np.asarray(aht_segundos, dtype=float), (n_series,))
+    resultado = evaluar(
+        llamadas=(unicos % base).astype(float),
+        aht_segundos=aht[unicos // base],
+        asa_segundos=asa_segundos,
+        sla_pct=sla_pct,
+        shrinkage_pct=shrinkage_pct,
+        intervalo_segundos=intervalo_segundos,
+    )
+    fte = resultado["fte_ajustado"][inverso].reshape(caminos.shape)
+    fte_neto = resultado["fte_neto"][inverso].reshape(caminos.shape)
+
+    # Percentiles entre caminos (eje 1); "inverted_cdf" devuelve valores que existen (enteros)
+    salida = {}
+    for p in percentiles:
+        salida[f"llamadas_p{p}"] = np.percentile(llamadas, p, axis=1, method="inverted_cdf")
+        salida[f"fte_p{p}"] = np.percentile(fte, p, axis=1, method="inverted_cdf")
+        salida[f"fte_neto_p{p}"] = np.percentile(fte_neto, p, axis=1, method="inverted_cdf")
+    return {clave: valores[0] for clave, valores in salida.items()} if una_serie else salida
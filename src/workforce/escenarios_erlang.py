@@ -0,0 +1,273 @@
+import math
+
+import numpy as np
+
+from src.workforce.erlang_calculator import (
+    _log_erlang_b_lote,
+    estimar_fte_erlang_c_lote,
+)
+from src.utils.instrumentacion import medido
+
+# Ejes por defecto: SLA objetivo de los sliders (30% a 100%) y relaciones ASA/AHT habituales
+SLAS_DEFECTO = np.round(np.arange(0.30, 1.0001, 0.01), 2)
+RATIOS_DEFECTO = np.concatenate([[0.0], np.geomspace(0.002, 10, 48)])
+
+
+def eje_erlangs(erlangs_max, precision=0.005, paso_min=0.01):
+    """
+    Eje de tráfico para el cubo: pasos de `paso_min` en tráfico bajo y pasos relativos
+    de `precision` a partir de ahí, así el error por redondear hacia arriba queda acotado
+    al `precision` del tráfico.
+    """
+    corte = paso_min / precision
+    lineal = np.arange(paso_min, min(corte, erlangs_max) + paso_min, paso_min)
+    if erlangs_max <= corte:
+        return lineal
+    n_geom = math.ceil(math.log(erlangs_max / corte) / math.log1p(precision))
+    geometrico = corte * (1 + precision) ** np.arange(1, n_geom + 1)
+    return np.concatenate([lineal, geometrico])
+
+
+@medido("construir_cubo_escenarios", contar=lambda cubo, *a, **k: {"filas": int(cubo["agentes"].size)})
+def construir_cubo_escenarios(erlangs_max, ratios_asa_aht=None, slas=None, precision=0.005):
+    """
+    Precalcula los agentes necesarios para una grilla erlangs x (ASA/AHT) x SLA objetivo.
+
+    Todas las celdas se resuelven en una sola pasada: cada valor de tráfico avanza con la
+    recurrencia de Erlang B y, en cada paso, se registra cuántos SLA objetivo ya se cumplen
+    para cada ratio. Devuelve un dict con los ejes, el array `agentes` en el tipo entero
+    más chico que lo contiene y el log de Erlang B de cada paso recorrido (`log_bloqueo`,
+    los de cada tráfico contiguos desde `desde_bloqueo`), con el que las consultas ajustan la
+    dotación sin volver a calcular Erlang B desde cero.
+    """
+    erlangs = eje_erlangs(erlangs_max, precision=precision)
+    ratios = np.sort(np.asarray(RATIOS_DEFECTO if ratios_asa_aht is None else ratios_asa_aht, dtype=float))
+    slas = np.sort(np.asarray(SLAS_DEFECTO if slas is None else slas, dtype=float))
+    n_e, n_r, n_s = len(erlangs), len(ratios), len(slas)
+
+    agentes_inicio = np.maximum(1, np.ceil(erlangs))
+    agentes = agentes_inicio.copy()
+    prob_bloqueo = np.exp(_log_erlang_b_lote(erlangs, agentes))
+
+    # pasos[e, r, k]: cantidad de pasos en los que se cumplían exactamente k objetivos de SLA
+    pasos = np.zeros((n_e, n_r, n_s + 1), dtype=np.int64)
+    pendientes = np.arange(n_e)
+    recorridos = []
+
+    while len(pendientes):
+        a = erlangs[pendientes]
+        n = agentes[pendientes]
+        b = prob_bloqueo[pendientes]
+        with np.errstate(divide="ignore"):
+            recorridos.append((pendientes, n - agentes_inicio[pendientes], np.log(b)))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            prob_espera = np.where(n > a, n * b / (n - a * (1 - b)), 1.0)
+        sla = 1 - prob_espera[:, None] * np.exp(-(n - a)[:, None] * ratios[None, :])
+
+        # Objetivos cumplidos por celda (la curva de SLA es creciente en agentes)
+        cumplidos = np.searchsorted(slas, sla, side="right")
+        filas = np.repeat(pendientes, n_r)
+        columnas = np.tile(np.arange(n_r), len(pendientes))
+        pasos[filas, columnas, cumplidos.ravel()] += 1
+
+        siguen = cumplidos.min(axis=1) < n_s
+        pendientes = pendientes[siguen]
+        a, n, b = a[siguen], n[siguen], b[siguen]
+        prob_bloqueo[pendientes] = a * b / (n + 1 + a * b)
+        agentes[pendientes] += 1
+
+    # El primer n que cumple el objetivo k es el inicio más los pasos con menos de k + 1 cumplidos
+    offsets = np.cumsum(pasos[:, :, :n_s], axis=2)
+    cubo = agentes_inicio[:, None, None] + offsets
+    tipo = np.min_scalar_type(int(cubo.max()))
+
+    # log B(erlangs, inicio + k) de cada paso k, contiguo por tráfico
+    pasos_por_erlang = pasos[:, 0, :].sum(axis=1)
+    desde_bloqueo = np.concatenate([[0], np.cumsum(pasos_por_erlang)[:-1]])
+    log_bloqueo = np.empty(int(pasos_por_erlang.sum()))
+    for filas, k, log_b in recorridos:
+        log_bloqueo[desde_bloqueo[filas] + k.astype(np.int64)] = log_b
+
+    return {
+        "erlangs": erlangs,
+        "ratios": ratios,
+        "slas": slas,
+        "agentes": cubo.astype(tipo),
+        "log_bloqueo": log_bloqueo,
+        "desde_bloqueo": desde_bloqueo,
+    }
+
+
+def guardar_cubo(cubo, path):
+    """Guarda el cubo comprimido en un .npz"""
+    np.savez_compressed(path, **cubo)
+
+
+def cargar_cubo(path):
+    """Carga un cubo guardado con `guardar_cubo`"""
+    with np.load(path) as datos:
+        return {clave: datos[clave] for clave in datos.files}
+
+
+def _sla_desde_b(erlangs, agentes, prob_bloqueo, ratio):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prob_espera = np.where(
+            agentes > erlangs, agentes * prob_bloqueo / (agentes - erlangs * (1 - prob_bloqueo)), 1.0
+        )
+    return 1 - prob_espera * np.exp(-(agentes - erlangs) * ratio)
+
+
+def _mover_log_b(log_b, desde, hasta, agentes, pasos=4):
+    """
+    log B(hasta, agentes) a partir de log B(desde, agentes), integrando con Runge-Kutta de
+    orden 4 d(log B)/d(erlangs) = agentes / erlangs - 1 + B. Entre un tráfico de la grilla y
+    el de la consulta hay menos de un paso de grilla, así que unos pocos pasos alcanzan
+    para la precisión de un float.
+    """
+    def derivada(a, y):
+        return agentes / a - 1 + np.exp(y)
+
+    h = (hasta - desde) / pasos
+    a, y = desde, log_b
+    for _ in range(pasos):
+        k1 = derivada(a, y)
+        k2 = derivada(a + h / 2, y + h / 2 * k1)
+        k3 = derivada(a + h / 2, y + h / 2 * k2)
+        k4 = derivada(a + h, y + h * k3)
+        y = y + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+        a = a + h
+    return y
+
+
+def _ajustar_agentes(erlangs, agentes, ratio, sla_objetivo, prob_bloqueo):
+    """
+    Lleva cada fila al mínimo de agentes que cumple su SLA, partiendo de una estimación
+    cercana (la del cubo) con su Erlang B: sube mientras no cumple y baja mientras el agente
+    anterior también cumple. Cada paso usa la recurrencia de Erlang B (directa o inversa),
+    O(1) por fila, solo en las filas que siguen moviéndose.
+    Devuelve (agentes, SLA alcanzado).
+    """
+    agentes = agentes.astype(float)
+    prob_bloqueo = prob_bloqueo.copy()
+    minimo = np.maximum(1, np.ceil(erlangs))
+    sla = _sla_desde_b(erlangs, agentes, prob_bloqueo, ratio)
+
+    # Subir: estimaciones por debajo (p. ej. con interpolación)
+    pendientes = np.flatnonzero(sla < sla_objetivo)
+    while len(pendientes):
+        a, n, b = erlangs[pendientes], agentes[pendientes], prob_bloqueo[pendientes]
+        prob_bloqueo[pendientes] = b = a * b / (n + 1 + a * b)
+        agentes[pendientes] = n = n + 1
+        sla[pendientes] = _sla_desde_b(a, n, b, ratio[pendientes])
+        pendientes = pendientes[sla[pendientes] < sla_objetivo[pendientes]]
+
+    # Bajar: el vecino conservador de la grilla suele sobrar por uno a tres agentes.
+    # B(n - 1) por recurrencia inversa: cerca del mínimo B no es despreciable y no se pierde precisión
+    pendientes = np.flatnonzero((sla >= sla_objetivo) & (agentes > minimo))
+    while len(pendientes):
+        a, n, b = erlangs[pendientes], agentes[pendientes], prob_bloqueo[pendientes]
+        b_anterior = n * b / (a * (1 - b))
+        sla_anterior = _sla_desde_b(a, n - 1, b_anterior, ratio[pendientes])
+        bajan = (sla_anterior >= sla_objetivo[pendientes]) & (b > 0)
+        pendientes = pendientes[bajan]
+        agentes[pendientes] -= 1
+        prob_bloqueo[pendientes] = b_anterior[bajan]
+        sla[pendientes] = sla_anterior[bajan]
+        pendientes = pendientes[agentes[pendientes] > minimo[pendientes]]
+
+    return agentes, sla
+
+
+@medido("consultar_cubo", contar=lambda res, *a, **k: {"filas": len(res["fte_neto"])})
+def consultar_cubo(
+    cubo,
+    llamadas,
+    aht_segundos=300,
+    asa_segundos=20,
+    sla_pct=0.8,
+    shrinkage_pct=0.3,
+    intervalo_segundos=32400,
+    interpolar=False
+):
+    """
+    Responde un escenario de FTE con el cubo precalculado, sin recorrer agentes desde cero.
+
+    El cubo da el punto de partida: por defecto el vecino conservador de la grilla (más tráfico,
+    menor ASA/AHT, mayor SLA), que es una cota superior; con `interpolar=True`, la interpolación
+    lineal en el eje de tráfico. El Erlang B guardado para esa celda se lleva al tráfico de la
+    consulta (`_mover_log_b`) y la estimación se ajusta de a un agente con la recurrencia, así
+    la dotación es la misma que la de `estimar_fte_erlang_c_lote` con costo O(1) por fila.
+    Las filas fuera del rango del cubo se resuelven con `estimar_fte_erlang_c_lote`.
+    Devuelve el mismo dict que `estimar_fte_erlang_c_lote`.
+    """
+    llamadas, aht, asa, sla, shrinkage, intervalo = (
+        np.atleast_1d(x) for x in np.broadcast_arrays(
+            *(np.asarray(x, dtype=float) for x in
+              (llamadas, aht_segundos, asa_segundos, sla_pct, shrinkage_pct, intervalo_segundos))
+        )
+    )
+    ejes_e, ejes_r, ejes_s = cubo["erlangs"], cubo["ratios"], cubo["slas"]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        validos = (
+            np.isfinite(llamadas) & np.isfinite(aht) & (aht > 0) & np.isfinite(asa)
+            & (sla <= 1) & (shrinkage < 1) & (intervalo > 0)
+        )
+        erlangs = np.where(validos, np.maximum(llamadas * aht / intervalo, 0.01), np.nan)
+        ratio = np.where(validos, asa / aht, np.nan)
+
+    # Índices de grilla (vecino conservador en cada eje)
+    i_e = np.searchsorted(ejes_e, erlangs, side="left")
+    i_r = np.searchsorted(ejes_r, ratio, side="right") - 1
+    i_s = np.searchsorted(ejes_s, np.round(sla, 6), side="left")
+    en_cubo = validos & (i_e < len(ejes_e)) & (i_r >= 0) & (i_s < len(ejes_s))
+
+    agentes = np.full(llamadas.shape, np.nan)
+    e, r, s = i_e[en_cubo], i_r[en_cubo], i_s[en_cubo]
+    agentes[en_cubo] = cubo["agentes"][e, r, s]
+
+    if interpolar:
+        # Interpolación lineal entre los dos vecinos de tráfico
+        e_inf = np.maximum(e - 1, 0)
+        x0, x1 = ejes_e[e_inf], ejes_e[e]
+        y0 = cubo["agentes"][e_inf, r, s].astype(float)
+        y1 = cubo["agentes"][e, r, s].astype(float)
+        peso = np.where(x1 > x0, (erlangs[en_cubo] - x0) / np.where(x1 > x0, x1 - x0, 1), 1.0)
+        agentes[en_cubo] = np.maximum(np.ceil(y0 + peso * (y1 - y0)), np.ceil(erlangs[en_cubo]))
+
+    # La grilla redondea cada eje: ajustar al mínimo exacto con el SLA de los agentes vecinos
+    a = erlangs[en_cubo]
+    n = agentes[en_cubo]
+    if "log_bloqueo" in cubo:
+        # Erlang B guardado en (tráfico de la grilla, n), llevado al tráfico de la consulta
+        inicio = np.maximum(1, np.ceil(ejes_e[e]))
+        largo = np.diff(np.append(cubo["desde_bloqueo"], len(cubo["log_bloqueo"])))[e]
+        k = np.clip(n - inicio, 0, largo - 1).astype(np.int64)
+        n = inicio + k
+        log_b = _mover_log_b(cubo["log_bloqueo"][cubo["desde_bloqueo"][e] + k], ejes_e[e], a, n)
+        # B despreciable (muy por encima de la respuesta): se recalcula exacto
+        sin_b = ~np.isfinite(log_b)
+        if sin_b.any():
+            log_b[sin_b] = _log_erlang_b_lote(a[sin_b], n[sin_b])
+    else:
+        log_b = _log_erlang_b_lote(a, n)  # cubo guardado sin log_bloqueo
+
+    sla_estimado = np.full(llamadas.shape, np.nan)
+    agentes[en_cubo], sla_estimado[en_cubo] = _ajustar_agentes(a, n, ratio[en_cubo], sla[en_cubo], np.exp(log_b))
+
+    # Filas fuera de la grilla: cálculo exacto
+    fuera = validos & ~en_cubo
+    if fuera.any():
+        exacto = estimar_fte_erlang_c_lote(
+            llamadas[fuera], aht[fuera], asa[fuera], sla[fuera], shrinkage[fuera], intervalo[fuera]
+        )
+        agentes[fuera] = exacto["fte_neto"]
+        sla_estimado[fuera] = exacto["sla_estimado"]
+
+    return {
+        "fte_neto": agentes,
+        "fte_ajustado": np.ceil(agentes / (1 - shrinkage)),
+        "erlangs": np.round(erlangs, 2),
+        "sla_estimado": np.round(sla_estimado, 4)
+    }
@@ -0,0 +1,306 @@
+# src/workforce/simulador.py
+"""
+Simulador de eventos discretos de la cola del contact center, para contrastar la dotación
+de Erlang C con una cola más realista (perfil intradía, abandono, AHT no exponencial):
+
+    python -m src.workforce.simulador --dataset fte_resultados --replicas 20 --paciencia 120
+
+Las llamadas de un día se generan como arrays (llegada, duración, paciencia) y se atienden
+en orden de llegada (FCFS) con un heap de agentes ordenado por el momento en que se liberan.
+Cada agente trabaja en los intervalos del plan de dotación en que le toca (el agente j
+trabaja si j < agentes del intervalo); al final del día los agentes terminan la cola.
+"""
+import argparse
+import heapq
+import math
+import time
+from bisect import bisect_right
+
+import numpy as np
+import pandas as pd
+
+from src.forecast.forecast_multiidioma import _mapear, repartir_nucleos
+from src.utils.almacenamiento import leer_dataset
+from src.utils.instrumentacion import medido, medir
+
+INTERVALO_DIA = 32400  # 9 horas, como `estimar_fte_erlang_c`
+N_INTERVALOS = 9
+
+
+def perfil_campana(n_intervalos=N_INTERVALOS, centro=0.45, ancho=0.08):
+    """Perfil intradía en forma de campana (suma 1), el mismo que usa el generador sintético"""
+    posicion = (np.arange(n_intervalos) + 0.5) / n_intervalos
+    perfil = np.exp(-((posicion - centro) ** 2) / ancho)
+    return perfil / perfil.sum()
+
+
+def generar_llamadas_dia(llamadas, aht_segundos, perfil=None, intervalo_segundos=INTERVALO_DIA,
+                         n_intervalos=N_INTERVALOS, paciencia_segundos=None, cv_aht=1.0, rng=None):
+    """
+    Llamadas sintéticas de un día como arrays ordenados por llegada:
+    {"llegada", "duracion", "paciencia"} en segundos desde el inicio del día.
+
+    Las llegadas son Poisson por intervalo según `perfil` (por defecto plano) y uniformes dentro
+    del intervalo. La duración es exponencial con media `aht_segundos` (lo que supone Erlang C)
+    o lognormal con coeficiente de variación `cv_aht` si es distinto de 1. La paciencia es
+    exponencial con media `paciencia_segundos` (None: nadie abandona).
+    """
+    rng = rng or np.random.default_rng()
+    perfil = np.full(n_intervalos, 1 / n_intervalos) if perfil is None else np.asarray(perfil, dtype=float)
+    perfil = perfil / perfil.sum()
+    largo = intervalo_segundos / len(perfil)
+
+    por_intervalo = rng.poisson(llamadas * perfil)
+    inicio = np.repeat(np.arange(len(perfil)) * largo, por_intervalo)
+    llegada = np.sort(inicio + rng.random(len(inicio)) * largo)
+
+    n = len(llegada)
+    if cv_aht == 1.0:
+        duracion = rng.exponential(aht_segundos, n)
+    else:
+        sigma2 = math.log(1 + cv_aht ** 2)
+        duracion = rng.lognormal(math.log(aht_segundos) - sigma2 / 2, math.sqrt(sigma2), n)
+    paciencia = np.full(n, np.inf) if paciencia_segundos is None else rng.exponential(paciencia_segundos, n)
+    return {"llegada": llegada, "duracion": duracion, "paciencia": paciencia}
+
+
+def _turnos(agentes, largo):
+    """Tramos (inicio, fin) de trabajo de cada agente según el plan por intervalo; el último no cierra"""
+    turnos = []
+    for j in range(int(agentes.max(initial=0))):
+        trabaja = np.concatenate([[False], agentes > j, [False]])
+        cambios = np.flatnonzero(trabaja[1:] != trabaja[:-1])
+        inicios, fines = cambios[::2] * largo, cambios[1::2] * largo
+        fines = np.where(cambios[1::2] == len(agentes), np.inf, fines)
+        turnos.append((inicios.tolist(), fines.tolist()))
+    return turnos
+
+
+def _proximo_tramo(turno, t):
+    """(inicio, fin) del tramo de trabajo vigente en `t` o del siguiente; None si no hay más"""
+    inicios, fines = turno
+    i = bisect_right(inicios, t) - 1
+    if i >= 0 and t < fines[i]:
+        return t, fines[i]
+    if i + 1 < len(inicios):
+        return inicios[i + 1], fines[i + 1]
+    return None
+
+
+def atender(llegada, duracion, paciencia, agentes, intervalo_segundos=INTERVALO_DIA):
+    """
+    Atiende las llamadas en orden de llegada. `agentes` es el plan por intervalo (array).
+
+    El heap guarda (libre_desde, fin_del_tramo, agente). Cada llamada toma al agente que se
+    libera primero; si la espera supera su paciencia abandona y el agente queda libre.
+    Devuelve la espera de cada llamada (inf si abandona o no hay agentes) y si fue atendida.
+    """
+    agentes = np.asarray(agentes, dtype=int)
+    turnos = _turnos(agentes, intervalo_segundos / len(agentes))
+    heap = []
+    for j, turno in enumerate(turnos):
+        tramo = _proximo_tramo(turno, 0.0)
+        if tramo is not None:
+            heap.append((tramo[0], tramo[1], j))
+    heapq.heapify(heap)
+
+    espera = np.full(len(llegada), np.inf)
+    atendida = np.zeros(len(llegada), dtype=bool)
+    heappop, heapreplace = heapq.heappop, heapq.heapreplace
+
+    for i, (t_llegada, t_servicio, t_paciencia) in enumerate(zip(llegada.tolist(), duracion.tolist(), paciencia.tolist())):
+        # Primer agente que puede atender: si su tramo termina antes, pasa a su próximo tramo
+        while heap:
+            libre, fin, j = heap[0]
+            inicio = libre if libre > t_llegada else t_llegada
+            if inicio < fin:
+                break
+            tramo = _proximo_tramo(turnos[j], inicio)
+            if tramo is None:
+                heappop(heap)
+            else:
+                heapreplace(heap, (tramo[0], tramo[1], j))
+        if not heap:
+            break  # sin agentes por el resto del día: las llamadas restantes no se atienden
+
+        if inicio - t_llegada > t_paciencia:
+            continue  # abandona; el agente sigue libre para la siguiente
+
+        espera[i] = inicio - t_llegada
+        atendida[i] = True
+        libre = inicio + t_servicio
+        if libre < fin:
+            heapreplace(heap, (libre, fin, j))
+        else:
+            tramo = _proximo_tramo(turnos[j], libre)
+            if tramo is None:
+                heappop(heap)
+            else:
+                heapreplace(heap, (tramo[0], tramo[1], j))
+
+    return espera, atendida
+
+
+def _indicadores(espera, atendida, duracion, asa_segundos, segundos_agente):
+    n = len(espera)
+    return {
+        "ofrecidas": n,
+        "atendidas": int(atendida.sum()),
+        "abandono_pct": float(1 - atendida.mean()) if n else np.nan,
+        "sla_simulado": float(np.mean(atendida & (espera <= asa_segundos))) if n else np.nan,
+        "asa_simulado": float(espera[atendida].mean()) if atendida.any() else np.nan,
+        "espera_p90": float(np.percentile(espera[atendida], 90)) if atendida.any() else np.nan,
+        "ocupacion": float(duracion[atendida].sum() / segundos_agente) if segundos_agente > 0 else np.nan,
+    }
+
+
+@medido("simular_dia", contar=lambda res, *a, **k: {"filas": res["ofrecidas"]})
+def simular_dia(
+    llamadas,
+    aht_segundos,
+    agentes,
+    asa_segundos=20,
+    intervalo_segundos=INTERVALO_DIA,
+    n_intervalos=N_INTERVALOS,
+    perfil=None,
+    paciencia_segundos=None,
+    cv_aht=1.0,
+    semilla=None,
+    por_intervalo=False,
+):
+    """
+    Simula un día de una cola: `llamadas` esperadas, `aht_segundos` y `agentes` (un valor para
+    todo el día o uno por intervalo). Devuelve SLA alcanzado (atendidas dentro de `asa_segundos`
+    sobre ofrecidas), ASA (espera media de las atendidas), abandono, P90 de espera y ocupación.
+    Con `por_intervalo=True` agrega "intervalos": los mismos indicadores por intervalo de llegada.
+    """
+    rng = np.random.default_rng(semilla)
+    agentes = np.broadcast_to(np.asarray(agentes, dtype=int), (n_intervalos,))
+    with medir("simulador.generacion"):
+        llamadas_dia = generar_llamadas_dia(
+            llamadas, aht_segundos, perfil, intervalo_segundos, n_intervalos, paciencia_segundos, cv_aht, rng
+        )
+    with medir("simulador.atencion", filas=len(llamadas_dia["llegada"])):
+        espera, atendida = atender(
+            llamadas_dia["llegada"], llamadas_dia["duracion"], llamadas_dia["paciencia"], agentes, intervalo_segundos
+        )
+
+    largo = intervalo_segundos / n_intervalos
+    resultado = _indicadores(espera, atendida, llamadas_dia["duracion"], asa_segundos, agentes.sum() * largo)
+    if por_intervalo:
+        intervalo = np.minimum((llamadas_dia["llegada"] // largo).astype(int), n_intervalos - 1)
+        resultado["intervalos"] = pd.DataFrame([
+            {"intervalo": k, "agentes": int(agentes[k]),
+             **_indicadores(espera[intervalo == k], atendida[intervalo == k], llamadas_dia["duracion"][intervalo == k],
+                            asa_segundos, agentes[k] * largo)}
+            for k in range(n_intervalos)
+        ])
+    return resultado
+
+
+def _simular_escenario(escenario, semilla):
+    parametros = {k: v for k, v in escenario.items() if k not in ("etiquetas",)}
+    return {**escenario.get("etiquetas", {}), "semilla": semilla, **simular_dia(**parametros, semilla=semilla)}
+
+
+@medido("simular_escenarios", contar=lambda res, escenarios, *a, **k: {"series": len(escenarios), "filas": int(res["ofrecidas"].sum())})
+def simular_escenarios(escenarios, n_replicas=10, n_workers=None, modo="procesos", semilla=42):
+    """
+    Corre `n_replicas` de cada escenario (dict con los argumentos de `simular_dia` y, opcional,
+    "etiquetas" para identificar la fila) en paralelo. Cada réplica tiene su propia semilla
+    derivada de `semilla`, así el resultado no depende de cuántos workers se usen.
+    Devuelve un DataFrame con una fila por escenario y réplica.
+    """
+    semillas = np.random.SeedSequence(semilla).generate_state(len(escenarios) * n_replicas)
+    tareas = [
+        (escenario, int(semillas[i * n_replicas + r]))
+        for i, escenario in enumerate(escenarios) for r in range(n_replicas)
+    ]
+    n_workers, _ = repartir_nucleos(n_workers, len(tareas))
+    return pd.DataFrame(_mapear(_simular_escenario, tareas, n_workers, modo))
+
+
+def resumir_replicas(df_replicas, por):
+    """Media e IC 95% (normal) entre réplicas de SLA, ASA y abandono simulados"""
+    metricas = ["sla_simulado", "asa_simulado", "abandono_pct", "ocupacion"]
+    agrupado = df_replicas.groupby(por, sort=False, observed=True)
+    resumen = agrupado[metricas].mean()
+    error = 1.96 * agrupado["sla_simulado"].std() / np.sqrt(agrupado.size())
+    resumen["sla_ic_inf"] = resumen["sla_simulado"] - error
+    resumen["sla_ic_sup"] = resumen["sla_simulado"] + error
+    resumen["replicas"] = agrupado.size()
+    return resumen.reset_index()
+
+
+def validar_dotacion(
+    df_fte,
+    asa_segundos=20,
+    sla_pct=0.8,
+    n_replicas=10,
+    perfil=None,
+    paciencia_segundos=None,
+    cv_aht=1.0,
+    col_llamadas="llamadas_estimadas",
+    col_aht="aht (seg)",
+    col_agentes="fte_neto",
+    n_workers=None,
+    modo="procesos",
+    semilla=42,
+):
+    """
+    Simula cada fila de un resultado de FTEs (`fte_resultados` / `batch_fte`) con la dotación
+    neta de Erlang C durante todo el día y compara el SLA alcanzado con el estimado.
+    Devuelve las filas con sla_simulado (media e IC 95%), asa_simulado, abandono y `cumple`.
+    """
+    df = df_fte.dropna(subset=[col_llamadas, col_aht, col_agentes]).reset_index(drop=True)
+    escenarios = [
+        {
+            "llamadas": float(fila[col_llamadas]), "aht_segundos": float(fila[col_aht]),
+            "agentes": int(fila[col_agentes]), "asa_segundos": asa_segundos, "perfil": perfil,
+            "paciencia_segundos": paciencia_segundos, "cv_aht": cv_aht, "etiquetas": {"fila": i},
+        }
+        for i, fila in enumerate(df.to_dict("records"))
+    ]
+    if not escenarios:
+        return df
+    resumen = resumir_replicas(simular_escenarios(escenarios, n_replicas, n_workers, modo, semilla), por="fila")
+    df = df.join(resumen.set_index("fila"))
+    df["cumple"] = df["sla_simulado"] >= sla_pct
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Valida la dotación de Erlang C con un simulador de eventos discretos")
+    parser.add_argument("--dataset", default="fte_resultados", help="Dataset de FTEs (fte_resultados o batch_fte)")
+    parser.add_argument("--fecha", default=None, help="Día a simular (por defecto, el primero del dataset)")
+    parser.add_argument("--todas-las-fechas", action="store_true")
+    parser.add_argument("--asa", type=float, default=20, help="ASA objetivo en segundos (el usado para los FTEs)")
+    parser.add_argument("--sla", type=float, default=0.8, help="SLA objetivo (0-1)")
+    parser.add_argument("--replicas", type=int, default=10)
+    parser.add_argument("--perfil", choices=["plano", "campana"], default="plano", help="Perfil intradía de llegadas")
+    parser.add_argument("--paciencia", type=float, default=None, help="Paciencia media en segundos (sin valor: sin abandono)")
+    parser.add_argument("--cv-aht", type=float, default=1.0, help="Coef. de variación del AHT (1 = exponencial)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--modo", choices=["hilos", "procesos"], default="procesos")
+    args = parser.parse_args(argv)
+
+    df_fte = leer_dataset(args.dataset)
+    if not args.todas_las_fechas:
+        fecha = pd.Timestamp(args.fecha) if args.fecha else df_fte["date"].min()
+        df_fte = df_fte[df_fte["date"] == fecha]
+
+    inicio = time.perf_counter()
+    df = validar_dotacion(
+        df_fte, asa_segundos=args.asa, sla_pct=args.sla, n_replicas=args.replicas,
+        perfil=perfil_campana() if args.perfil == "campana" else None,
+        paciencia_segundos=args.paciencia, cv_aht=args.cv_aht, n_workers=args.workers, modo=args.modo,
+    )
+    columnas = ["date", "idioma", "llamadas_estimadas", "fte_neto", "sla_estimado", "sla_simulado",
+                "sla_ic_inf", "sla_ic_sup", "asa_simulado", "abandono_pct", "ocupacion", "cumple"]
+    print(df[[c for c in columnas if c in df.columns]].round(3).to_string(index=False))
+    print(f"✅ {len(df)} filas x {args.replicas} réplicas en {time.perf_counter() - inicio:.1f} s; "
+          f"{int(df['cumple'].sum())} cumplen el SLA de {args.sla:.0%}")
+
+
+if __name__ == "__main__":
+    main()